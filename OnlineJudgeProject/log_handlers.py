@@ -0,0 +1,104 @@
+# OnlineJudgeProject/log_handlers.py
+#
+# Logging that stays off the request path. Records are formatted (with size caps)
+# where they are logged and handed to a bounded in-memory queue; one background
+# thread per process writes them out. When the queue is full a record is dropped
+# and counted instead of blocking the request or the judge.
+#
+# Structured fields are passed as extra={'fields': {...}} and rendered as
+# key=value pairs after the message.
+
+import atexit
+import logging
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+DROP_REPORT_INTERVAL_SECONDS = 1.0
+
+
+def truncate(text, limit):
+    if limit and len(text) > limit:
+        return f"{text[:limit]}... [{len(text) - limit} more chars]"
+    return text
+
+
+class StructuredFormatter(logging.Formatter):
+    """`time level logger message key=value ...`, with the message and each field capped."""
+
+    def __init__(self, max_message_chars=2000, max_field_chars=200):
+        super().__init__('%(asctime)s %(levelname)s %(name)s %(message)s')
+        self.max_message_chars = max_message_chars
+        self.max_field_chars = max_field_chars
+
+    def formatMessage(self, record):
+        record.message = truncate(record.message, self.max_message_chars)
+        line = super().formatMessage(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(
+                f"{key}={truncate(repr(value) if isinstance(value, str) else str(value), self.max_field_chars)}"
+                for key, value in fields.items()
+            )
+        return line
+
+    def formatException(self, ei):
+        # Tracebacks keep their tail, which is where the error is
+        text = super().formatException(ei)
+        limit = self.max_message_chars * 4
+        return text if len(text) <= limit else '... ' + text[-limit:]
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through a fraction of records at INFO and below; warnings and errors always pass."""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if record.levelno > logging.INFO or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler whose listener thread writes to stderr; never blocks on a full queue."""
+
+    def __init__(self, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._last_drop_report = 0.0
+        target = logging.StreamHandler()
+        target.setFormatter(logging.Formatter('%(message)s'))
+        self.listener = QueueListener(self.queue, target)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return
+        self.report_dropped()
+
+    def report_dropped(self):
+        """At most once a second, logs how many records were dropped since the last report."""
+        with self._dropped_lock:
+            now = time.monotonic()
+            if not self.dropped or now - self._last_drop_report < DROP_REPORT_INTERVAL_SECONDS:
+                return
+            dropped, self.dropped = self.dropped, 0
+            self._last_drop_report = now
+        try:
+            self.queue.put_nowait(logging.makeLogRecord({
+                'msg': f"{dropped} log record(s) dropped, log queue full", 'levelno': logging.WARNING,
+            }))
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += dropped
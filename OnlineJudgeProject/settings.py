@@ -180,17 +180,39 @@ SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 SECURE_HSTS_PRELOAD = True
 
 # Logging configuration for debugging
+# Logs go through a bounded queue to a background writer thread (see
+# OnlineJudgeProject/log_handlers.py), so logging never blocks a request or the
+# judge. LOG_SAMPLE_RATE keeps that fraction of INFO/DEBUG records; warnings and
+# errors are always kept. Messages and structured fields are capped in size.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'sampling': {
+            '()': 'OnlineJudgeProject.log_handlers.SamplingFilter',
+            'rate': LOG_SAMPLE_RATE,
+        },
+    },
+    'formatters': {
+        'structured': {
+            '()': 'OnlineJudgeProject.log_handlers.StructuredFormatter',
+            'max_message_chars': int(os.environ.get('LOG_MAX_MESSAGE_CHARS', 2000)),
+            'max_field_chars': int(os.environ.get('LOG_MAX_FIELD_CHARS', 200)),
+        },
+    },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
+            '()': 'OnlineJudgeProject.log_handlers.NonBlockingQueueHandler',
+            'maxsize': int(os.environ.get('LOG_QUEUE_SIZE', 10000)),
+            'formatter': 'structured',
+            'filters': ['sampling'],
         },
     },
     'root': {
         'handlers': ['console'],
-        'level': 'INFO',
+        'level': LOG_LEVEL,
     },
     'loggers': {
         'django': {
@@ -224,3 +246,96 @@ CACHE_CONTROL = 'no-store, no-cache, must-revalidate, max-age=0'
 LOGIN_REDIRECT_URL = 'dashboard'  # After login go to dashboard
 LOGOUT_REDIRECT_URL = 'login'  # After logout go to login page
 
+# Judge queue: full submissions are saved as Pending and judged by
+# `python manage.py judge_worker`. Set JUDGE_INLINE=true to judge inside the
+# request instead (single-process deployments without a worker).
+JUDGE_INLINE = os.environ.get('JUDGE_INLINE', 'False').lower() == 'true'
+
+# Test cases of one submission run in parallel, at most JUDGE_MAX_PARALLEL_TESTS
+# at a time. JUDGE_CORE_BUDGET caps the test cases running at once across all
+# submissions judged by one process.
+JUDGE_MAX_PARALLEL_TESTS = int(os.environ.get('JUDGE_MAX_PARALLEL_TESTS', 4))
+JUDGE_CORE_BUDGET = int(os.environ.get('JUDGE_CORE_BUDGET', os.cpu_count() or 1))
+
+# Compiled submissions are cached on disk, keyed by source and toolchain, so
+# resubmitting the same code skips compilation. Set JUDGE_BUILD_CACHE_DIR to an
+# empty string to disable the cache.
+JUDGE_BUILD_CACHE_DIR = os.environ.get('JUDGE_BUILD_CACHE_DIR', os.path.join(BASE_DIR, '.judge_cache', 'builds'))
+JUDGE_BUILD_CACHE_MAX_BYTES = int(os.environ.get('JUDGE_BUILD_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Each web and judge worker process writes its timing histograms here; /metrics/
+# merges them. Set to an empty string to turn the files (and /metrics data) off.
+JUDGE_METRICS_DIR = os.environ.get('JUDGE_METRICS_DIR', os.path.join(BASE_DIR, '.judge_cache', 'metrics'))
+# A process rewrites its file at least every JUDGE_METRICS_FLUSH_SECONDS; files
+# not rewritten for several intervals were left by processes that are gone, and
+# /metrics/ deletes them.
+JUDGE_METRICS_FLUSH_SECONDS = int(os.environ.get('JUDGE_METRICS_FLUSH_SECONDS', '60'))
+# /metrics/ is served to staff users and to scrapers sending
+# `Authorization: Bearer <JUDGE_METRICS_TOKEN>`; leave empty to allow staff only.
+JUDGE_METRICS_TOKEN = os.environ.get('JUDGE_METRICS_TOKEN', '')
+
+# Passed results of a sample run are kept in the cache for JUDGE_SAMPLE_RUN_TTL
+# seconds; submitting the same code within that time only runs the other test
+# cases. The default in-memory cache is per process, so set CACHE_BACKEND and
+# CACHE_LOCATION to a shared cache (e.g. Redis) when running several web processes.
+JUDGE_SAMPLE_RUN_TTL = int(os.environ.get('JUDGE_SAMPLE_RUN_TTL', 600))
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+# Whether every web and judge process sees the same cache. Features that signal
+# other processes through the cache refresh on a timer (the leaderboard) or do
+# not cache at all (the problem list) otherwise.
+CACHE_IS_SHARED = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# The problem list shows PROBLEM_LIST_PAGE_SIZE problems per page. With a shared
+# cache, pages are cached per topic for PROBLEM_LIST_CACHE_TTL seconds, or until
+# a problem of the topic changes.
+PROBLEM_LIST_PAGE_SIZE = int(os.environ.get('PROBLEM_LIST_PAGE_SIZE', 50))
+PROBLEM_LIST_CACHE_TTL = int(os.environ.get('PROBLEM_LIST_CACHE_TTL', 3600))
+
+# Each process keeps the leaderboard in memory and picks up new scores at most
+# every LEADERBOARD_SYNC_SECONDS. Rebuilds and deleted users reach the other
+# processes through the cache; without a shared cache each process reloads the
+# whole leaderboard every LEADERBOARD_RELOAD_SECONDS instead.
+LEADERBOARD_SYNC_SECONDS = float(os.environ.get('LEADERBOARD_SYNC_SECONDS', 2))
+LEADERBOARD_RELOAD_SECONDS = float(os.environ.get('LEADERBOARD_RELOAD_SECONDS', 300))
+
+# Compiler flags for C and C++ submissions. 'pch' names a header that is
+# precompiled when a judge worker starts (or with `manage.py build_pch`) and used
+# by every compile with the same profile.
+JUDGE_TOOLCHAIN_PROFILES = {
+    'c': {'std': 'gnu17', 'flags': ['-O2', '-pipe'], 'libs': ['-lm']},
+    'cpp': {'std': 'gnu++17', 'flags': ['-O2', '-pipe'], 'pch': 'bits/stdc++.h'},
+}
+
+# How Java submissions run: 'process' starts javac and one JVM per test case;
+# 'resident' keeps long-lived JVMs (problems/runners/JudgeServer.java) that
+# compile in process and load each test's Main in a fresh class loader. Resident
+# JVMs share one heap of JUDGE_JAVA_HEAP_MB, so it must exceed the largest
+# problem memory limit.
+JUDGE_JAVA_MODE = os.environ.get('JUDGE_JAVA_MODE', 'process')
+JUDGE_JAVA_HEAP_MB = int(os.environ.get('JUDGE_JAVA_HEAP_MB', 1024))
+
+# How Python submissions run: 'process' starts `python main.py` per test case;
+# 'zygote' forks each run from a pre-warmed interpreter (problems/runners/zygote.py)
+# and byte-compiles the source once per submission. POSIX only.
+JUDGE_PYTHON_MODE = os.environ.get('JUDGE_PYTHON_MODE', 'process')
+
+# Test case files, named by the sha256 of their content. The database stays the
+# source of truth; files missing on a judge host are written on first use.
+JUDGE_TESTDATA_DIR = os.environ.get('JUDGE_TESTDATA_DIR', os.path.join(BASE_DIR, '.judge_cache', 'testdata'))
+
+# Reusable working directories for compiling and running submissions. Defaults
+# to /dev/shm when it is writable, otherwise the system temp directory.
+JUDGE_SANDBOX_ROOT = os.environ.get('JUDGE_SANDBOX_ROOT', '')
+JUDGE_SANDBOX_POOL_SIZE = int(os.environ.get('JUDGE_SANDBOX_POOL_SIZE', 16))
+
+# Largest stdout (or stderr) a submission may write per test case before it is
+# stopped with Output Limit Exceeded.
+JUDGE_OUTPUT_LIMIT_BYTES = int(os.environ.get('JUDGE_OUTPUT_LIMIT_BYTES', 16 * 1024 * 1024))
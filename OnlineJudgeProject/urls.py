@@ -19,6 +19,7 @@ from django.urls import path, include
 from django.views.generic import RedirectView
 from django.http import HttpResponse
 from users import views as user_views
+from problems.views import judge_metrics
 
 def health_check(request):
     return HttpResponse("OK", status=200)
@@ -33,5 +34,6 @@ urlpatterns = [
     path('dashboard/', user_views.dashboard, name='dashboard_root'),
 
     path('health/', health_check, name='health_check'),  # Health check endpoint
+    path('metrics/', judge_metrics, name='metrics'),      # Prometheus judge timings
     path('', RedirectView.as_view(url='/login/', permanent=False), name='root'),  # Redirect root to login page
 ]
@@ -1,9 +1,31 @@
 # problems/admin.py
 
+from django.conf import settings
 from django.contrib import admin
-from .models import Topic, Problem, TestCase, Submission
+from .models import Topic, Problem, TestCase, Submission, TestResult, VerdictCache
+from .rejudge import rejudge, requeue
+
+
+@admin.action(description="Rejudge selected submissions")
+def rejudge_submissions(modeladmin, request, queryset):
+    if settings.JUDGE_INLINE:
+        # No judge worker would ever pick up a requeued submission
+        stats = rejudge(queryset)
+        modeladmin.message_user(request, f"Rejudged {stats.submissions} submission(s).")
+        return
+    count = requeue(queryset)
+    modeladmin.message_user(request, f"Requeued {count} submission(s) for judging.")
+
+
+class SubmissionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'problem', 'language', 'status', 'submitted_at')
+    list_filter = ('status', 'language')
+    actions = [rejudge_submissions]
+
 
 admin.site.register(Topic)
 admin.site.register(Problem)
 admin.site.register(TestCase)
-admin.site.register(Submission)
+admin.site.register(Submission, SubmissionAdmin)
+admin.site.register(VerdictCache)
+admin.site.register(TestResult)
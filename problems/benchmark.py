@@ -0,0 +1,319 @@
+# problems/benchmark.py
+#
+# Reproducible judge workloads for `manage.py judge_benchmark`. A synthetic
+# "sum the numbers" problem is seeded with test cases of a chosen size, and a mix
+# of submissions per language (accepted, wrong answer, time limit, huge output,
+# compile error) is replayed through compile_code/run_compiled, judge_submission
+# and the problem view. Latencies are collected per component and written as
+# JSON, so two runs can be compared for regressions.
+
+import json
+import platform
+import random
+import shutil
+import time
+import uuid
+from collections import defaultdict
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test.utils import override_settings
+
+from .judge import PENDING, judge_submission, load_checker, source_hash
+from .models import Problem, Submission, TestCase, Topic
+from .utils import compile_code, run_compiled
+
+# Sources per language and kind; every kind reads the input the same way.
+# Input: n on the first line, then n integers. Expected output: their sum.
+WORKLOADS = {
+    'c': {
+        'AC': '#include <stdio.h>\nint main(){int n;long long s=0,x;scanf("%d",&n);'
+              'while(n--){scanf("%lld",&x);s+=x;}printf("%lld\\n",s);return 0;}',
+        'WA': '#include <stdio.h>\nint main(){int n;long long s=0,x;scanf("%d",&n);'
+              'while(n--){scanf("%lld",&x);s+=x;}printf("%lld\\n",s+1);return 0;}',
+        'TLE': '#include <stdio.h>\nint main(){volatile unsigned long i=0;for(;;)i++;return 0;}',
+        'OLE': '#include <stdio.h>\nint main(){for(;;)puts("0123456789012345678901234567890123456789");return 0;}',
+        'CE': '#include <stdio.h>\nint main(){return undefined_name;}',
+    },
+    'cpp': {
+        'AC': '#include <bits/stdc++.h>\nint main(){std::ios::sync_with_stdio(false);std::cin.tie(nullptr);'
+              'int n;long long s=0,x;std::cin>>n;while(n--){std::cin>>x;s+=x;}std::cout<<s<<"\\n";}',
+        'WA': '#include <bits/stdc++.h>\nint main(){int n;long long s=0,x;std::cin>>n;'
+              'while(n--){std::cin>>x;s+=x;}std::cout<<s-1<<"\\n";}',
+        'TLE': '#include <bits/stdc++.h>\nint main(){volatile unsigned long i=0;for(;;)i++;}',
+        'OLE': '#include <bits/stdc++.h>\nint main(){for(;;)std::cout<<"0123456789012345678901234567890123456789\\n";}',
+        'CE': '#include <bits/stdc++.h>\nint main(){std::vector<int> v = 1;}',
+    },
+    'java': {
+        'AC': 'import java.io.*;import java.util.*;\npublic class Main{public static void main(String[] a)'
+              'throws IOException{StreamTokenizer t=new StreamTokenizer(new BufferedInputStream(System.in));'
+              't.nextToken();int n=(int)t.nval;long s=0;while(n-->0){t.nextToken();s+=(long)t.nval;}'
+              'System.out.println(s);}}',
+        'WA': 'import java.io.*;import java.util.*;\npublic class Main{public static void main(String[] a)'
+              'throws IOException{StreamTokenizer t=new StreamTokenizer(new BufferedInputStream(System.in));'
+              't.nextToken();int n=(int)t.nval;long s=0;while(n-->0){t.nextToken();s+=(long)t.nval;}'
+              'System.out.println(s+1);}}',
+        'TLE': 'public class Main{public static void main(String[] a){long i=0;while(true){i++;}}}',
+        'OLE': 'public class Main{public static void main(String[] a){while(true)'
+               '{System.out.println("0123456789012345678901234567890123456789");}}}',
+        'CE': 'public class Main{public static void main(String[] a){int x = "text";}}',
+    },
+    'python': {
+        'AC': 'import sys\ndata = sys.stdin.buffer.read().split()\nprint(sum(map(int, data[1:])))',
+        'WA': 'import sys\ndata = sys.stdin.buffer.read().split()\nprint(sum(map(int, data[1:])) + 1)',
+        'TLE': 'while True:\n    pass',
+        'OLE': 'import sys\nline = "0123456789012345678901234567890123456789\\n" * 1000\n'
+               'while True:\n    sys.stdout.write(line)',
+        'CE': 'def main(:\n    pass',
+    },
+}
+
+# Executables a language needs on this host
+TOOLCHAINS = {'c': ['gcc'], 'cpp': ['g++'], 'java': ['javac', 'java'], 'python': []}
+
+COMMENT = {'c': '//', 'cpp': '//', 'java': '//', 'python': '#'}
+
+# Tags every source of one benchmark run, so builds cached by an earlier run are never reused
+RUN_ID = uuid.uuid4().hex[:12]
+
+
+def available_languages(languages):
+    """The requested languages whose toolchain is installed, and the ones skipped."""
+    available, skipped = [], []
+    for lang in languages:
+        if all(shutil.which(tool) for tool in TOOLCHAINS[lang]):
+            available.append(lang)
+        else:
+            skipped.append(lang)
+    return available, skipped
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(fraction * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss_kb():
+    """High-water RSS of this process and of the largest child it has waited for (empty on Windows)."""
+    if resource is None:
+        return {}
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+
+
+def unique_source(code, lang, tag):
+    """Same program with a distinct comment, so no build cache or verdict memo is hit."""
+    return f"{code}\n{COMMENT[lang]} benchmark {RUN_ID} {tag}\n"
+
+
+def seed_problem(tests, numbers_per_test, time_limit_ms, rng):
+    """Creates the synthetic problem and its test cases."""
+    topic, _ = Topic.objects.get_or_create(name='Benchmark')
+    problem = Problem.objects.create(
+        title='Benchmark: sum of numbers',
+        description='Print the sum of n integers.',
+        topic=topic,
+        time_limit_ms=time_limit_ms,
+    )
+    for _ in range(tests):
+        numbers = [rng.randint(-10 ** 9, 10 ** 9) for _ in range(numbers_per_test)]
+        TestCase.objects.create(
+            problem=problem,
+            input_data=f"{len(numbers)}\n{' '.join(map(str, numbers))}\n",
+            output_data=f"{sum(numbers)}\n",
+        )
+    return problem
+
+
+class Recorder:
+    """Latency samples and verdict counts per component."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.verdicts = defaultdict(lambda: defaultdict(int))
+        self.child_memory_kb = defaultdict(int)
+        self.rss = {}
+        self.wall = defaultdict(float)
+
+    def add(self, component, seconds, verdict=None, memory_kb=0):
+        self.samples[component].append(seconds * 1000)
+        self.wall[component] += seconds
+        if verdict is not None:
+            self.verdicts[component][verdict] += 1
+        self.child_memory_kb[component] = max(self.child_memory_kb[component], memory_kb or 0)
+
+    def mark_rss(self, component):
+        self.rss[component] = peak_rss_kb()
+
+    def summary(self):
+        components = {}
+        for component, samples in self.samples.items():
+            wall = self.wall[component]
+            components[component] = {
+                'count': len(samples),
+                'p50_ms': round(percentile(samples, 0.50), 2),
+                'p95_ms': round(percentile(samples, 0.95), 2),
+                'p99_ms': round(percentile(samples, 0.99), 2),
+                'max_ms': round(max(samples), 2),
+                'per_second': round(len(samples) / wall, 2) if wall else None,
+                'verdicts': dict(self.verdicts[component]),
+                'peak_submission_memory_kb': self.child_memory_kb[component],
+                'peak_rss_kb': self.rss.get(component, {}),
+            }
+        return components
+
+
+def bench_compile_and_run(problem, languages, kinds, iterations, recorder):
+    """compile_code and run_compiled directly, per language."""
+    testcases = list(problem.testcase_set.order_by('id'))
+    checker = load_checker(problem)
+    try:
+        for lang in languages:
+            for kind in kinds:
+                for iteration in range(iterations):
+                    code = unique_source(WORKLOADS[lang][kind], lang, f"compile-{kind}-{iteration}")
+                    started = time.monotonic()
+                    build, error = compile_code(code, lang)
+                    recorder.add(f'compile.{lang}', time.monotonic() - started, 'CE' if build is None else 'OK')
+                    if build is None:
+                        continue
+                    try:
+                        for testcase in testcases:
+                            started = time.monotonic()
+                            run = run_compiled(
+                                build, time_limit_ms=problem.time_limit_ms, memory_limit_mb=problem.memory_limit_mb,
+                                input_path=testcase.input_path(), answer_path=testcase.answer_path(),
+                                checker=checker,
+                            )
+                            verdict = run.verdict if run.verdict != 'OK' else ('AC' if run.passed else 'WA')
+                            recorder.add(f'run.{lang}', time.monotonic() - started, verdict, run.memory_kb)
+                            if verdict != 'AC':
+                                break
+                    finally:
+                        build.cleanup()
+            recorder.mark_rss(f'compile.{lang}')
+            recorder.mark_rss(f'run.{lang}')
+    finally:
+        checker.close()
+
+
+def bench_judge(problem, user, languages, kinds, iterations, recorder):
+    """judge_submission end to end, as a judge worker runs it."""
+    for lang in languages:
+        for kind in kinds:
+            for iteration in range(iterations):
+                code = unique_source(WORKLOADS[lang][kind], lang, f"judge-{kind}-{iteration}")
+                submission = Submission.objects.create(
+                    user=user, problem=problem, language=lang, code=code,
+                    source_hash=source_hash(code), status=PENDING,
+                )
+                started = time.monotonic()
+                judge_submission(submission)
+                recorder.add(f'judge.{lang}', time.monotonic() - started, submission.status, submission.memory_kb)
+        recorder.mark_rss(f'judge.{lang}')
+
+
+def bench_view(problem, user, languages, kinds, iterations, recorder):
+    """The problem view: a sample run, then a submit judged inside the request."""
+    client = Client()
+    client.force_login(user)
+    url = f'/problems/{problem.id}/'
+    ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+    with override_settings(JUDGE_INLINE=True):
+        for lang in languages:
+            for kind in kinds:
+                for iteration in range(iterations):
+                    code = unique_source(WORKLOADS[lang][kind], lang, f"view-{kind}-{iteration}")
+                    for component, data in (
+                        (f'view.sample.{lang}', {'code': code, 'language': lang, 'run_sample': 'true'}),
+                        (f'view.submit.{lang}', {'code': code, 'language': lang}),
+                    ):
+                        started = time.monotonic()
+                        response = client.post(url, data, **ajax)
+                        elapsed = time.monotonic() - started
+                        payload = response.json()
+                        # A failed sample run has no status, only an error
+                        verdict = payload.get('state') or payload.get('status') or 'Failed'
+                        recorder.add(component, elapsed, verdict)
+            recorder.mark_rss(f'view.sample.{lang}')
+            recorder.mark_rss(f'view.submit.{lang}')
+
+
+def run_benchmark(languages, kinds, tests, numbers_per_test, iterations, time_limit_ms, seed,
+                  components=('compile', 'judge', 'view')):
+    """
+    Seeds the workload and runs the requested components.
+    Must run against a throwaway database; see the judge_benchmark command.
+    :return: JSON-serializable result dict.
+    """
+    rng = random.Random(seed)
+    available, skipped = available_languages(languages)
+    problem = seed_problem(tests, numbers_per_test, time_limit_ms, rng)
+    user, _ = User.objects.get_or_create(username='benchmark')
+    recorder = Recorder()
+
+    started = time.monotonic()
+    if 'compile' in components:
+        bench_compile_and_run(problem, available, kinds, iterations, recorder)
+    if 'judge' in components:
+        bench_judge(problem, user, available, kinds, iterations, recorder)
+    if 'view' in components:
+        bench_view(problem, user, available, kinds, iterations, recorder)
+
+    return {
+        'config': {
+            'languages': available,
+            'skipped_languages': skipped,
+            'kinds': list(kinds),
+            'tests': tests,
+            'numbers_per_test': numbers_per_test,
+            'iterations': iterations,
+            'time_limit_ms': time_limit_ms,
+            'seed': seed,
+            'components': list(components),
+            'python_mode': settings.JUDGE_PYTHON_MODE,
+            'java_mode': settings.JUDGE_JAVA_MODE,
+        },
+        'host': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'elapsed_seconds': round(time.monotonic() - started, 3),
+        'components': recorder.summary(),
+    }
+
+
+def compare(previous, current, threshold):
+    """
+    Latency changes between two result files.
+    :return: List of (component, metric, before, after, change) for every metric
+             that got slower by more than threshold (a fraction, e.g. 0.1).
+    """
+    regressions = []
+    for component, stats in current['components'].items():
+        before = previous.get('components', {}).get(component)
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if before.get(metric) and stats.get(metric) is not None:
+                change = stats[metric] / before[metric] - 1
+                if change > threshold:
+                    regressions.append((component, metric, before[metric], stats[metric], change))
+    return regressions
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as results:
+        return json.load(results)
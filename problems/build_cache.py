@@ -0,0 +1,225 @@
+# problems/build_cache.py
+#
+# On-disk cache of compiled submissions, shared by every judge process on the host.
+# Entries are directories named after a hash of the source and the toolchain that
+# built it. A build is compiled in a private directory inside the cache root and
+# renamed into place, so readers only ever see complete entries.
+
+import contextlib
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Entries used more recently than this are never evicted, so a build that a judge
+# is about to run cannot disappear underneath it.
+EVICTION_GRACE_SECONDS = 600
+
+# A full scan of the cache walks every entry, so store() does not scan on every
+# build: each process tracks the size found by its last scan plus the builds it
+# stored since, and scans (and evicts) when that crosses the limit. Builds stored
+# by other processes are only seen by a scan, so the cache is also rescanned
+# every EVICTION_RESCAN_SECONDS. While every entry is within the grace period a
+# scan cannot shrink the cache, so an over-limit cache is scanned again at most
+# every EVICTION_RETRY_SECONDS.
+EVICTION_RESCAN_SECONDS = 300
+EVICTION_RETRY_SECONDS = 60
+
+# Eviction frees space down to this fraction of the limit, so a full cache is
+# not scanned again on the very next build
+EVICTION_LOW_WATER = 0.9
+
+# Cache root -> (bytes tracked, time.monotonic() of the last scan, whether that
+# scan left the cache over the limit)
+_tracked_sizes = {}
+_tracked_lock = threading.Lock()
+
+
+def cache_root():
+    """Directory holding the cache, or None when the cache is disabled."""
+    root = settings.JUDGE_BUILD_CACHE_DIR
+    if not root:
+        return None
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+@lru_cache(maxsize=None)
+def toolchain_version(version_cmd):
+    """First line of the compiler's version banner, used as part of the cache key."""
+    try:
+        result = subprocess.run(list(version_cmd), capture_output=True, text=True, timeout=15)
+    except (OSError, subprocess.TimeoutExpired):
+        return 'unknown'
+    banner = (result.stdout or result.stderr).strip()
+    return banner.splitlines()[0] if banner else 'unknown'
+
+
+def build_key(lang, version_cmd, compile_cmd, code):
+    """
+    Content address of a build.
+    :return: Hex digest of (language, compiler version, compile flags, source).
+    """
+    digest = hashlib.sha256()
+    for part in (lang, toolchain_version(tuple(version_cmd)), '\0'.join(compile_cmd), code):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def entry_path(root, key):
+    return os.path.join(root, key[:2], key)
+
+
+def lookup(key):
+    """
+    Finds a cached build and marks it as recently used.
+    :return: Path of the build directory, or None on a miss.
+    """
+    root = cache_root()
+    if root is None:
+        return None
+    path = entry_path(root, key)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def new_build_dir():
+    """Private directory to compile into before the result is stored."""
+    root = cache_root()
+    return tempfile.mkdtemp(prefix='build-', dir=root)
+
+
+def store(key, build_dir):
+    """
+    Publishes a finished build. If another process stored the same key first, its
+    entry is kept and ours is discarded.
+    :return: Path of the cached build directory.
+    """
+    root = cache_root()
+    path = entry_path(root, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        os.rename(build_dir, path)
+    except OSError:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
+        os.utime(path)
+        return path
+
+    max_bytes = settings.JUDGE_BUILD_CACHE_MAX_BYTES
+    if scan_due(root, tree_size(path), max_bytes):
+        evict(root, max_bytes, keep=path)
+    return path
+
+
+def scan_due(root, stored_bytes, max_bytes):
+    """
+    Adds a stored build to the size this process tracks for the cache.
+    :return: Whether the cache should be scanned for eviction now.
+    """
+    now = time.monotonic()
+    with _tracked_lock:
+        tracked = _tracked_sizes.get(root)
+        if tracked is None:
+            return True
+        size, scanned_at, stuck = tracked
+        size += stored_bytes
+        _tracked_sizes[root] = (size, scanned_at, stuck)
+        if now - scanned_at >= EVICTION_RESCAN_SECONDS:
+            return True
+        return size > max_bytes and (not stuck or now - scanned_at >= EVICTION_RETRY_SECONDS)
+
+
+@contextlib.contextmanager
+def locked(root):
+    """Serialises eviction between judge processes."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(root, '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def tree_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def track_size(root, total, max_bytes):
+    """Records the size a scan left the cache at, restarting the tracked size from it."""
+    with _tracked_lock:
+        _tracked_sizes[root] = (total, time.monotonic(), total > max_bytes)
+
+
+def evict(root, max_bytes, keep=None):
+    """
+    Removes least recently used entries once the cache exceeds max_bytes, until
+    it is back under EVICTION_LOW_WATER of it.
+    :param keep: Entry that must survive, usually the one just stored.
+    """
+    with locked(root):
+        entries = []
+        total = 0
+        for shard in os.scandir(root):
+            if not shard.is_dir() or len(shard.name) != 2:
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    mtime = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                size = tree_size(entry.path)
+                entries.append((mtime, size, entry.path))
+                total += size
+
+        if total <= max_bytes:
+            track_size(root, total, max_bytes)
+            return
+
+        target = max_bytes * EVICTION_LOW_WATER
+        now = time.time()
+        for mtime, size, path in sorted(entries):
+            if total <= target or now - mtime < EVICTION_GRACE_SECONDS:
+                break
+            if path == keep:
+                continue
+            # Move the entry out of its shard first so lookups never see it half deleted
+            trash = tempfile.mkdtemp(prefix='evict-', dir=root)
+            try:
+                os.rename(path, os.path.join(trash, 'entry'))
+            except OSError:
+                continue
+            finally:
+                shutil.rmtree(trash, ignore_errors=True)
+            total -= size
+        track_size(root, total, max_bytes)
+        logger.debug("Build cache holds %d bytes after eviction", total)
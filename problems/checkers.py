@@ -0,0 +1,209 @@
+# problems/checkers.py
+#
+# Decides whether a program's output answers a test case. The built-in checkers
+# map both files into memory and walk them in fixed-size chunks, so neither is
+# ever copied into Python as a whole; a problem can also ship its own checker
+# program.
+
+import contextlib
+import io
+import math
+import mmap
+import os
+from itertools import zip_longest
+
+from .executor import execute
+
+CHUNK_SIZE = 64 * 1024
+# What bytes.strip() removes
+WHITESPACE = b' \t\n\r\x0b\x0c'
+
+
+@contextlib.contextmanager
+def mapped(path):
+    """Read-only memory map of a file (mmap cannot map empty files)."""
+    with open(path, 'rb') as data_file:
+        if os.fstat(data_file.fileno()).st_size == 0:
+            yield io.BytesIO()
+            return
+        with mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def content_bounds(stream):
+    """
+    Offsets of the first and one-past-last non-whitespace bytes of a seekable stream.
+    :return: Tuple of (start, end); start == end when the stream is blank.
+    """
+    stream.seek(0, 2)
+    size = stream.tell()
+
+    start = 0
+    stream.seek(0)
+    while start < size:
+        chunk = stream.read(CHUNK_SIZE)
+        stripped = chunk.lstrip(WHITESPACE)
+        if stripped:
+            start += len(chunk) - len(stripped)
+            break
+        start += len(chunk)
+    if start >= size:
+        return size, size
+
+    end = size
+    while end > start:
+        position = max(start, end - CHUNK_SIZE)
+        stream.seek(position)
+        stripped = stream.read(end - position).rstrip(WHITESPACE)
+        if stripped:
+            end = position + len(stripped)
+            break
+        end = position
+    return start, end
+
+
+def same_stripped_content(output, expected):
+    """
+    Streaming equivalent of `output.read().strip() == expected.read().strip()`.
+    :param output, expected: Seekable binary streams or memory maps.
+    """
+    output_start, output_end = content_bounds(output)
+    expected_start, expected_end = content_bounds(expected)
+    remaining = output_end - output_start
+    if remaining != expected_end - expected_start:
+        return False
+
+    output.seek(output_start)
+    expected.seek(expected_start)
+    while remaining:
+        size = min(CHUNK_SIZE, remaining)
+        if output.read(size) != expected.read(size):
+            return False
+        remaining -= size
+    return True
+
+
+def iter_tokens(stream):
+    """Yields the whitespace-separated tokens of a binary stream, one chunk at a time."""
+    stream.seek(0)
+    # Pieces of a token that touches the end of the chunks read so far; joined
+    # once it ends, so a token spanning many chunks is not copied again per chunk
+    pieces = []
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        tokens = chunk.split()
+        if pieces and tokens and not chunk[:1].isspace():
+            pieces.append(tokens.pop(0))
+            if not tokens and not chunk[-1:].isspace():
+                # The whole chunk is inside the token
+                continue
+        if pieces:
+            yield b''.join(pieces)
+            pieces = []
+        if tokens and not chunk[-1:].isspace():
+            pieces.append(tokens.pop())
+        yield from tokens
+    if pieces:
+        yield b''.join(pieces)
+
+
+def same_tokens(output, expected, same_token=bytes.__eq__):
+    """
+    True if both streams hold the same sequence of tokens, whatever whitespace
+    separates them.
+    :param same_token: Compares one output token with one expected token.
+    """
+    for output_token, expected_token in zip_longest(iter_tokens(output), iter_tokens(expected)):
+        if output_token is None or expected_token is None:
+            return False
+        if not same_token(output_token, expected_token):
+            return False
+    return True
+
+
+def close_numbers(epsilon):
+    """Token comparison that accepts numbers within epsilon (absolute or relative)."""
+    def same_token(output_token, expected_token):
+        if output_token == expected_token:
+            return True
+        try:
+            output_value = float(output_token)
+            expected_value = float(expected_token)
+        except ValueError:
+            return False
+        if math.isnan(output_value) or math.isnan(expected_value):
+            return False
+        return math.isclose(output_value, expected_value, rel_tol=epsilon, abs_tol=epsilon)
+    return same_token
+
+
+class CheckerError(Exception):
+    """The checker itself failed, so the submission cannot be judged."""
+
+
+class ExactChecker:
+    """Output must match the answer exactly, apart from leading and trailing whitespace."""
+
+    def check(self, output_path, input_path, answer_path):
+        with mapped(output_path) as output, mapped(answer_path) as answer:
+            return same_stripped_content(output, answer)
+
+    def close(self):
+        pass
+
+
+class TokenChecker(ExactChecker):
+    """Output must hold the same tokens as the answer; whitespace between them is ignored."""
+
+    def check(self, output_path, input_path, answer_path):
+        with mapped(output_path) as output, mapped(answer_path) as answer:
+            return same_tokens(output, answer)
+
+
+class FloatChecker(ExactChecker):
+    """Like TokenChecker, but numbers only have to be within epsilon of the answer."""
+
+    def __init__(self, epsilon):
+        self.same_token = close_numbers(epsilon)
+
+    def check(self, output_path, input_path, answer_path):
+        with mapped(output_path) as output, mapped(answer_path) as answer:
+            return same_tokens(output, answer, self.same_token)
+
+
+class ProgramChecker:
+    """
+    Problem-specific checker program, run as `checker INPUT OUTPUT ANSWER` next to
+    the submission's output. Exit code 0 accepts the output, 1 or 2 rejects it
+    (testlib's WA and PE); anything else is a checker failure.
+    """
+
+    # The checker is trusted problem-setter code; it only gets a time limit
+    TIME_LIMIT_SECONDS = 10
+    REJECT_EXIT_CODES = (1, 2)
+
+    def __init__(self, build):
+        self.build = build
+
+    def check(self, output_path, input_path, answer_path):
+        directory = os.path.dirname(output_path)
+        report_path = os.path.join(directory, 'checker.txt')
+        with open(os.devnull, 'rb') as stdin, open(report_path, 'wb') as report:
+            usage = execute(
+                list(self.build.run_cmd) + [input_path, output_path, answer_path],
+                directory, stdin, report, report,
+                cpu_seconds=self.TIME_LIMIT_SECONDS,
+                wall_ms=self.TIME_LIMIT_SECONDS * 2000,
+            )
+        if not usage.failed:
+            return True
+        if usage.signal == 0 and not usage.timed_out and usage.exit_code in self.REJECT_EXIT_CODES:
+            return False
+        with open(report_path, 'rb') as report:
+            details = report.read(1000).decode('utf-8', errors='ignore').strip()
+        raise CheckerError(f"Checker failed (exit code {usage.exit_code}, signal {usage.signal}): {details}")
+
+    def close(self):
+        self.build.cleanup()
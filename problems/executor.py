@@ -0,0 +1,144 @@
+# problems/executor.py
+#
+# Starts a submission under CPU, wall-time and memory limits and measures what it
+# used. On POSIX systems the work is done by runners/launcher.c, compiled on first
+# use; elsewhere only the wall-time limit is enforced.
+
+import hashlib
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from .sandbox import remove_tree
+
+logger = logging.getLogger(__name__)
+
+LAUNCHER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runners', 'launcher.c')
+
+_launcher = None
+_launcher_lock = threading.Lock()
+
+
+class Usage:
+    """Resources used by one run, as reported by the launcher."""
+
+    def __init__(self, exit_code, signal, cpu_time_ms, wall_time_ms, memory_kb, timed_out):
+        self.exit_code = exit_code
+        self.signal = signal
+        self.cpu_time_ms = cpu_time_ms
+        self.wall_time_ms = wall_time_ms
+        self.memory_kb = memory_kb
+        self.timed_out = timed_out
+
+    @property
+    def failed(self):
+        return self.exit_code != 0 or self.signal != 0
+
+
+def get_launcher():
+    """
+    Path of the compiled launcher, building it the first time it is needed.
+    :return: The path, or None if the launcher cannot be used on this system.
+    """
+    global _launcher
+    with _launcher_lock:
+        if _launcher is not None:
+            return _launcher or None
+        _launcher = build_launcher() or ''
+        return _launcher or None
+
+
+def build_launcher():
+    if os.name != 'posix':
+        return None
+
+    with open(LAUNCHER_SOURCE, 'rb') as source:
+        digest = hashlib.sha256(source.read()).hexdigest()[:16]
+    directory = settings.JUDGE_BUILD_CACHE_DIR or tempfile.gettempdir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'launcher-{digest}')
+    if os.access(path, os.X_OK):
+        return path
+
+    # Compile next to the final path and rename, so other judge processes never
+    # see a half-written binary
+    workdir = tempfile.mkdtemp(prefix='launcher-', dir=directory)
+    try:
+        binary = os.path.join(workdir, 'launcher')
+        result = subprocess.run(
+            ['gcc', '-O2', '-o', binary, LAUNCHER_SOURCE],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=60
+        )
+        if result.returncode != 0:
+            logger.warning("Could not build the judge launcher, resource limits are disabled:\n%s",
+                           result.stderr.decode('utf-8', errors='ignore'))
+            return None
+        os.rename(binary, path)
+        return path
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning("Could not build the judge launcher, resource limits are disabled: %s", e)
+        return None
+    finally:
+        remove_tree(workdir)
+
+
+def execute(cmd, cwd, stdin, stdout, stderr, cpu_seconds=0, memory_bytes=0, wall_ms=0, output_bytes=0):
+    """
+    Runs cmd to completion with the given limits (0 means unlimited).
+    :param stdin, stdout, stderr: Open files handed to the program.
+    :param output_bytes: Largest file the program may write; the kernel stops it
+                         (SIGXFSZ) as soon as stdout or stderr grows past this.
+    :return: Usage of the run.
+    """
+    launcher = get_launcher()
+    if launcher is None:
+        return execute_unlimited(cmd, cwd, stdin, stdout, stderr, wall_ms)
+
+    read_fd, write_fd = os.pipe()
+    try:
+        proc = subprocess.Popen(
+            [launcher, str(write_fd), str(cpu_seconds), str(memory_bytes), str(output_bytes), str(wall_ms)] + list(cmd),
+            cwd=cwd,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=stderr,
+            pass_fds=(write_fd,)
+        )
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+
+    with os.fdopen(read_fd) as result:
+        report = result.read().split()
+    proc.wait()
+    if len(report) != 6:
+        raise RuntimeError(f"Judge launcher failed with exit code {proc.returncode}")
+
+    exit_code, signal, cpu_time_ms, wall_time_ms, memory_kb, timed_out = (int(value) for value in report)
+    return Usage(exit_code, signal, cpu_time_ms, wall_time_ms, memory_kb, bool(timed_out))
+
+
+def execute_unlimited(cmd, cwd, stdin, stdout, stderr, wall_ms):
+    """Fallback without the launcher: wall time only, no CPU or memory accounting."""
+    started = time.monotonic()
+    proc = subprocess.Popen(cmd, cwd=cwd, stdin=stdin, stdout=stdout, stderr=stderr)
+    timed_out = False
+    try:
+        proc.wait(timeout=wall_ms / 1000 if wall_ms else None)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        timed_out = True
+    wall_time_ms = int((time.monotonic() - started) * 1000)
+    exit_code = proc.returncode if proc.returncode >= 0 else -1
+    signal = -proc.returncode if proc.returncode < 0 else 0
+    return Usage(exit_code, signal, wall_time_ms, wall_time_ms, 0, timed_out)
@@ -0,0 +1,255 @@
+# problems/java_runner.py
+#
+# Resident JVMs for Java submissions (JUDGE_JAVA_MODE = 'resident'). Each judge
+# process keeps a few long-lived runners/JudgeServer.java processes that compile
+# with the in-process javac and run every test case in a fresh class loader, so
+# neither javac nor a test case pays for JVM startup. A server that dies (timeout,
+# out of memory, System.exit) is dropped and replaced on the next request.
+#
+# Requests and replies go over a Unix socket that only the server could connect
+# to; the JVM's stdin, stdout and stderr are /dev/null, so whatever a submission
+# prints there never reaches the judge. Every request carries a random id that
+# its reply has to repeat.
+
+import hashlib
+import logging
+import os
+import secrets
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from .executor import Usage
+from .sandbox import remove_tree
+
+logger = logging.getLogger(__name__)
+
+SERVER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runners', 'JudgeServer.java')
+# Slack for the server to answer after the submission's own wall-time limit
+REPLY_GRACE_SECONDS = 5
+COMPILE_TIMEOUT_SECONDS = 15
+# How long a new JVM gets to connect back
+START_TIMEOUT_SECONDS = 30
+
+_server_classes = None
+_server_classes_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class ServerExited(Exception):
+    """The JVM went away before answering."""
+
+
+def resident_mode():
+    """True when Java should go through resident JVMs and they can be started here."""
+    return (settings.JUDGE_JAVA_MODE == 'resident' and hasattr(socket, 'AF_UNIX')
+            and get_server_classes() is not None)
+
+
+def get_server_classes():
+    """Directory holding the compiled JudgeServer, built on first use; None if unavailable."""
+    global _server_classes
+    with _server_classes_lock:
+        if _server_classes is None:
+            _server_classes = build_server() or ''
+        return _server_classes or None
+
+
+def build_server():
+    with open(SERVER_SOURCE, 'rb') as source:
+        digest = hashlib.sha256(source.read()).hexdigest()[:16]
+    directory = settings.JUDGE_BUILD_CACHE_DIR or tempfile.gettempdir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'java-server-{digest}')
+    if os.path.exists(os.path.join(path, 'JudgeServer.class')):
+        return path
+
+    # Compile next to the final path and rename, so other judge processes never
+    # see a half-written class directory
+    workdir = tempfile.mkdtemp(prefix='java-server-', dir=directory)
+    try:
+        result = subprocess.run(
+            ['javac', '-encoding', 'UTF-8', '-d', workdir, SERVER_SOURCE],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=120
+        )
+        if result.returncode != 0:
+            logger.warning("Could not build the Java judge server, using one JVM per test case:\n%s",
+                           result.stderr.decode('utf-8', errors='ignore'))
+            return None
+        try:
+            os.rename(workdir, path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+        return path
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning("Could not build the Java judge server, using one JVM per test case: %s", e)
+        return None
+    finally:
+        remove_tree(workdir)
+
+
+class JudgeServer:
+    """One resident JVM; used by one thread at a time."""
+
+    def __init__(self, classes):
+        # The socket lives in a directory only this user can enter, and stops
+        # listening once the server has connected
+        directory = tempfile.mkdtemp(prefix='java-server-')
+        path = os.path.join(directory, 'control.sock')
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            listener.bind(path)
+            listener.listen(1)
+            listener.settimeout(START_TIMEOUT_SECONDS)
+            self.proc = subprocess.Popen(
+                ['java', f'-Xmx{settings.JUDGE_JAVA_HEAP_MB}m', '-XX:+UseSerialGC', '-cp', classes,
+                 'JudgeServer', path],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True
+            )
+            try:
+                self.conn, _ = listener.accept()
+            except OSError as e:
+                self.proc.kill()
+                self.proc.wait()
+                raise RuntimeError(f"Java judge server did not start: {e}")
+        finally:
+            listener.close()
+            remove_tree(directory)
+        self.conn.settimeout(None)
+        self.replies = self.conn.makefile('rb')
+
+    def request(self, timeout, *fields):
+        """Sends one request and waits for its reply line."""
+        request_id = secrets.token_hex(8)
+        # A server stuck in a submission is killed rather than waited on forever
+        watchdog = threading.Timer(timeout, self.kill)
+        watchdog.start()
+        try:
+            self.conn.sendall(('\t'.join(str(field) for field in (request_id,) + fields) + '\n').encode('utf-8'))
+            reply = self.replies.readline().decode('utf-8', errors='replace').split()
+        except OSError:
+            reply = []
+        finally:
+            watchdog.cancel()
+        if not reply:
+            raise ServerExited()
+        if reply[0] != request_id:
+            self.kill()
+            raise RuntimeError("Java judge server answered a different request")
+        if reply[1:2] == ['ERROR']:
+            raise RuntimeError(f"Java judge server: {' '.join(reply[2:])}")
+        return reply[1:]
+
+    @property
+    def alive(self):
+        return self.proc.poll() is None
+
+    def kill(self):
+        if self.alive:
+            self.proc.kill()
+        self.proc.wait()
+        self.replies.close()
+        self.conn.close()
+
+    def exit_status(self):
+        """(exit code, signal) the JVM ended with, in the form Usage expects."""
+        returncode = self.proc.wait()
+        if returncode < 0:
+            return -1, -returncode
+        return returncode, 0
+
+
+class ServerPool:
+    """Idle resident JVMs of this process; a new one is started when none is free."""
+
+    def __init__(self, classes):
+        self.classes = classes
+        self.pid = os.getpid()
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            while self._idle:
+                server = self._idle.pop()
+                if server.alive:
+                    return server
+        return JudgeServer(self.classes)
+
+    def release(self, server):
+        if not server.alive:
+            server.kill()
+            return
+        with self._lock:
+            if len(self._idle) < settings.JUDGE_CORE_BUDGET:
+                self._idle.append(server)
+                return
+        server.kill()
+
+
+def get_server_pool():
+    """The pool of this process, created on first use (and again after a fork)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = ServerPool(get_server_classes())
+        return _pool
+
+
+def compile_java(build_dir, source_file):
+    """
+    Compiles a submission with the resident javac.
+    :return: CompletedProcess with javac's exit code and diagnostics, like subprocess.run.
+    """
+    pool = get_server_pool()
+    server = pool.acquire()
+    try:
+        reply = server.request(COMPILE_TIMEOUT_SECONDS, 'COMPILE', build_dir, source_file)
+    except ServerExited:
+        raise subprocess.TimeoutExpired('javac', COMPILE_TIMEOUT_SECONDS)
+    finally:
+        pool.release(server)
+
+    log_path = os.path.join(build_dir, 'javac.log')
+    with open(log_path, 'rb') as log_file:
+        diagnostics = log_file.read()
+    os.unlink(log_path)
+    return subprocess.CompletedProcess(['javac', source_file], int(reply[1]), b'', diagnostics)
+
+
+def run_main(class_dir, input_path, output_path, error_path, time_limit_ms, wall_ms, output_bytes):
+    """
+    Runs Main from class_dir in a resident JVM.
+    :return: Usage of the run; memory_kb is the peak heap growth during the run.
+    """
+    pool = get_server_pool()
+    server = pool.acquire()
+    started = time.monotonic()
+    try:
+        reply = server.request(
+            wall_ms / 1000 + REPLY_GRACE_SECONDS,
+            'RUN', class_dir, input_path, output_path, error_path, time_limit_ms, wall_ms, output_bytes,
+        )
+        exit_code, cpu_time_ms, wall_time_ms, memory_kb, timed_out, restart = (int(value) for value in reply[1:7])
+        if restart:
+            # The server halts after this reply; never hand it out again
+            server.kill()
+        return Usage(exit_code, 0, cpu_time_ms, wall_time_ms, memory_kb, bool(timed_out))
+    except ServerExited:
+        # System.exit in the submission, or the server was killed
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        exit_code, signal = server.exit_status()
+        return Usage(exit_code, signal, elapsed_ms, elapsed_ms, 0, elapsed_ms > wall_ms)
+    finally:
+        pool.release(server)
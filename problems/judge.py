@@ -0,0 +1,530 @@
+# problems/judge.py
+
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import metrics
+from .models import Problem, Submission, TestCase, TestResult, VerdictCache
+from .signals import submission_judged
+from .checkers import CheckerError, ExactChecker, FloatChecker, ProgramChecker, TokenChecker
+from .testdata import preview
+from .utils import MAX_DISPLAY_SIZE, RunResult, compile_code, run_compiled
+
+logger = logging.getLogger(__name__)
+
+# Statuses a submission moves through before it has a verdict
+PENDING = 'Pending'
+RUNNING = 'Running'
+UNFINISHED_STATUSES = (PENDING, RUNNING)
+
+# Verdicts that depend only on the source and the test data, so they can be
+# reused for identical resubmissions. Time limits depend on machine load and
+# server errors are transient, so TLE and Error are never memoized.
+MEMOIZABLE_STATUSES = ('AC', 'WA', 'MLE', 'OLE', 'RE', 'CE')
+
+# Submission fields written when a verdict is stored
+VERDICT_FIELDS = ['status', 'output', 'error', 'test_results', 'judged_at', 'source_hash',
+                  'cpu_time_ms', 'memory_kb']
+
+# Test cases are read from the database this many at a time while judging
+TESTCASE_CHUNK_SIZE = 32
+
+_test_pool = None
+_test_pool_lock = threading.Lock()
+
+
+def get_test_pool():
+    """
+    Thread pool shared by every submission judged in this process. Its size is the
+    global core budget, so concurrent submissions never run more than
+    JUDGE_CORE_BUDGET test cases at once between them.
+    """
+    global _test_pool
+    with _test_pool_lock:
+        if _test_pool is None:
+            _test_pool = ThreadPoolExecutor(
+                max_workers=settings.JUDGE_CORE_BUDGET, thread_name_prefix='judge-test'
+            )
+        return _test_pool
+
+
+def load_checker(problem):
+    """
+    Checker configured for a problem; custom checker programs are compiled here.
+    The caller must close() it when judging is done.
+    """
+    if problem.checker == 'tokens':
+        return TokenChecker()
+    if problem.checker == 'float':
+        return FloatChecker(problem.float_tolerance)
+    if problem.checker == 'custom':
+        build, compile_error = compile_code(problem.checker_code, problem.checker_language)
+        if build is None:
+            raise CheckerError(f"Checker does not compile:{compile_error}")
+        return ProgramChecker(build)
+    return ExactChecker()
+
+
+def evaluate_testcase(build, testcase, input_path, answer_path, problem, checker, cancelled=None):
+    """
+    Runs one test case under the problem's limits and checks the output against the
+    expected answer. The program reads input_path directly as its stdin.
+    :return: Tuple of (test result dict, error message) or None if judging was cancelled.
+    """
+    if cancelled is not None and cancelled.is_set():
+        return None
+
+    try:
+        run = run_compiled(
+            build, time_limit_ms=problem.time_limit_ms, memory_limit_mb=problem.memory_limit_mb,
+            input_path=input_path, answer_path=answer_path, checker=checker,
+        )
+    except CheckerError:
+        raise
+    except Exception as run_error:
+        logger.exception("Test case %s crashed", testcase.id)
+        run = RunResult(verdict='RE', error=f"Compilation/Runtime Error: {str(run_error)}")
+
+    # Only the start of big test files is shown in verdicts
+    input_text = preview(input_path, MAX_DISPLAY_SIZE)
+    expected_text = preview(answer_path, MAX_DISPLAY_SIZE)
+    out = run.stdout
+    if run.error:
+        result, error = compile_or_runtime_failure(testcase, input_text, expected_text, run.error, run.verdict)
+    elif not run.passed:
+        error_lines = [
+            f"Wrong Answer",
+            f"Input: {input_text}",
+            f"Expected Output: {expected_text}",
+            f"Your Output: {out}"
+        ]
+        result, error = {
+            'testcase_id': testcase.id,
+            'input_data': input_text,
+            'expected_output': expected_text,
+            'status': 'FAILED',
+            'verdict': 'WA',
+            'output': out
+        }, "\n".join(error_lines)
+    else:
+        result, error = {
+            'testcase_id': testcase.id,
+            'input_data': input_text,
+            'expected_output': expected_text,
+            'status': 'PASSED',
+            'verdict': 'AC',
+            'output': out
+        }, ''
+    result.update(cpu_time_ms=run.cpu_time_ms, wall_time_ms=run.wall_time_ms, memory_kb=run.memory_kb)
+    return result, error
+
+
+def compile_or_runtime_failure(testcase, input_text, expected_text, err, verdict):
+    """Test result and error message for a test case that did not produce output."""
+    error_lines = [
+        f"Compilation/Runtime Error",
+        f"Input: {input_text}",
+        f"Error Details:",
+        f"{err}"
+    ]
+    return {
+        'testcase_id': testcase.id,
+        'input_data': input_text,
+        'expected_output': expected_text,
+        'status': 'ERROR',
+        'verdict': verdict,
+        'output': f"Error: {err}"
+    }, "\n".join(error_lines)
+
+
+def run_testcases(build, testcases, problem, checker, prejudged=None):
+    """
+    Runs test cases in parallel and yields (test result, error) pairs in test order.
+    At most JUDGE_MAX_PARALLEL_TESTS cases of this submission are in flight at once.
+    Stops at the first failing case and cancels the ones that have not started.
+    :param testcases: Iterable of test cases; it is consumed lazily, so a streaming
+                      iterator is only read as far as judging gets.
+    :param prejudged: Dict of test case id to a passed result that is reused as is.
+    """
+    pool = get_test_pool()
+    cancelled = threading.Event()
+    remaining = iter(testcases)
+    in_flight = deque()
+    prejudged = prejudged or {}
+    # Runs in pool threads count towards the submission being judged here
+    timings = metrics.current()
+
+    def fill():
+        while len(in_flight) < settings.JUDGE_MAX_PARALLEL_TESTS:
+            testcase = next(remaining, None)
+            if testcase is None:
+                return
+            if testcase.id in prejudged:
+                done = Future()
+                done.set_result((prejudged[testcase.id], ''))
+                in_flight.append(done)
+                continue
+            # Test files are materialized here so pool threads never query the database
+            with metrics.span('testdata_fetch'):
+                input_path, answer_path = testcase.input_path(), testcase.answer_path()
+            in_flight.append(pool.submit(
+                metrics.bind(evaluate_testcase, timings), build, testcase, input_path, answer_path,
+                problem, checker, cancelled,
+            ))
+
+    try:
+        fill()
+        while in_flight:
+            result, error = in_flight.popleft().result()
+            yield result, error
+            if error:
+                return
+            fill()
+    finally:
+        # Reached on the first failure or when the caller stops early
+        cancelled.set()
+        for future in in_flight:
+            future.cancel()
+        # Releases the database cursor of a streaming iterator
+        if hasattr(remaining, 'close'):
+            remaining.close()
+
+
+def source_hash(code):
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def apply_cached_verdict(submission, testdata_version):
+    """
+    Copies the memoized verdict of an identical earlier submission, if there is one.
+    The caller is responsible for saving the submission.
+    :return: True if a verdict was found.
+    """
+    if not submission.source_hash:
+        submission.source_hash = source_hash(submission.code)
+    cached = VerdictCache.objects.filter(
+        problem_id=submission.problem_id,
+        testdata_version=testdata_version,
+        language=submission.language,
+        source_hash=submission.source_hash,
+    ).first()
+    if cached is None:
+        return False
+
+    submission.status = cached.status
+    submission.output = cached.output
+    submission.error = cached.error
+    submission.test_results = cached.test_results
+    submission.cpu_time_ms = cached.cpu_time_ms
+    submission.memory_kb = cached.memory_kb
+    submission.judged_at = timezone.now()
+    # Its per-test rows are copied once the submission is saved (copy_test_results)
+    submission.verdict_source_id = cached.submission_id
+    return True
+
+
+def summarize_usage(submission, test_results):
+    """Largest CPU time and peak memory over the test cases that were run."""
+    measured = [result for result in test_results if 'cpu_time_ms' in result]
+    submission.cpu_time_ms = max((result['cpu_time_ms'] for result in measured), default=None)
+    submission.memory_kb = max((result['memory_kb'] for result in measured), default=None)
+
+
+def failed_test_summary(test_results):
+    """
+    What a verdict keeps of its test results: the entry of the failing test case,
+    with its input, expected and actual output previews. Every test case, passed
+    or not, has its TestResult row.
+    :return: List holding the failing entry, or empty when every test case passed.
+    """
+    return [result for result in test_results if result.get('status') != 'PASSED'][-1:]
+
+
+def remember_verdict(submission, testdata_version, replace=False):
+    """
+    Stores a deterministic verdict so identical resubmissions skip judging.
+    :param replace: Overwrite an existing entry (after a rejudge) instead of keeping it.
+    """
+    if submission.status not in MEMOIZABLE_STATUSES:
+        if replace:
+            VerdictCache.objects.filter(
+                problem_id=submission.problem_id, testdata_version=testdata_version,
+                language=submission.language, source_hash=submission.source_hash,
+            ).delete()
+        return
+    store = VerdictCache.objects.update_or_create if replace else VerdictCache.objects.get_or_create
+    store(
+        problem_id=submission.problem_id,
+        testdata_version=testdata_version,
+        language=submission.language,
+        source_hash=submission.source_hash,
+        defaults={
+            'status': submission.status,
+            'output': submission.output,
+            'error': submission.error,
+            'test_results': submission.test_results,
+            'cpu_time_ms': submission.cpu_time_ms,
+            'memory_kb': submission.memory_kb,
+            'submission_id': submission.pk,
+        },
+    )
+
+
+def sample_run_key(user_id, problem, language, code_hash):
+    """Cache key of a sample run; anything that could change its verdicts is part of it."""
+    return (f"sample-run:{user_id}:{problem.id}:{problem.testdata_version}:{problem.time_limit_ms}:"
+            f"{problem.memory_limit_mb}:{language}:{code_hash}")
+
+
+# What a reused sample result keeps: passed results only ever become TestResult
+# rows, so the test text and output are left out of the cache and the submission
+SAMPLE_RESULT_FIELDS = ('testcase_id', 'status', 'verdict', 'cpu_time_ms', 'wall_time_ms', 'memory_kb')
+
+
+def remember_sample_run(user_id, problem, language, code_hash, test_results):
+    """Keeps the passed results of a sample run for a following submit of the same code."""
+    passed = [
+        {field: result[field] for field in SAMPLE_RESULT_FIELDS if field in result}
+        for result in test_results if result.get('status') == 'PASSED'
+    ]
+    if passed:
+        cache.set(sample_run_key(user_id, problem, language, code_hash), passed,
+                  settings.JUDGE_SAMPLE_RUN_TTL)
+
+
+def apply_sample_run(submission, problem):
+    """
+    Attaches the results of the user's recent sample run of the same code, so the
+    judge only runs the remaining test cases.
+    :return: True if a sample run was found.
+    """
+    passed = cache.get(sample_run_key(submission.user_id, problem, submission.language, submission.source_hash))
+    if not passed:
+        return False
+    submission.prejudged_results = passed
+    return True
+
+
+def judge_submission(submission, force=False):
+    """
+    Runs a submission against every test case of its problem and stores the verdict.
+    :param submission: A Submission in the Running (or Pending) state.
+    :param force: Run it even if an identical source has a memoized verdict, and
+                  replace that verdict; always the case for a submission that was
+                  judged before (a rejudge).
+    :return: The same submission, with status, output, error, the failing test's
+             summary in test_results, resource usage and per-phase timings filled in.
+    """
+    first_verdict = submission.judged_at is None
+    force = force or not first_verdict
+    timings = metrics.Timings(submission.language)
+    with metrics.tracking(timings):
+        if submission.started_at is not None and submission.judged_at is None:
+            # Only on the first judging; a rejudge was submitted long ago
+            metrics.observe('queue_wait', (submission.started_at - submission.submitted_at).total_seconds())
+        problem = Problem.objects.only(
+            'id', 'testdata_version', *Problem.JUDGING_FIELDS
+        ).get(pk=submission.problem_id)
+        cached = not force and apply_cached_verdict(submission, problem.testdata_version)
+        if not cached:
+            if not submission.source_hash:
+                submission.source_hash = source_hash(submission.code)
+            # Writes the TestResult rows as the test cases finish
+            judge_testcases(submission, problem)
+            submission.judged_at = timezone.now()
+
+        # The final save is timed for /metrics but cannot be part of the timings it stores
+        submission.timings = timings.as_dict()
+        with metrics.span('db_save'), transaction.atomic():
+            submission.save(update_fields=VERDICT_FIELDS + ['timings'])
+            if cached:
+                copy_test_results(submission.verdict_source_id, [submission])
+    remember_verdict(submission, problem.testdata_version, replace=force)
+    submission_judged.send(sender=Submission, submission=submission, first_verdict=first_verdict)
+    metrics.count('submissions_judged', language=submission.language, status=submission.status)
+    metrics.flush()
+    return submission
+
+
+def judge_testcases(submission, problem):
+    """
+    Compiles the submission and runs it, saving a TestResult row per test case;
+    sets status, output, error, test_results and resource usage.
+    """
+    output = ''
+    error = ''
+    status = 'AC'
+    test_results = []
+
+    # The judge works from the test data store; the text columns are only read to
+    # materialize a file that is missing on this host
+    testcases = TestCase.objects.filter(problem_id=submission.problem_id).order_by('id').only(
+        'id', 'input_hash', 'output_hash'
+    )
+    build = None
+    checker = None
+    # Rows of an earlier judging of this submission (a rejudge)
+    TestResult.objects.filter(submission=submission).delete()
+    try:
+        if not testcases.exists():
+            error = 'No test cases found for this problem.'
+            status = 'WA'
+        else:
+            prejudged = {result['testcase_id']: result for result in submission.prejudged_results}
+            # Compile once; every test case runs the same build. When a sample run
+            # already passed every test case there is nothing left to run.
+            if testcases.exclude(id__in=prejudged).exists():
+                build, compile_error = compile_code(submission.code, submission.language)
+            else:
+                build, compile_error = None, ''
+            if build is None and compile_error:
+                first = testcases.first()
+                with metrics.span('testdata_fetch'):
+                    input_text = preview(first.input_path(), MAX_DISPLAY_SIZE)
+                    expected_text = preview(first.answer_path(), MAX_DISPLAY_SIZE)
+                result, error = compile_or_runtime_failure(first, input_text, expected_text, compile_error, 'CE')
+                test_results.append(result)
+                test_result_row(submission, 1, result).save()
+                status = 'CE'
+            else:
+                checker = load_checker(problem) if build is not None else None
+                # Test cases are streamed in chunks: the first one starts before the
+                # rest are fetched, and the ones after a failure are never read
+                stream = testcases.iterator(chunk_size=TESTCASE_CHUNK_SIZE)
+                for result, case_error in run_testcases(build, stream, problem, checker, prejudged):
+                    test_results.append(result)
+                    # Written as they come in, so the events stream can show progress
+                    with metrics.span('db_save'):
+                        test_result_row(submission, len(test_results), result).save()
+                    if case_error:
+                        error = case_error
+                        status = result['verdict']
+
+        if status == 'AC':
+            output = "All test cases passed! Solution submitted successfully."
+    except Exception as e:
+        logger.exception("Submission %s: judge failed", submission.id)
+        error = f"Server error during code execution: {str(e)}"
+        status = 'Error'
+    finally:
+        if build is not None:
+            build.cleanup()
+        if checker is not None:
+            checker.close()
+
+    summarize_usage(submission, test_results)
+    submission.status = status
+    submission.output = output
+    submission.error = error
+    submission.test_results = failed_test_summary(test_results)
+
+
+def test_result_row(submission, position, result):
+    """TestResult row for one entry of a submission's test_results."""
+    return TestResult(
+        submission=submission,
+        testcase_id=result.get('testcase_id'),
+        position=position,
+        status=result.get('verdict', 'AC' if result.get('status') == 'PASSED' else 'WA'),
+        cpu_time_ms=result.get('cpu_time_ms', 0),
+        wall_time_ms=result.get('wall_time_ms', 0),
+        memory_kb=result.get('memory_kb', 0),
+    )
+
+
+def copy_test_results(source_id, submissions):
+    """
+    Gives submissions whose verdict was copied the TestResult rows of the judging
+    it came from (none when that submission is gone).
+    :param source_id: Id of the judged submission.
+    """
+    rows = list(TestResult.objects.filter(submission_id=source_id).order_by('position').values(
+        'testcase_id', 'position', 'status', 'cpu_time_ms', 'wall_time_ms', 'memory_kb'
+    )) if source_id is not None else []
+    TestResult.objects.filter(submission__in=submissions).delete()
+    TestResult.objects.bulk_create(
+        [TestResult(submission=submission, **row) for submission in submissions for row in rows], batch_size=500
+    )
+
+
+def claim_next_submission():
+    """
+    Atomically moves the oldest Pending submission to Running.
+    :return: The claimed Submission, or None if the queue is empty.
+    """
+    while True:
+        with transaction.atomic():
+            pending = Submission.objects.filter(status=PENDING).order_by('submitted_at', 'id')
+            # Row locks keep two workers from picking the same job on databases
+            # that support them; the conditional update below covers SQLite.
+            if connection.features.has_select_for_update_skip_locked:
+                pending = pending.select_for_update(skip_locked=True)
+            submission = pending.first()
+            if submission is None:
+                return None
+
+            started_at = timezone.now()
+            claimed = Submission.objects.filter(pk=submission.pk, status=PENDING).update(
+                status=RUNNING, started_at=started_at
+            )
+        if claimed:
+            submission.status = RUNNING
+            submission.started_at = started_at
+            return submission
+
+
+def requeue_stale_submissions(max_age_seconds):
+    """
+    Puts Running submissions whose worker died back in the queue.
+    :return: Number of submissions requeued.
+    """
+    cutoff = timezone.now() - timedelta(seconds=max_age_seconds)
+    return Submission.objects.filter(status=RUNNING, started_at__lt=cutoff).update(
+        status=PENDING, started_at=None
+    )
+
+
+def fail_submission(submission, exception):
+    """
+    Gives a submission whose judging crashed outside the test case loop (e.g. a
+    database error on save) the Error verdict, so it is not left Running.
+    """
+    try:
+        Submission.objects.filter(pk=submission.pk, status=RUNNING).update(
+            status='Error', error=f"Server error while judging: {exception}", judged_at=timezone.now()
+        )
+    except Exception:
+        # The database itself is failing; the stale requeue of the workers picks the job up again
+        logger.exception("Submission %s: could not record the judge failure", submission.id)
+
+
+def process_next_submission():
+    """
+    Claims and judges one queued submission.
+    :return: The judged Submission, or None if there was nothing to do.
+    """
+    submission = claim_next_submission()
+    if submission is None:
+        return None
+
+    started = time.monotonic()
+    try:
+        judge_submission(submission)
+    except Exception as e:
+        fail_submission(submission, e)
+        raise
+    logger.info(
+        "Judged submission %s (%s) in %.2fs: %s",
+        submission.id, submission.language, time.monotonic() - started, submission.status
+    )
+    return submission
@@ -0,0 +1,97 @@
+# problems/listing.py
+#
+# Pages of the problem list. A page is cut by problem id (keyset pagination), so
+# a deep page costs the same as the first, and only the columns the list shows
+# are read: the title, the topic name and the start of the statement. Each page
+# is cached per topic under a version key; signals.py drops the version of a
+# topic when one of its problems changes, which orphans all of its cached pages.
+# Pages are only cached in a shared cache (CACHE_IS_SHARED): with a per-process
+# cache, a change made by another process would never drop the stale pages.
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.functions import Substr
+
+from .models import Problem
+
+# Characters of the statement the list shows a few words of
+EXCERPT_CHARS = 300
+
+
+def parse_cursor(value):
+    """A page cursor (problem id) from the query string; None when absent or malformed."""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def version_key(topic_id):
+    return f"problem_list:version:{topic_id or 'all'}"
+
+
+def listing_version(topic_id):
+    """Current version of a topic's cached pages (None: the unfiltered list)."""
+    key = version_key(topic_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(*topic_ids):
+    """Orphans the cached pages of the given topics and of the unfiltered list."""
+    cache.delete_many([version_key(topic_id) for topic_id in {*topic_ids, None}])
+
+
+def listing_page(topic_id=None, after=None, before=None):
+    """
+    One page of the problem list, served from the cache when possible.
+    :param topic_id: Only problems of this topic; None for all of them.
+    :param after: Cursor of the next page: start after this problem id.
+    :param before: Cursor of the previous page: end before this problem id.
+    :return: Dict with 'problems' (dicts of id, title, topic_name, excerpt) and
+             the 'previous' / 'next' cursors, None where there is no such page.
+    """
+    if not settings.CACHE_IS_SHARED:
+        return load_page(topic_id, after, before)
+    key = f"problem_list:page:{topic_id or 'all'}:{listing_version(topic_id)}:{after or ''}:{before or ''}"
+    page = cache.get(key)
+    if page is None:
+        page = load_page(topic_id, after, before)
+        cache.set(key, page, settings.PROBLEM_LIST_CACHE_TTL)
+    return page
+
+
+def load_page(topic_id, after, before):
+    size = settings.PROBLEM_LIST_PAGE_SIZE
+    problems = Problem.objects.all()
+    if topic_id is not None:
+        problems = problems.filter(topic_id=topic_id)
+    rows = problems.annotate(
+        topic_name=F('topic__name'), excerpt=Substr('description', 1, EXCERPT_CHARS)
+    ).values('id', 'title', 'topic_name', 'excerpt')
+
+    if before is not None:
+        # Walk back from the cursor, then put the page in list order again
+        rows = list(rows.filter(id__lt=before).order_by('-id')[:size + 1])
+        has_previous = len(rows) > size
+        rows = rows[:size][::-1]
+        has_next = True
+    else:
+        if after is not None:
+            rows = rows.filter(id__gt=after)
+        rows = list(rows.order_by('id')[:size + 1])
+        has_next = len(rows) > size
+        rows = rows[:size]
+        has_previous = after is not None
+
+    return {
+        'problems': rows,
+        'previous': rows[0]['id'] if rows and has_previous else None,
+        'next': rows[-1]['id'] if rows and has_next else None,
+    }
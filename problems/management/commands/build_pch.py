@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from problems.utils import prepare_toolchains
+
+
+class Command(BaseCommand):
+    help = 'Build the precompiled headers of the C/C++ toolchain profiles.'
+
+    def handle(self, *args, **options):
+        for lang, directory in prepare_toolchains().items():
+            if directory:
+                self.stdout.write(self.style.SUCCESS(f"{lang}: precompiled header in {directory}"))
+            else:
+                self.stdout.write(self.style.WARNING(f"{lang}: precompiled header could not be built"))
@@ -0,0 +1,52 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from problems.query_plans import SEQUENTIAL_SCAN_PATTERNS, audit, hot_queries, seed
+
+
+class Command(BaseCommand):
+    help = ('EXPLAIN the hot queries of the site and the judge against a seeded large dataset '
+            'in a throwaway database; fails if any of them scans a whole table.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Users to seed.')
+        parser.add_argument('--topics', type=int, default=50, help='Topics to seed.')
+        parser.add_argument('--problems', type=int, default=2000, help='Problems to seed.')
+        parser.add_argument('--submissions', type=int, default=100000, help='Submissions to seed.')
+        parser.add_argument('--tests', type=int, default=5, help='Test cases per problem.')
+        parser.add_argument('--seed', type=int, default=1, help='Seed of the generated data.')
+        parser.add_argument('--plans', action='store_true', help='Print every plan, not only failing ones.')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SEQUENTIAL_SCAN_PATTERNS:
+            raise CommandError(f"Query plans of {connection.vendor} databases are not supported.")
+
+        # Everything seeded goes to a test database that is dropped afterwards
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f"Seeding {options['submissions']} submissions...")
+            params = seed(options['users'], options['topics'], options['problems'], options['submissions'],
+                          options['tests'], random.Random(options['seed']))
+            results = audit(hot_queries(**params))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        failures = 0
+        for name, plan, scans in results:
+            if scans:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f"SCAN  {name}: reads all of {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok    {name}"))
+            if scans or options['plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f"        {line}")
+
+        if failures:
+            raise CommandError(f"{failures} of {len(results)} hot queries do a sequential scan.")
+        self.stdout.write(self.style.SUCCESS(f"All {len(results)} hot queries use an index."))
@@ -0,0 +1,93 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from problems.benchmark import WORKLOADS, compare, load_results, run_benchmark
+from problems.utils import prepare_toolchains
+
+COMPONENTS = ('compile', 'judge', 'view')
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the judge on a synthetic problem in a throwaway database and write '
+            'p50/p95/p99 latencies and throughput per component as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--languages', default='c,cpp,java,python',
+                            help='Comma-separated languages; ones without a toolchain are skipped.')
+        parser.add_argument('--kinds', default='AC,WA,TLE,OLE,CE',
+                            help='Comma-separated submission kinds: AC, WA, TLE, OLE, CE.')
+        parser.add_argument('--components', default=','.join(COMPONENTS),
+                            help='Comma-separated parts to measure: compile (compile_code and '
+                                 'run_compiled), judge (judge_submission), view (problem page).')
+        parser.add_argument('--tests', type=int, default=10, help='Test cases of the synthetic problem.')
+        parser.add_argument('--numbers', type=int, default=1000, help='Integers per test case input.')
+        parser.add_argument('--iterations', type=int, default=3, help='Submissions per language and kind.')
+        parser.add_argument('--time-limit', type=int, default=1000, help='Time limit of the problem in ms.')
+        parser.add_argument('--seed', type=int, default=1, help='Seed of the generated test data.')
+        parser.add_argument('--output', help='Write the JSON results to this file.')
+        parser.add_argument('--compare', help='Earlier JSON results to compare against.')
+        parser.add_argument('--threshold', type=float, default=0.10,
+                            help='Slowdown (fraction) that counts as a regression in --compare.')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error when --compare finds a regression.')
+
+    def handle(self, *args, **options):
+        languages = self._choices(options['languages'], WORKLOADS)
+        kinds = self._choices(options['kinds'], WORKLOADS['python'])
+        components = self._choices(options['components'], COMPONENTS)
+        previous = load_results(options['compare']) if options['compare'] else None
+
+        prepare_toolchains()
+        # Everything the benchmark seeds goes to a test database that is dropped afterwards
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = run_benchmark(
+                languages, kinds, options['tests'], options['numbers'], options['iterations'],
+                options['time_limit'], options['seed'], components,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self._report(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if previous is not None:
+            regressions = compare(previous, results, options['threshold'])
+            for component, metric, before, after, change in regressions:
+                self.stdout.write(self.style.WARNING(
+                    f"Regression: {component} {metric} {before:.1f}ms -> {after:.1f}ms (+{change:.0%})"
+                ))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS(f"No regression above {options['threshold']:.0%}."))
+            elif options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} regression(s) found.")
+
+    def _choices(self, value, allowed):
+        chosen = [item.strip() for item in value.split(',') if item.strip()]
+        unknown = [item for item in chosen if item not in allowed]
+        if unknown:
+            raise CommandError(f"Unknown value(s): {', '.join(unknown)}")
+        return chosen
+
+    def _report(self, results):
+        if results['config']['skipped_languages']:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped (no toolchain): {', '.join(results['config']['skipped_languages'])}"
+            ))
+        self.stdout.write(f"{'component':<20} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+                          f"{'per s':>8} {'peak rss kb':>12}")
+        for component, stats in sorted(results['components'].items()):
+            rss = max(stats['peak_rss_kb'].values(), default=0)
+            self.stdout.write(
+                f"{component:<20} {stats['count']:>5} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+                f"{stats['p99_ms']:>9.1f} {stats['per_second'] or 0:>8.1f} {rss:>12}"
+            )
+        self.stdout.write(f"Total {results['elapsed_seconds']:.1f}s")
@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from problems.judge import process_next_submission, requeue_stale_submissions
+from problems.utils import prepare_toolchains
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run a judge worker that picks Pending submissions from the queue and judges them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Number of submissions judged at the same time by this worker.')
+        parser.add_argument('--poll-interval', type=float, default=0.5,
+                            help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Requeue Running submissions older than this many seconds, on startup '
+                                 'and then periodically.')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the queue and exit instead of polling forever.')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_submissions(options['stale_after'])
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale submission(s).")
+
+        # Precompiled headers are built once here instead of slowing down a submission
+        prepare_toolchains()
+
+        concurrency = max(1, options['concurrency'])
+        self.stdout.write(self.style.SUCCESS(f"Judge worker started with {concurrency} slot(s)."))
+
+        threads = [
+            threading.Thread(target=self._work, args=(options['poll_interval'], options['once']), daemon=True)
+            for _ in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        if not options['once']:
+            # Jobs of a worker that died while this one runs would otherwise wait for a restart
+            threading.Thread(target=self._requeue, args=(options['stale_after'],), daemon=True).start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Judge worker stopping.")
+
+    def _work(self, poll_interval, once):
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    submission = process_next_submission()
+                except Exception:
+                    # Keep the worker alive; the job got the Error verdict, or is requeued once stale
+                    logger.exception("Judge worker failed to process a submission")
+                    submission = None
+                if submission is None:
+                    if once:
+                        return
+                    time.sleep(poll_interval)
+        finally:
+            connection.close()
+
+    def _requeue(self, stale_after):
+        interval = max(1, min(stale_after, 60))
+        while True:
+            time.sleep(interval)
+            close_old_connections()
+            try:
+                requeued = requeue_stale_submissions(stale_after)
+            except Exception:
+                logger.exception("Judge worker failed to requeue stale submissions")
+                continue
+            if requeued:
+                logger.warning("Requeued %d stale submission(s)", requeued)
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from problems.judge import UNFINISHED_STATUSES
+from problems.models import Submission
+from problems.rejudge import rejudge, requeue
+from problems.utils import prepare_toolchains
+
+
+class Command(BaseCommand):
+    help = 'Rejudge submissions in bulk; identical sources of a problem are judged once.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problem', type=int, action='append', default=[],
+                            help='Only submissions to this problem (repeatable).')
+        parser.add_argument('--language', action='append', default=[],
+                            help='Only submissions in this language (repeatable).')
+        parser.add_argument('--status', action='append', default=[],
+                            help='Only submissions with this verdict, e.g. WA (repeatable).')
+        parser.add_argument('--submission', type=int, action='append', default=[],
+                            help='Only this submission (repeatable).')
+        parser.add_argument('--all', action='store_true',
+                            help='Rejudge every submission when no filter is given.')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Number of distinct sources judged at the same time.')
+        parser.add_argument('--queue', action='store_true',
+                            help='Requeue the submissions for the judge workers instead of judging here.')
+
+    def handle(self, *args, **options):
+        submissions = Submission.objects.exclude(status__in=UNFINISHED_STATUSES)
+        filters = {
+            'problem_id__in': options['problem'],
+            'language__in': options['language'],
+            'status__in': options['status'],
+            'id__in': options['submission'],
+        }
+        filters = {lookup: values for lookup, values in filters.items() if values}
+        if not filters and not options['all']:
+            raise CommandError('Give --problem, --language, --status or --submission, or --all.')
+        submissions = submissions.filter(**filters)
+
+        if options['queue']:
+            count = requeue(submissions)
+            self.stdout.write(self.style.SUCCESS(f"Requeued {count} submission(s)."))
+            return
+
+        prepare_toolchains()
+        done = [0]
+
+        def report(judged, group_size):
+            done[0] += group_size
+            self.stdout.write(f"  {judged.status:<5} submission {judged.id} (+{group_size - 1} identical), "
+                              f"{done[0]} done")
+
+        stats = rejudge(submissions, workers=options['workers'], on_group_done=report)
+        seconds = max(stats.seconds, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rejudged {stats.submissions} submission(s) from {stats.groups} distinct source(s) "
+            f"in {stats.seconds:.2f}s: {stats.submissions / seconds:.1f} submissions/s, "
+            f"{stats.groups / seconds:.1f} sources judged/s."
+        ))
@@ -0,0 +1,280 @@
+# problems/metrics.py
+#
+# Timing spans for the judge's hot path. Every span goes to two places:
+#
+#   * a per-process histogram by phase and language, which this process writes
+#     to JUDGE_METRICS_DIR after each submission and every
+#     JUDGE_METRICS_FLUSH_SECONDS; /metrics merges the files of all web and judge
+#     worker processes into the Prometheus text format.
+#   * the Timings of the submission being judged, if any, which the judge stores
+#     in Submission.timings.
+#
+# Phases: queue_wait, testdata_fetch, source_write, compile, run, compare, db_save.
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# A file not rewritten for this many flush intervals belongs to a process that is gone
+STALE_FLUSHES = 5
+
+_local = threading.local()
+_lock = threading.Lock()
+_histograms = {}
+_counters = defaultdict(float)
+# (pid, id) of this process's file, and the pid the periodic flush runs in
+_process = None
+_flusher_pid = None
+
+
+class Timings:
+    """Time spent per phase while judging one submission; shared by its test threads."""
+
+    def __init__(self, language):
+        self.language = language
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            phase_stats = self.phases.setdefault(phase, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            phase_stats['count'] += 1
+            phase_stats['total_ms'] += ms
+            phase_stats['max_ms'] = max(phase_stats['max_ms'], ms)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                phase: {'count': stats['count'], 'total_ms': round(stats['total_ms'], 2),
+                        'max_ms': round(stats['max_ms'], 2)}
+                for phase, stats in self.phases.items()
+            }
+
+
+def current():
+    """Timings of the submission this thread is working on, or None."""
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def tracking(timings):
+    """Attributes the spans of this thread to timings while the block runs."""
+    previous = current()
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+def bind(function, timings):
+    """Wraps function so spans it records in another thread count for timings."""
+    def bound(*args, **kwargs):
+        with tracking(timings):
+            return function(*args, **kwargs)
+    return bound
+
+
+def observe(phase, seconds, language=None):
+    """Records one duration of a phase."""
+    timings = current()
+    if language is None:
+        language = timings.language if timings is not None else ''
+    with _lock:
+        histogram = _histograms.get((phase, language))
+        if histogram is None:
+            histogram = _histograms[(phase, language)] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram['buckets'][index] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+@contextmanager
+def span(phase, language=None):
+    """Times the block as one occurrence of phase."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(phase, time.monotonic() - started, language)
+
+
+def count(name, amount=1, **labels):
+    """Adds to a counter, e.g. count('submissions_judged', language='c', status='AC')."""
+    with _lock:
+        _counters[(name, tuple(sorted(labels.items())))] += amount
+
+
+def _after_fork():
+    global _lock
+    # The parent keeps reporting its own numbers; a child starts from zero
+    _lock = threading.Lock()
+    _histograms.clear()
+    _counters.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def process_id():
+    """
+    Identifies this process's file. Worked out on use rather than at import, so a
+    process forked after importing this module gets a file of its own; a restarted
+    process with a reused pid gets a new one too.
+    """
+    global _process
+    pid = os.getpid()
+    if _process is None or _process[0] != pid:
+        _process = (pid, f'{pid}-{int(time.time())}')
+    return _process[1]
+
+
+def flush_interval():
+    return max(1, settings.JUDGE_METRICS_FLUSH_SECONDS)
+
+
+def start_flusher():
+    """Flushes this process's metrics every interval, so an idle process is not taken for a gone one."""
+    global _flusher_pid
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+
+    def flush_forever():
+        while True:
+            time.sleep(flush_interval())
+            flush()
+
+    threading.Thread(target=flush_forever, name='metrics-flush', daemon=True).start()
+
+
+def metrics_dir():
+    return settings.JUDGE_METRICS_DIR or None
+
+
+def flush():
+    """Writes this process's metrics to its file in JUDGE_METRICS_DIR."""
+    directory = metrics_dir()
+    if directory is None:
+        return
+    start_flusher()
+    with _lock:
+        snapshot = {
+            'histograms': [
+                {'phase': phase, 'language': language, **histogram}
+                for (phase, language), histogram in _histograms.items()
+            ],
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in _counters.items()
+            ],
+        }
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'judge-{process_id()}.json')
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as metrics_file:
+            json.dump(snapshot, metrics_file)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning("Could not write metrics to %s: %s", directory, e)
+
+
+def collect():
+    """
+    Merges the metrics files of every process, deleting those of processes that
+    stopped flushing.
+    :return: (histograms, counters) keyed like the in-process ones.
+    """
+    histograms = {}
+    counters = defaultdict(float)
+    directory = metrics_dir()
+    if directory is None or not os.path.isdir(directory):
+        return histograms, counters
+    stale_before = time.time() - STALE_FLUSHES * flush_interval()
+    for name in os.listdir(directory):
+        if not name.endswith(('.json', '.tmp')):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < stale_before:
+                os.remove(path)
+                continue
+            if not name.endswith('.json'):
+                continue
+            with open(path, encoding='utf-8') as metrics_file:
+                snapshot = json.load(metrics_file)
+        except (OSError, ValueError):
+            continue
+        for entry in snapshot.get('histograms', []):
+            key = (entry['phase'], entry['language'])
+            merged = histograms.setdefault(key, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], entry['buckets'])]
+            merged['sum'] += entry['sum']
+            merged['count'] += entry['count']
+        for entry in snapshot.get('counters', []):
+            counters[(entry['name'], tuple(sorted(entry['labels'].items())))] += entry['value']
+    return histograms, counters
+
+
+def format_labels(labels):
+    return ','.join(f'{key}="{str(value)}"' for key, value in labels)
+
+
+def sample_line(name, labels, value):
+    if labels:
+        return f'{name}{{{format_labels(labels)}}} {value:g}'
+    return f'{name} {value:g}'
+
+
+def render(gauges=()):
+    """
+    Prometheus text exposition of all processes' metrics.
+    :param gauges: (name, help, [(labels, value), ...]) read at scrape time.
+    """
+    histograms, counters = collect()
+    lines = [
+        '# HELP codespray_judge_phase_seconds Time spent in each judge phase.',
+        '# TYPE codespray_judge_phase_seconds histogram',
+    ]
+    for (phase, language), histogram in sorted(histograms.items()):
+        labels = (('phase', phase), ('language', language))
+        for bound, bucket_count in zip(BUCKETS, histogram['buckets']):
+            lines.append(f'codespray_judge_phase_seconds_bucket{{{format_labels(labels + (("le", bound),))}}} '
+                         f'{bucket_count}')
+        lines.append(f'codespray_judge_phase_seconds_bucket{{{format_labels(labels + (("le", "+Inf"),))}}} '
+                     f'{histogram["count"]}')
+        lines.append(f'codespray_judge_phase_seconds_sum{{{format_labels(labels)}}} {histogram["sum"]:.6f}')
+        lines.append(f'codespray_judge_phase_seconds_count{{{format_labels(labels)}}} {histogram["count"]}')
+
+    names = sorted({name for name, _labels in counters})
+    for name in names:
+        lines.append(f'# TYPE codespray_{name}_total counter')
+        for (counter_name, labels), value in sorted(counters.items()):
+            if counter_name == name:
+                lines.append(sample_line(f'codespray_{name}_total', labels, value))
+
+    for name, help_text, samples in gauges:
+        lines.append(f'# HELP codespray_{name} {help_text}')
+        lines.append(f'# TYPE codespray_{name} gauge')
+        for labels, value in samples:
+            lines.append(sample_line(f'codespray_{name}', labels, value))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:38
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_source_hash(apps, schema_editor):
+    Submission = apps.get_model('problems', 'Submission')
+    for submission in Submission.objects.filter(source_hash='').only('id', 'code').iterator():
+        submission.source_hash = hashlib.sha256(submission.code.encode('utf-8')).hexdigest()
+        submission.save(update_fields=['source_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0002_submission_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='testdata_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='source_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='VerdictCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('testdata_version', models.PositiveIntegerField()),
+                ('language', models.CharField(choices=[('c', 'C'), ('cpp', 'C++'), ('java', 'Java'), ('python', 'Python')], max_length=10)),
+                ('source_hash', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Running', 'Running'), ('AC', 'Accepted'), ('WA', 'Wrong Answer'), ('Error', 'Error')], max_length=15)),
+                ('output', models.TextField(blank=True)),
+                ('error', models.TextField(blank=True)),
+                ('test_results', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='problems.problem')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('problem', 'testdata_version', 'language', 'source_hash'), name='unique_verdict_per_source')],
+            },
+        ),
+        migrations.RunPython(backfill_source_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0003_verdict_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='memory_limit_mb',
+            field=models.PositiveIntegerField(default=256, help_text='Memory limit per test case, in megabytes.'),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='time_limit_ms',
+            field=models.PositiveIntegerField(default=2000, help_text='CPU time limit per test case, in milliseconds.'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='cpu_time_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='memory_kb',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Running', 'Running'), ('AC', 'Accepted'), ('WA', 'Wrong Answer'), ('TLE', 'Time Limit Exceeded'), ('MLE', 'Memory Limit Exceeded'), ('RE', 'Runtime Error'), ('CE', 'Compilation Error'), ('Error', 'Error')], default='Pending', max_length=15),
+        ),
+        migrations.AlterField(
+            model_name='verdictcache',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Running', 'Running'), ('AC', 'Accepted'), ('WA', 'Wrong Answer'), ('TLE', 'Time Limit Exceeded'), ('MLE', 'Memory Limit Exceeded'), ('RE', 'Runtime Error'), ('CE', 'Compilation Error'), ('Error', 'Error')], max_length=15),
+        ),
+        migrations.CreateModel(
+            name='TestResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Running', 'Running'), ('AC', 'Accepted'), ('WA', 'Wrong Answer'), ('TLE', 'Time Limit Exceeded'), ('MLE', 'Memory Limit Exceeded'), ('RE', 'Runtime Error'), ('CE', 'Compilation Error'), ('Error', 'Error')], max_length=15)),
+                ('cpu_time_ms', models.PositiveIntegerField(default=0)),
+                ('wall_time_ms', models.PositiveIntegerField(default=0)),
+                ('memory_kb', models.PositiveIntegerField(default=0)),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='problems.submission')),
+                ('testcase', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='problems.testcase')),
+            ],
+            options={
+                'ordering': ['submission', 'position'],
+            },
+        ),
+    ]
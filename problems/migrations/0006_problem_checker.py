@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0005_output_limit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='checker',
+            field=models.CharField(choices=[('exact', 'Exact match (ignoring leading/trailing whitespace)'), ('tokens', 'Token by token (any whitespace)'), ('float', 'Token by token, numbers within tolerance'), ('custom', 'Custom checker program')], default='exact', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='checker_code',
+            field=models.TextField(blank=True, help_text='Source of the custom checker. It is run as "checker input output answer" and exits with 0 to accept the output.'),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='checker_language',
+            field=models.CharField(blank=True, choices=[('c', 'C'), ('cpp', 'C++'), ('java', 'Java'), ('python', 'Python')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='float_tolerance',
+            field=models.FloatField(default=1e-06, help_text='Absolute or relative error allowed by the float checker.'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:49
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_testdata_hashes(apps, schema_editor):
+    TestCase = apps.get_model('problems', 'TestCase')
+    for testcase in TestCase.objects.filter(input_hash='').iterator():
+        testcase.input_hash = hashlib.sha256(testcase.input_data.encode('utf-8')).hexdigest()
+        testcase.output_hash = hashlib.sha256(testcase.output_data.encode('utf-8')).hexdigest()
+        testcase.save(update_fields=['input_hash', 'output_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0006_problem_checker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testcase',
+            name='input_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='testcase',
+            name='output_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_testdata_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0007_testdata_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='prejudged_results',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0008_submission_prejudged_results'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
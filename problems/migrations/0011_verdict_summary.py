@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_full_verdicts(apps, schema_editor):
+    # Entries made so far hold every test's previews and no submission to copy
+    # per-test rows from; identical sources are simply judged again
+    VerdictCache = apps.get_model('problems', 'VerdictCache')
+    VerdictCache.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='verdictcache',
+            name='cpu_time_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='verdictcache',
+            name='memory_kb',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='verdictcache',
+            name='submission',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='problems.submission'),
+        ),
+        migrations.RunPython(drop_full_verdicts, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
 
+from . import testdata
+
 LANG_CHOICES = [
     ('c', 'C'),
     ('cpp', 'C++'),
@@ -8,8 +11,28 @@ LANG_CHOICES = [
     ('python', 'Python'),
 ]
 
+STATUS_CHOICES = [
+    ('Pending', 'Pending'),
+    ('Running', 'Running'),
+    ('AC', 'Accepted'),
+    ('WA', 'Wrong Answer'),
+    ('TLE', 'Time Limit Exceeded'),
+    ('MLE', 'Memory Limit Exceeded'),
+    ('OLE', 'Output Limit Exceeded'),
+    ('RE', 'Runtime Error'),
+    ('CE', 'Compilation Error'),
+    ('Error', 'Error'),
+]
+
+CHECKER_CHOICES = [
+    ('exact', 'Exact match (ignoring leading/trailing whitespace)'),
+    ('tokens', 'Token by token (any whitespace)'),
+    ('float', 'Token by token, numbers within tolerance'),
+    ('custom', 'Custom checker program'),
+]
+
 class Topic(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
     def __str__(self):
         return self.name
 
@@ -20,25 +43,140 @@ class Problem(models.Model):
     input_desc = models.TextField(blank=True)
     output_desc = models.TextField(blank=True)
     constraints = models.TextField(blank=True)
+    time_limit_ms = models.PositiveIntegerField(default=2000, help_text='CPU time limit per test case, in milliseconds.')
+    memory_limit_mb = models.PositiveIntegerField(default=256, help_text='Memory limit per test case, in megabytes.')
+    checker = models.CharField(choices=CHECKER_CHOICES, max_length=10, default='exact')
+    float_tolerance = models.FloatField(default=1e-6, help_text='Absolute or relative error allowed by the float checker.')
+    checker_code = models.TextField(blank=True, help_text='Source of the custom checker. It is run as '
+                                    '"checker input output answer" and exits with 0 to accept the output.')
+    checker_language = models.CharField(choices=LANG_CHOICES, max_length=10, blank=True)
+    # Bumped whenever a test case, the checker or a limit changes (see signals.py)
+    testdata_version = models.PositiveIntegerField(default=1, editable=False)
+
+    # Fields that decide verdicts, besides the test cases themselves
+    CHECKER_FIELDS = ('checker', 'float_tolerance', 'checker_code', 'checker_language')
+    LIMIT_FIELDS = ('time_limit_ms', 'memory_limit_mb')
+    JUDGING_FIELDS = CHECKER_FIELDS + LIMIT_FIELDS
 
     def __str__(self):
         return self.title
 
+    def clean(self):
+        if self.checker == 'custom' and not (self.checker_code and self.checker_language):
+            raise ValidationError('A custom checker needs its code and language.')
+
 class TestCase(models.Model):
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
     input_data = models.TextField()
     output_data = models.TextField()
+    # sha256 of input_data / output_data, naming their files in the test data store
+    input_hash = models.CharField(max_length=64, blank=True, editable=False)
+    output_hash = models.CharField(max_length=64, blank=True, editable=False)
 
     def __str__(self):
         return f"TestCase for {self.problem.title}"
 
+    def input_path(self):
+        """Input file in the test data store, written from the database if missing."""
+        return self.stored_path('input_hash', 'input_data')
+
+    def answer_path(self):
+        """Expected output file in the test data store, written from the database if missing."""
+        return self.stored_path('output_hash', 'output_data')
+
+    def stored_path(self, hash_field, text_field):
+        digest = getattr(self, hash_field)
+        if not digest:
+            # bulk_create and QuerySet.update skip the pre_save hashing (signals.py);
+            # the hash is computed from the row once and saved back
+            text = TestCase.objects.values_list(text_field, flat=True).get(pk=self.pk)
+            digest = testdata.content_hash(text)
+            TestCase.objects.filter(pk=self.pk).update(**{hash_field: digest})
+            setattr(self, hash_field, digest)
+            return testdata.store(text, digest)
+        return testdata.materialize(
+            digest, lambda: TestCase.objects.values_list(text_field, flat=True).get(pk=self.pk)
+        )
+
 class Submission(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
     language = models.CharField(choices=LANG_CHOICES, max_length=10)
     code = models.TextField()
-    status = models.CharField(max_length=15, default='Pending')  # AC, WA, TLE, RE, Pending
+    source_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    status = models.CharField(choices=STATUS_CHOICES, max_length=15, default='Pending')
     submitted_at = models.DateTimeField(auto_now_add=True)
+    # Filled in by the judge worker once the submission has been picked up
+    started_at = models.DateTimeField(null=True, blank=True)
+    judged_at = models.DateTimeField(null=True, blank=True)
+    output = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    # The failing test case with previews of its input, expected and actual output;
+    # the result of every test case is a TestResult row
+    test_results = models.JSONField(default=list, blank=True)
+    # Passed test results carried over from a sample run of the same source;
+    # the judge does not run these test cases again
+    prejudged_results = models.JSONField(default=list, blank=True)
+    # Milliseconds spent per judge phase (see problems/metrics.py)
+    timings = models.JSONField(default=dict, blank=True)
+    # Largest CPU time and peak memory over the test cases that were run
+    cpu_time_ms = models.PositiveIntegerField(null=True, blank=True)
+    memory_kb = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        # Checked by `manage.py explain_hot_queries` (see problems/query_plans.py)
+        indexes = [
+            # A user's standing on a problem (users/stats.py)
+            models.Index(fields=['user', 'status', 'problem'], name='submission_user_status_problem'),
+            # A user's latest submissions
+            models.Index(fields=['user', 'submitted_at'], name='submission_user_submitted'),
+            # The judge queue, oldest first
+            models.Index(fields=['status', 'submitted_at'], name='submission_status_submitted'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} submission on {self.problem.title} [{self.status}]"
+
+class TestResult(models.Model):
+    """Verdict and measured resource usage of one test case of a submission."""
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='results')
+    testcase = models.ForeignKey(TestCase, on_delete=models.SET_NULL, null=True, blank=True)
+    position = models.PositiveIntegerField()
+    status = models.CharField(choices=STATUS_CHOICES, max_length=15)
+    cpu_time_ms = models.PositiveIntegerField(default=0)
+    wall_time_ms = models.PositiveIntegerField(default=0)
+    memory_kb = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['submission', 'position']
+
+    def __str__(self):
+        return f"Test {self.position} of submission {self.submission_id} [{self.status}]"
+
+class VerdictCache(models.Model):
+    """Verdict of a source that has already been judged against one version of a problem's test data."""
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
+    testdata_version = models.PositiveIntegerField()
+    language = models.CharField(choices=LANG_CHOICES, max_length=10)
+    source_hash = models.CharField(max_length=64)
+    status = models.CharField(choices=STATUS_CHOICES, max_length=15)
+    output = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    # Summary of the failing test case, as on Submission.test_results
+    test_results = models.JSONField(default=list, blank=True)
+    cpu_time_ms = models.PositiveIntegerField(null=True, blank=True)
+    memory_kb = models.PositiveIntegerField(null=True, blank=True)
+    # The judged submission whose TestResult rows a reused verdict copies
+    submission = models.ForeignKey(Submission, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['problem', 'testdata_version', 'language', 'source_hash'],
+                name='unique_verdict_per_source',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.problem.title} v{self.testdata_version} {self.language} [{self.status}]"
@@ -0,0 +1,172 @@
+# problems/python_runner.py
+#
+# Python submissions through a pre-warmed zygote (JUDGE_PYTHON_MODE = 'zygote').
+# Each judge process starts runners/zygote.py once; a test case is then a fork of
+# that interpreter instead of a fresh `python main.py`, and the source is
+# byte-compiled once per submission rather than on every run.
+#
+# A zygote that cannot be reached or whose supervisor dies is a judge problem,
+# not a runtime error of the submission: it is restarted and the test case runs
+# as a plain `python main.py` instead.
+
+import atexit
+import json
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+
+from django.conf import settings
+
+from .executor import Usage
+
+logger = logging.getLogger(__name__)
+
+ZYGOTE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runners', 'zygote.py')
+# Slack for the zygote to answer after the submission's own wall-time limit
+REPLY_GRACE_SECONDS = 5
+COMPILE_TIMEOUT_SECONDS = 15
+START_TIMEOUT_SECONDS = 10
+
+_zygote = None
+_zygote_lock = threading.Lock()
+
+
+def zygote_mode():
+    """True when Python submissions should be forked from the zygote."""
+    return (settings.JUDGE_PYTHON_MODE == 'zygote' and os.name == 'posix'
+            and hasattr(socket, 'send_fds'))
+
+
+class ZygoteError(Exception):
+    """The zygote failed to run a test case; the caller runs it without the zygote."""
+
+
+class Zygote:
+    """A running zygote process and the socket it listens on."""
+
+    def __init__(self, python):
+        self.pid = os.getpid()
+        self.directory = tempfile.mkdtemp(prefix='codespray-zygote-')
+        self.socket_path = os.path.join(self.directory, 'zygote.sock')
+        self.proc = subprocess.Popen(
+            [python, ZYGOTE_SCRIPT, self.socket_path],
+            # The zygote exits when this pipe closes, i.e. when the judge process does
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            start_new_session=True
+        )
+        # The zygote prints one line once it is listening
+        ready = threading.Timer(START_TIMEOUT_SECONDS, self.proc.kill)
+        ready.start()
+        try:
+            line = self.proc.stdout.readline()
+        finally:
+            ready.cancel()
+        if line.strip() != b'ready':
+            self.close()
+            raise RuntimeError("Python zygote failed to start")
+
+    @property
+    def alive(self):
+        return self.proc.poll() is None
+
+    def request(self, payload, fds=(), timeout=None):
+        """Sends one request on a new connection and waits for the JSON reply."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(self.socket_path)
+            socket.send_fds(conn, [json.dumps(payload).encode('utf-8')], list(fds))
+            reply = b''
+            while not reply.endswith(b'\n'):
+                chunk = conn.recv(4096)
+                if not chunk:
+                    raise RuntimeError("Python zygote closed the connection without answering")
+                reply += chunk
+        return json.loads(reply)
+
+    def close(self):
+        self.proc.stdin.close()
+        if self.alive:
+            self.proc.kill()
+        self.proc.wait()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def get_zygote(python):
+    """The zygote of this process, (re)started when missing, dead or inherited by a fork."""
+    global _zygote
+    with _zygote_lock:
+        if _zygote is None or _zygote.pid != os.getpid() or not _zygote.alive:
+            if _zygote is not None and _zygote.pid == os.getpid():
+                _zygote.close()
+            _zygote = Zygote(python)
+            atexit.register(_zygote.close)
+        return _zygote
+
+
+def restart_zygote(zygote):
+    """Stops a failed zygote, so the next request starts a new one. Runs in flight finish."""
+    global _zygote
+    with _zygote_lock:
+        if _zygote is zygote:
+            _zygote = None
+    zygote.close()
+
+
+def compile_python(python, source_path, compiled_path):
+    """
+    Byte-compiles a submission once, with the interpreter that will run it.
+    :return: True if compiled_path was written; a syntax error leaves it missing so
+             the error is reported when the program runs.
+    """
+    zygote = None
+    try:
+        zygote = get_zygote(python)
+        reply = zygote.request(
+            {'op': 'compile', 'source': source_path, 'target': compiled_path},
+            timeout=COMPILE_TIMEOUT_SECONDS,
+        )
+    except (OSError, RuntimeError, ValueError) as e:
+        logger.warning("Python zygote could not compile %s: %s", source_path, e)
+        if zygote is not None:
+            restart_zygote(zygote)
+        return False
+    return reply.get('ok', False)
+
+
+def execute(python, source_path, compiled_path, stdin, stdout, stderr,
+            cpu_seconds=0, memory_bytes=0, wall_ms=0, output_bytes=0):
+    """
+    Runs a submission in a child of the zygote; same limits as executor.execute.
+    :return: Usage of the run.
+    :raises ZygoteError: When the zygote could not be reached or its supervisor failed.
+    """
+    zygote = None
+    try:
+        zygote = get_zygote(python)
+        reply = zygote.request(
+            {
+                'op': 'run',
+                'source': source_path,
+                'compiled': compiled_path,
+                'cpu_seconds': cpu_seconds,
+                'memory_bytes': memory_bytes,
+                'output_bytes': output_bytes,
+                'wall_ms': wall_ms,
+            },
+            fds=(stdin.fileno(), stdout.fileno(), stderr.fileno()),
+            timeout=(wall_ms / 1000 + REPLY_GRACE_SECONDS) if wall_ms else None,
+        )
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return Usage(reply['exit_code'], reply['signal'], reply['cpu_time_ms'], reply['wall_time_ms'],
+                     reply['memory_kb'], reply['timed_out'])
+    except (OSError, RuntimeError, ValueError, KeyError) as e:
+        logger.warning("Python zygote failed to run %s, running it without the zygote: %s", source_path, e)
+        if zygote is not None:
+            restart_zygote(zygote)
+        raise ZygoteError(str(e)) from e
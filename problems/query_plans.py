@@ -0,0 +1,149 @@
+# problems/query_plans.py
+#
+# Query plan audit for `manage.py explain_hot_queries`. The queries behind the
+# busiest pages and the judge loop are EXPLAINed against a seeded dataset large
+# enough that the planner prefers an index whenever a usable one exists, and any
+# plan that reads a whole table is reported. Keep hot_queries() in step with the
+# views and the judge when their queries change.
+
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from users.models import UserProblemStats, UserStats
+from users.stats import NOT_PENALIZED_STATUSES, rebuild as rebuild_user_stats
+
+from .judge import PENDING, RUNNING
+from .models import LANG_CHOICES, Problem, Submission, TestCase, TestResult, Topic, VerdictCache
+
+BATCH_SIZE = 2000
+
+JUDGED_STATUSES = ('AC', 'WA', 'TLE', 'RE', 'CE')
+
+# Plan lines that read a whole table, per database vendor
+SEQUENTIAL_SCAN_PATTERNS = {
+    # `SCAN <table>` without an index; `SCAN <table> USING [COVERING] INDEX` walks an index
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)(?! USING)(?:\s|$)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+def seed(users, topics, problems, submissions, testcases_per_problem, rng):
+    """
+    Fills the database with a synthetic site of the given size.
+    :return: Dict of the ids and names the hot queries are run with.
+    """
+    User.objects.bulk_create(
+        [User(username=f'plan-user-{index}', password='!') for index in range(users)], batch_size=BATCH_SIZE
+    )
+    Topic.objects.bulk_create([Topic(name=f'Topic {index}') for index in range(topics)], batch_size=BATCH_SIZE)
+    user_ids = list(User.objects.values_list('id', flat=True))
+    topic_ids = list(Topic.objects.values_list('id', flat=True))
+
+    Problem.objects.bulk_create([
+        Problem(title=f'Problem {index}', description='Statement ' * 50, topic_id=rng.choice(topic_ids))
+        for index in range(problems)
+    ], batch_size=BATCH_SIZE)
+    problem_ids = list(Problem.objects.values_list('id', flat=True))
+    TestCase.objects.bulk_create([
+        TestCase(problem_id=problem_id, input_data=f'{index} {index}', output_data=str(2 * index))
+        for problem_id in problem_ids
+        for index in range(testcases_per_problem)
+    ], batch_size=BATCH_SIZE)
+
+    languages = [code for code, _name in LANG_CHOICES]
+    statuses = JUDGED_STATUSES * 20 + (PENDING, RUNNING)
+    for start in range(0, submissions, BATCH_SIZE):
+        Submission.objects.bulk_create([
+            Submission(
+                user_id=rng.choice(user_ids), problem_id=rng.choice(problem_ids), language=rng.choice(languages),
+                code='print(input())', source_hash=f'{rng.getrandbits(256):064x}', status=rng.choice(statuses),
+            )
+            for _index in range(start, min(start + BATCH_SIZE, submissions))
+        ], batch_size=BATCH_SIZE)
+
+    submission = Submission.objects.exclude(status__in=(PENDING, RUNNING)).order_by('id').first()
+    TestResult.objects.bulk_create([
+        TestResult(submission_id=submission_id, position=position, status='AC')
+        for submission_id in Submission.objects.order_by('id').values_list('id', flat=True)[:BATCH_SIZE]
+        for position in range(1, testcases_per_problem + 1)
+    ], batch_size=BATCH_SIZE)
+
+    rebuild_user_stats()
+
+    # Planner statistics, as a database that has been running a while would have
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    topic = Topic.objects.get(pk=rng.choice(topic_ids))
+    return {
+        'user_id': submission.user_id,
+        'problem_id': submission.problem_id,
+        'submission_id': submission.id,
+        'topic_id': topic.id,
+        'topic_name': topic.name,
+    }
+
+
+def hot_queries(user_id, problem_id, submission_id, topic_id, topic_name):
+    """
+    The audited queries, as the views, the judge and users/stats.py build them.
+    :return: List of (name, queryset).
+    """
+    return [
+        ('dashboard: recent submissions',
+         Submission.objects.filter(user_id=user_id).select_related('problem').order_by('-submitted_at')[:5]),
+        ('problem list: solved / attempted markers',
+         UserProblemStats.objects.filter(user_id=user_id, problem_id__in=range(problem_id, problem_id + 50))
+         .values_list('problem_id', 'solved')),
+        ('standing: first accepted submission',
+         Submission.objects.filter(user_id=user_id, problem_id=problem_id, status='AC').values('submitted_at')),
+        ('standing: rejected before the first solve',
+         Submission.objects.filter(user_id=user_id, problem_id=problem_id, submitted_at__lt=timezone.now())
+         .exclude(status__in=NOT_PENALIZED_STATUSES).values('id')),
+        ('leaderboard sync',
+         UserStats.objects.filter(updated_at__gte=timezone.now()).values_list(
+             'user_id', 'user__username', 'problems_solved', 'penalty_minutes', 'topic_solved')),
+        ('problem list: topic by name',
+         Topic.objects.filter(name=topic_name).values_list('id', flat=True)),
+        ('problem list: page of a topic',
+         Problem.objects.filter(topic_id=topic_id, id__gt=problem_id).order_by('id').values('id', 'title')[:51]),
+        ('judge queue: next pending',
+         Submission.objects.filter(status=PENDING).order_by('submitted_at', 'id')[:1]),
+        ('judge queue: stale running',
+         Submission.objects.filter(status=RUNNING, started_at__lt=timezone.now())),
+        ('judge queue: unfinished count',
+         Submission.objects.filter(status__in=(PENDING, RUNNING)).values('status')),
+        ('test cases of a problem',
+         TestCase.objects.filter(problem_id=problem_id).order_by('id').only('id', 'input_hash', 'output_hash')),
+        ('memoized verdict',
+         VerdictCache.objects.filter(problem_id=problem_id, testdata_version=1, language='python',
+                                     source_hash='0' * 64)),
+        ('identical sources',
+         Submission.objects.filter(source_hash='0' * 64)),
+        ('submission events',
+         TestResult.objects.filter(submission_id=submission_id, position__gt=1)),
+    ]
+
+
+def sequential_scans(plan, vendor):
+    """
+    :param plan: Output of QuerySet.explain().
+    :return: Names of the tables the plan reads in full.
+    """
+    pattern = SEQUENTIAL_SCAN_PATTERNS[vendor]
+    return [match.group(1) for line in plan.splitlines() for match in pattern.finditer(line)]
+
+
+def audit(queries):
+    """
+    EXPLAINs each query.
+    :return: List of (name, plan, tables read in full).
+    """
+    results = []
+    for name, queryset in queries:
+        plan = queryset.explain()
+        results.append((name, plan, sequential_scans(plan, connection.vendor)))
+    return results
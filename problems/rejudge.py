@@ -0,0 +1,121 @@
+# problems/rejudge.py
+#
+# Bulk rejudging, e.g. after a test case of a contest problem was fixed.
+# Submissions with the same problem, language and source are judged once, in
+# parallel across groups, and the verdict is copied to the rest of each group.
+
+import logging
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .judge import (
+    PENDING, RUNNING, UNFINISHED_STATUSES, VERDICT_FIELDS, copy_test_results, judge_submission, source_hash,
+)
+from .models import Submission
+from .signals import submission_judged
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+RejudgeStats = namedtuple('RejudgeStats', ['submissions', 'groups', 'seconds'])
+
+
+def fill_source_hashes(queryset):
+    """Sets source_hash on submissions saved before it was recorded."""
+    missing = list(queryset.filter(source_hash='').only('id', 'code'))
+    for submission in missing:
+        submission.source_hash = source_hash(submission.code)
+    Submission.objects.bulk_update(missing, ['source_hash'], batch_size=BATCH_SIZE)
+
+
+def group_submissions(queryset):
+    """
+    :return: Lists of submission ids, one per (problem, language, source hash).
+    """
+    fill_source_hashes(queryset)
+    groups = defaultdict(list)
+    rows = queryset.order_by('id').values_list('id', 'problem_id', 'language', 'source_hash')
+    for submission_id, problem_id, language, code_hash in rows.iterator(chunk_size=2000):
+        groups[(problem_id, language, code_hash)].append(submission_id)
+    return list(groups.values())
+
+
+def copy_verdict(judged, submission_ids):
+    """Writes the verdict of a judged submission to other submissions of the same source."""
+    # The other fields are what submission_judged receivers read
+    others = list(Submission.objects.filter(id__in=submission_ids).only(
+        'id', 'user_id', 'problem_id', 'submitted_at'
+    ))
+    for submission in others:
+        for field in VERDICT_FIELDS:
+            setattr(submission, field, getattr(judged, field))
+    with transaction.atomic():
+        Submission.objects.bulk_update(others, VERDICT_FIELDS, batch_size=BATCH_SIZE)
+        copy_test_results(judged.id, others)
+    for submission in others:
+        submission_judged.send(sender=Submission, submission=submission, first_verdict=False)
+
+
+def judge_group(submission_ids):
+    """Judges the first submission of a group and copies its verdict to the others."""
+    try:
+        # Running keeps judge workers off them; marked only now, so a group waiting
+        # for its turn does not look stale, and requeued like any other stale job
+        # if this process dies
+        reset_for_rejudge(submission_ids, RUNNING)
+        judged = judge_submission(Submission.objects.get(pk=submission_ids[0]), force=True)
+        if len(submission_ids) > 1:
+            copy_verdict(judged, submission_ids[1:])
+        return judged
+    finally:
+        # Pool threads do not go through the request cycle that closes connections
+        close_old_connections()
+        connection.close()
+
+
+def reset_for_rejudge(submission_ids, status):
+    """Puts submissions back in the given unfinished state, dropping reused sample results."""
+    for start in range(0, len(submission_ids), BATCH_SIZE):
+        Submission.objects.filter(id__in=submission_ids[start:start + BATCH_SIZE]).update(
+            status=status, started_at=timezone.now() if status == RUNNING else None, prejudged_results=[]
+        )
+
+
+def requeue(queryset):
+    """
+    Sends submissions back to the judge workers' queue. Submissions that are
+    still waiting or being judged are left alone.
+    :return: Number of submissions requeued.
+    """
+    submission_ids = list(queryset.exclude(status__in=UNFINISHED_STATUSES).values_list('id', flat=True))
+    reset_for_rejudge(submission_ids, PENDING)
+    return len(submission_ids)
+
+
+def rejudge(queryset, workers=1, on_group_done=None):
+    """
+    Judges submissions in this process. Submissions that are still waiting or
+    being judged are left alone.
+    :param workers: Number of groups judged at the same time.
+    :param on_group_done: Called with (judged submission, group size) as groups finish.
+    :return: RejudgeStats.
+    """
+    started = time.monotonic()
+    groups = group_submissions(queryset.exclude(status__in=UNFINISHED_STATUSES))
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='rejudge') as pool:
+        futures = {pool.submit(judge_group, group): group for group in groups}
+        for future in as_completed(futures):
+            try:
+                judged = future.result()
+            except Exception:
+                logger.exception("Rejudge of submissions %s failed", futures[future])
+                continue
+            if on_group_done is not None:
+                on_group_done(judged, len(futures[future]))
+
+    return RejudgeStats(sum(len(group) for group in groups), len(groups), time.monotonic() - started)
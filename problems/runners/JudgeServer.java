@@ -0,0 +1,272 @@
+// problems/runners/JudgeServer.java
+//
+// Long-lived JVM that compiles and runs Java submissions, so a test case does not
+// pay for starting a JVM. Driven by problems/java_runner.py over the Unix socket
+// named by the first argument, one tab-separated request per line, each starting
+// with an id that the reply repeats:
+//
+//   <id> COMPILE <dir> <source>
+//       -> <id> COMPILED <javac exit code>   (diagnostics are written to <dir>/javac.log)
+//   <id> RUN <class dir> <input> <output> <error> <cpu ms> <wall ms> <output bytes>
+//       -> <id> RESULT <exit code> <cpu ms> <wall ms> <peak heap kb> <timed out> <restart>
+//
+// The protocol never touches file descriptors 0-2, which the Python side points at
+// /dev/null: a submission can open FileDescriptor.out, but cannot reach the socket
+// to forge a reply.
+//
+// Every run loads Main in a fresh class loader, so static state never leaks from
+// one test case or submission to the next. A run that times out, exhausts the
+// heap or leaves threads running (they would keep writing to the swapped
+// System.out during later runs) cannot be cleaned up safely: the server answers
+// and then halts, and the Python side starts a new one. A submission calling System.exit ends the server
+// with its exit code, which the Python side reports the same way.
+
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.BufferedReader;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.FilterOutputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.InputStreamReader;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.management.ManagementFactory;
+import java.lang.management.MemoryPoolMXBean;
+import java.lang.management.MemoryType;
+import java.lang.management.ThreadMXBean;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.StandardProtocolFamily;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.net.UnixDomainSocketAddress;
+import java.nio.channels.Channels;
+import java.nio.channels.SocketChannel;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Paths;
+import java.util.ArrayList;
+import java.util.List;
+import javax.tools.JavaCompiler;
+import javax.tools.ToolProvider;
+
+public class JudgeServer {
+    // Competitive programs recurse deeply; give them the stack a judge usually does
+    private static final long STACK_BYTES = 256L * 1024 * 1024;
+    private static final long POLL_MS = 10;
+    // How long threads of a finished submission get to end before the server restarts
+    private static final long THREAD_GRACE_MS = 50;
+
+    private static final PrintStream NULL_OUT = new PrintStream(OutputStream.nullOutputStream());
+    private static final InputStream NULL_IN = new ByteArrayInputStream(new byte[0]);
+
+    public static void main(String[] args) throws Exception {
+        SocketChannel channel = SocketChannel.open(StandardProtocolFamily.UNIX);
+        channel.connect(UnixDomainSocketAddress.of(args[0]));
+        BufferedReader requests = new BufferedReader(new InputStreamReader(
+                Channels.newInputStream(channel), StandardCharsets.UTF_8));
+        PrintStream replies = new PrintStream(Channels.newOutputStream(channel), true, "UTF-8");
+        // Submissions only ever see the streams of their own test case
+        resetStreams();
+        // Output buffered by a submission that calls System.exit still reaches its file
+        Runtime.getRuntime().addShutdownHook(new Thread(() -> System.out.flush()));
+
+        String line;
+        while ((line = requests.readLine()) != null) {
+            String[] parts = line.split("\t");
+            String id = parts[0];
+            try {
+                if (parts.length == 4 && parts[1].equals("COMPILE")) {
+                    replies.println(id + " " + compile(parts[2], parts[3]));
+                } else if (parts.length == 9 && parts[1].equals("RUN")) {
+                    Result result = run(parts[2], parts[3], parts[4], parts[5],
+                            Long.parseLong(parts[6]), Long.parseLong(parts[7]), Long.parseLong(parts[8]));
+                    replies.println(id + " " + result);
+                    if (result.restart) {
+                        Runtime.getRuntime().halt(0);
+                    }
+                } else {
+                    replies.println(id + " ERROR bad request");
+                }
+            } catch (Exception e) {
+                replies.println(id + " ERROR " + String.valueOf(e).replace('\n', ' '));
+            }
+        }
+    }
+
+    private static void resetStreams() {
+        System.setIn(NULL_IN);
+        System.setOut(NULL_OUT);
+        System.setErr(NULL_OUT);
+    }
+
+    private static String compile(String dir, String source) throws IOException {
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        ByteArrayOutputStream diagnostics = new ByteArrayOutputStream();
+        int exitCode = compiler.run(null, diagnostics, diagnostics,
+                "-encoding", "UTF-8", "-d", dir, Paths.get(dir, source).toString());
+        Files.write(Paths.get(dir, "javac.log"), diagnostics.toByteArray());
+        return "COMPILED " + exitCode;
+    }
+
+    private static Result run(String classDir, String input, String output, String error,
+                              long cpuLimitMs, long wallLimitMs, long outputLimit) throws IOException {
+        ThreadMXBean threads = ManagementFactory.getThreadMXBean();
+        List<MemoryPoolMXBean> heapPools = new ArrayList<>();
+        for (MemoryPoolMXBean pool : ManagementFactory.getMemoryPoolMXBeans()) {
+            if (pool.getType() == MemoryType.HEAP) {
+                heapPools.add(pool);
+            }
+        }
+        System.gc();
+        long baseline = 0;
+        for (MemoryPoolMXBean pool : heapPools) {
+            baseline += pool.getUsage().getUsed();
+            pool.resetPeakUsage();
+        }
+
+        Result result = new Result();
+        long[] cpuNanos = {0};
+        try (InputStream in = new BufferedInputStream(new FileInputStream(input), 1 << 16);
+             PrintStream out = new PrintStream(new BufferedOutputStream(
+                     new LimitedOutputStream(new FileOutputStream(output), outputLimit), 1 << 16), false, "UTF-8");
+             PrintStream err = new PrintStream(
+                     new LimitedOutputStream(new FileOutputStream(error), outputLimit), true, "UTF-8");
+             URLClassLoader loader = new URLClassLoader(
+                     new URL[]{Paths.get(classDir).toUri().toURL()}, ClassLoader.getPlatformClassLoader())) {
+
+            System.setIn(in);
+            System.setOut(out);
+            System.setErr(err);
+            // Threads the submission starts join its group, so they can be found afterwards
+            ThreadGroup group = new ThreadGroup("submission");
+            Thread submission = new Thread(group, () -> {
+                try {
+                    Method main = loader.loadClass("Main").getMethod("main", String[].class);
+                    main.invoke(null, (Object) new String[0]);
+                } catch (InvocationTargetException e) {
+                    fail(result, e.getCause(), err);
+                } catch (Throwable e) {
+                    fail(result, e, err);
+                } finally {
+                    cpuNanos[0] = threads.getCurrentThreadCpuTime();
+                }
+            }, "submission", STACK_BYTES);
+
+            long started = System.nanoTime();
+            submission.start();
+            while (submission.isAlive()) {
+                try {
+                    submission.join(POLL_MS);
+                } catch (InterruptedException e) {
+                    break;
+                }
+                long cpuNow = threads.getThreadCpuTime(submission.getId());
+                if (cpuNow > cpuNanos[0]) {
+                    cpuNanos[0] = cpuNow;
+                }
+                long elapsed = (System.nanoTime() - started) / 1_000_000;
+                if (submission.isAlive() && (cpuNanos[0] / 1_000_000 > cpuLimitMs || elapsed > wallLimitMs)) {
+                    // The thread cannot be stopped; the server restarts after replying
+                    result.timedOut = true;
+                    result.restart = true;
+                    break;
+                }
+            }
+            result.wallMs = (System.nanoTime() - started) / 1_000_000;
+            if (!result.restart && !threadsEnded(group)) {
+                result.restart = true;
+            }
+            out.flush();
+        } finally {
+            resetStreams();
+        }
+
+        long peak = 0;
+        for (MemoryPoolMXBean pool : heapPools) {
+            peak += pool.getPeakUsage().getUsed();
+        }
+        result.cpuMs = cpuNanos[0] / 1_000_000;
+        result.memoryKb = Math.max(0, peak - baseline) / 1024;
+        return result;
+    }
+
+    // Waits briefly for the threads left in the group; false if any is still alive
+    private static boolean threadsEnded(ThreadGroup group) {
+        long deadline = System.nanoTime() + THREAD_GRACE_MS * 1_000_000;
+        while (group.activeCount() > 0) {
+            Thread[] alive = new Thread[group.activeCount() + 1];
+            int count = group.enumerate(alive, true);
+            for (int i = 0; i < count; i++) {
+                long remainingMs = (deadline - System.nanoTime()) / 1_000_000;
+                if (remainingMs <= 0) {
+                    return false;
+                }
+                try {
+                    alive[i].join(remainingMs);
+                } catch (InterruptedException e) {
+                    return false;
+                }
+            }
+            if (System.nanoTime() >= deadline) {
+                return group.activeCount() == 0;
+            }
+        }
+        return true;
+    }
+
+    private static void fail(Result result, Throwable cause, PrintStream err) {
+        cause.printStackTrace(err);
+        result.exitCode = 1;
+        if (cause instanceof OutOfMemoryError || cause instanceof StackOverflowError) {
+            result.restart = true;
+        }
+    }
+
+    private static final class Result {
+        volatile int exitCode = 0;
+        long cpuMs = 0;
+        long wallMs = 0;
+        long memoryKb = 0;
+        boolean timedOut = false;
+        volatile boolean restart = false;
+
+        @Override
+        public String toString() {
+            return "RESULT " + exitCode + " " + cpuMs + " " + wallMs + " " + memoryKb + " "
+                    + (timedOut ? 1 : 0) + " " + (restart ? 1 : 0);
+        }
+    }
+
+    // Refuses writes past the output limit, like RLIMIT_FSIZE does for other languages
+    private static final class LimitedOutputStream extends FilterOutputStream {
+        private final long limit;
+        private long written = 0;
+
+        LimitedOutputStream(OutputStream out, long limit) {
+            super(out);
+            this.limit = limit;
+        }
+
+        @Override
+        public void write(int b) throws IOException {
+            write(new byte[]{(byte) b}, 0, 1);
+        }
+
+        @Override
+        public void write(byte[] b, int off, int len) throws IOException {
+            if (limit > 0 && written + len > limit) {
+                int allowed = (int) Math.max(0, limit - written);
+                out.write(b, off, allowed);
+                written += allowed;
+                throw new IOException("File too large");
+            }
+            out.write(b, off, len);
+            written += len;
+        }
+    }
+}
@@ -0,0 +1,131 @@
+/*
+ * Runs one submission with resource limits and reports what it used.
+ *
+ * usage: launcher RESULT_FD CPU_SECONDS MEMORY_BYTES FSIZE_BYTES WALL_MS program [args...]
+ *
+ * Limits of 0 are not applied. The program inherits stdin/stdout/stderr and runs
+ * in its own process group, which is killed when the wall-time limit expires.
+ * When it has finished, one line is written to RESULT_FD:
+ *
+ *     <exit code> <signal> <cpu ms> <wall ms> <peak rss kb> <timed out>
+ *
+ * The launcher exists so that peak RSS is measured on a process forked from this
+ * small binary rather than from the (large) judge process.
+ */
+#define _GNU_SOURCE
+#include <errno.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/resource.h>
+#include <sys/time.h>
+#include <sys/types.h>
+#include <sys/wait.h>
+#include <time.h>
+#include <unistd.h>
+
+static pid_t child;
+static volatile sig_atomic_t timed_out;
+
+static void on_alarm(int sig)
+{
+    (void)sig;
+    timed_out = 1;
+    kill(-child, SIGKILL);
+}
+
+static void limit(int resource, rlim_t soft, rlim_t hard)
+{
+    struct rlimit r;
+    r.rlim_cur = soft;
+    r.rlim_max = hard;
+    setrlimit(resource, &r);
+}
+
+static long elapsed_ms(const struct timespec *start)
+{
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    return (now.tv_sec - start->tv_sec) * 1000L + (now.tv_nsec - start->tv_nsec) / 1000000L;
+}
+
+int main(int argc, char **argv)
+{
+    if (argc < 7) {
+        fprintf(stderr, "usage: %s RESULT_FD CPU_SECONDS MEMORY_BYTES FSIZE_BYTES WALL_MS program [args...]\n", argv[0]);
+        return 2;
+    }
+
+    int result_fd = atoi(argv[1]);
+    rlim_t cpu_seconds = strtoull(argv[2], NULL, 10);
+    rlim_t memory_bytes = strtoull(argv[3], NULL, 10);
+    rlim_t fsize_bytes = strtoull(argv[4], NULL, 10);
+    long wall_ms = atol(argv[5]);
+
+    struct timespec start;
+    clock_gettime(CLOCK_MONOTONIC, &start);
+
+    child = fork();
+    if (child < 0) {
+        perror("fork");
+        return 2;
+    }
+    if (child == 0) {
+        setpgid(0, 0);
+        close(result_fd);
+        if (cpu_seconds)
+            limit(RLIMIT_CPU, cpu_seconds, cpu_seconds + 1);
+        if (memory_bytes)
+            limit(RLIMIT_AS, memory_bytes, memory_bytes);
+        if (fsize_bytes)
+            limit(RLIMIT_FSIZE, fsize_bytes, fsize_bytes);
+        limit(RLIMIT_CORE, 0, 0);
+        execvp(argv[6], argv + 6);
+        fprintf(stderr, "exec %s: %s\n", argv[6], strerror(errno));
+        _exit(127);
+    }
+    setpgid(child, child);
+
+    struct sigaction action;
+    memset(&action, 0, sizeof(action));
+    action.sa_handler = on_alarm;
+    action.sa_flags = SA_RESTART;
+    sigaction(SIGALRM, &action, NULL);
+    if (wall_ms > 0) {
+        struct itimerval timer;
+        memset(&timer, 0, sizeof(timer));
+        timer.it_value.tv_sec = wall_ms / 1000;
+        timer.it_value.tv_usec = (wall_ms % 1000) * 1000;
+        setitimer(ITIMER_REAL, &timer, NULL);
+    }
+
+    int status;
+    struct rusage usage;
+    while (wait4(child, &status, 0, &usage) < 0) {
+        if (errno != EINTR) {
+            perror("wait4");
+            return 2;
+        }
+    }
+    long wall = elapsed_ms(&start);
+
+    struct itimerval off;
+    memset(&off, 0, sizeof(off));
+    setitimer(ITIMER_REAL, &off, NULL);
+    /* Anything the program left running in its group goes too */
+    kill(-child, SIGKILL);
+
+    long cpu_ms = (usage.ru_utime.tv_sec + usage.ru_stime.tv_sec) * 1000L
+                + (usage.ru_utime.tv_usec + usage.ru_stime.tv_usec) / 1000L;
+    long peak_kb = usage.ru_maxrss;
+#ifdef __APPLE__
+    peak_kb /= 1024;
+#endif
+
+    dprintf(result_fd, "%d %d %ld %ld %ld %d\n",
+            WIFEXITED(status) ? WEXITSTATUS(status) : -1,
+            WIFSIGNALED(status) ? WTERMSIG(status) : 0,
+            cpu_ms, wall, peak_kb, (int)timed_out);
+    return 0;
+}
@@ -0,0 +1,238 @@
+# problems/runners/zygote.py
+#
+# Pre-warmed Python interpreter that runs Python submissions without starting a
+# new interpreter per test case. Started by problems/python_runner.py as
+#
+#     python zygote.py SOCKET_PATH
+#
+# It listens on a Unix socket and forks a supervisor per connection, so the
+# zygote itself never runs submission code and never blocks on a client; it exits
+# when its stdin, a pipe from the judge process, closes. Each connection carries
+# one JSON request, with the test's stdin, stdout and stderr passed as file
+# descriptors (SCM_RIGHTS):
+#
+#   {"op": "compile", "source": PATH, "target": PATH}
+#       -> {"ok": true|false}          byte-compiles a submission once
+#   {"op": "run", "source": PATH, "compiled": PATH, "cpu_seconds": N,
+#    "memory_bytes": N, "output_bytes": N, "wall_ms": N}   + fds [stdin, stdout, stderr]
+#       -> {"exit_code", "signal", "cpu_time_ms", "wall_time_ms", "memory_kb", "timed_out"}
+#
+# For a run the supervisor forks the child that executes the submission under
+# rlimits and reports its usage from wait4, the way runners/launcher.c does for
+# other languages. Only the standard library is used here.
+
+import json
+import marshal
+import os
+import py_compile
+import resource
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+
+# Modules most submissions import anyway; loading them once here is what makes
+# a forked child cheaper than a fresh interpreter
+import bisect  # noqa: F401
+import collections  # noqa: F401
+import functools  # noqa: F401
+import heapq  # noqa: F401
+import itertools  # noqa: F401
+import math  # noqa: F401
+import re  # noqa: F401
+import string  # noqa: F401
+
+MAX_REQUEST = 64 * 1024
+# Size of the header py_compile writes before the marshalled code object
+PYC_HEADER_SIZE = 16
+
+
+def receive(conn):
+    message, fds, _flags, _addr = socket.recv_fds(conn, MAX_REQUEST, 3)
+    return json.loads(message.decode('utf-8')), fds
+
+
+def reply(conn, payload):
+    conn.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+
+
+def compile_source(request):
+    try:
+        py_compile.compile(request['source'], cfile=request['target'], doraise=True)
+        return {'ok': True}
+    except Exception:
+        # Syntax errors are reported when the program runs, as with `python main.py`
+        return {'ok': False}
+
+
+def load_code(request):
+    compiled = request.get('compiled')
+    if compiled and os.path.exists(compiled):
+        with open(compiled, 'rb') as pyc:
+            pyc.read(PYC_HEADER_SIZE)
+            return marshal.load(pyc)
+    with open(request['source'], 'rb') as source:
+        return compile(source.read(), request['source'], 'exec')
+
+
+def set_limits(request):
+    os.setpgid(0, 0)
+    cpu = request['cpu_seconds']
+    if cpu:
+        # The hard limit one second later turns the SIGXCPU into a SIGKILL
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    if request['memory_bytes']:
+        resource.setrlimit(resource.RLIMIT_AS, (request['memory_bytes'], request['memory_bytes']))
+    if request['output_bytes']:
+        resource.setrlimit(resource.RLIMIT_FSIZE, (request['output_bytes'], request['output_bytes']))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def submission_traceback(tb):
+    """
+    Drops the leading frames of this file, so the traceback starts in the submission
+    as it would without the zygote. A compile error has no frame left (None).
+    """
+    while tb is not None and tb.tb_frame.f_code.co_filename == __file__:
+        tb = tb.tb_next
+    return tb
+
+
+def run_submission(request, fds):
+    """Body of the forked child: becomes the submission's process. Never returns."""
+    exit_code = 1
+    try:
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+        os.closerange(3, 1024)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGALRM, signal.SIG_DFL)
+        # Fresh standard streams on the test's files, buffered like a new interpreter's
+        sys.stdin = open(0, 'r', encoding='utf-8', closefd=False)
+        sys.stdout = open(1, 'w', encoding='utf-8', closefd=False)
+        sys.stderr = open(2, 'w', encoding='utf-8', closefd=False, buffering=1)
+        set_limits(request)
+
+        source = request['source']
+        sys.argv = [source]
+        sys.path[0] = os.path.dirname(source)
+        namespace = {'__name__': '__main__', '__file__': source, '__builtins__': __builtins__}
+        try:
+            exec(load_code(request), namespace)
+            exit_code = 0
+        except SystemExit as e:
+            if e.code is None:
+                exit_code = 0
+            elif isinstance(e.code, int):
+                exit_code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+        except BaseException as e:
+            traceback.print_exception(type(e), e, submission_traceback(e.__traceback__))
+            exit_code = 1
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                exit_code = exit_code or 1
+    finally:
+        os._exit(exit_code & 0xFF)
+
+
+def supervise(request, fds):
+    """Runs one submission in a child process and measures it."""
+    timed_out = False
+
+    def on_alarm(signum, frame):
+        nonlocal timed_out
+        timed_out = True
+        for kill in (os.killpg, os.kill):
+            try:
+                kill(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    started = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        run_submission(request, fds)
+    # Also set here, so the group exists even if the alarm beats the child to it
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+    for fd in fds:
+        os.close(fd)
+
+    signal.signal(signal.SIGALRM, on_alarm)
+    if request['wall_ms']:
+        signal.setitimer(signal.ITIMER_REAL, request['wall_ms'] / 1000)
+    _pid, status, usage = os.wait4(pid, 0)
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    wall_time_ms = int((time.monotonic() - started) * 1000)
+    # Anything the submission left running in its group goes too
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+    return {
+        'exit_code': os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1,
+        'signal': os.WTERMSIG(status) if os.WIFSIGNALED(status) else 0,
+        'cpu_time_ms': int((usage.ru_utime + usage.ru_stime) * 1000),
+        'wall_time_ms': wall_time_ms,
+        'memory_kb': usage.ru_maxrss,
+        'timed_out': timed_out,
+    }
+
+
+def handle(conn):
+    """Body of the per-connection supervisor process. Never returns."""
+    status = 0
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        request, fds = receive(conn)
+        if request['op'] == 'compile':
+            reply(conn, compile_source(request))
+        elif request['op'] == 'run':
+            reply(conn, supervise(request, fds))
+        else:
+            reply(conn, {'error': f"unknown op {request['op']!r}"})
+    except BaseException:
+        traceback.print_exc()
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def main():
+    socket_path = sys.argv[1]
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(64)
+    # Supervisors are never waited for
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    sys.stdout.write('ready\n')
+    sys.stdout.flush()
+
+    while True:
+        readable, _, _ = select.select([server, sys.stdin], [], [])
+        if sys.stdin in readable and not os.read(sys.stdin.fileno(), 1):
+            # The judge process that started us is gone
+            return
+        if server not in readable:
+            continue
+        conn, _addr = server.accept()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if os.fork() == 0:
+            server.close()
+            handle(conn)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
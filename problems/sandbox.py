@@ -0,0 +1,126 @@
+# problems/sandbox.py
+#
+# Pool of reusable working directories for compiling and running submissions.
+# Directories are created up front (on tmpfs when available), handed out to judge
+# jobs and emptied by a background thread, so no mkdtemp/rmtree happens while a
+# test case is being judged.
+
+import atexit
+import collections
+import errno
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def remove_tree(path):
+    """Remove a working directory, retrying on Windows locked files."""
+    try:
+        shutil.rmtree(path)
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        # Handle Windows locked file case gracefully
+        for _ in range(5):
+            time.sleep(0.2)
+            try:
+                shutil.rmtree(path)
+                break
+            except PermissionError as retry_err:
+                if retry_err.errno != errno.EACCES:
+                    raise
+        else:
+            # Could not delete temp folder after retries — log or ignore
+            pass
+
+
+def default_sandbox_root():
+    """Prefer tmpfs so sandbox files never touch the disk."""
+    shm = '/dev/shm'
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return shm
+    return tempfile.gettempdir()
+
+
+def empty_directory(path):
+    """Delete everything inside path but keep the directory itself."""
+    for entry in os.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            remove_tree(entry.path)
+        else:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class SandboxPool:
+    """
+    Hands out empty working directories. Released directories are cleaned in the
+    background and reused; at most `size` clean directories are kept warm.
+    """
+
+    def __init__(self, root, size):
+        os.makedirs(root, exist_ok=True)
+        # One private directory per process so several judge processes can share a root
+        self.root = tempfile.mkdtemp(prefix='codespray-sandboxes-', dir=root)
+        self.size = size
+        self.pid = os.getpid()
+        self._free = collections.deque()
+        self._dirty = queue.SimpleQueue()
+        for _ in range(size):
+            self._free.append(self._create())
+        threading.Thread(target=self._clean_forever, name='sandbox-cleaner', daemon=True).start()
+        atexit.register(self.close)
+
+    def _create(self):
+        return tempfile.mkdtemp(prefix='box-', dir=self.root)
+
+    def acquire(self):
+        """:return: Path of an empty working directory."""
+        try:
+            return self._free.popleft()
+        except IndexError:
+            # Pool exhausted: fall back to a fresh directory rather than waiting
+            return self._create()
+
+    def release(self, path):
+        """Give a directory back; it is emptied off the critical path."""
+        self._dirty.put(path)
+
+    def _clean_forever(self):
+        while True:
+            path = self._dirty.get()
+            try:
+                if len(self._free) >= self.size:
+                    remove_tree(path)
+                else:
+                    empty_directory(path)
+                    self._free.append(path)
+            except Exception:
+                logger.exception("Could not clean sandbox %s", path)
+                remove_tree(path)
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def get_sandbox_pool():
+    """The pool of this process, created on first use (and again after a fork)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            root = settings.JUDGE_SANDBOX_ROOT or default_sandbox_root()
+            _pool = SandboxPool(root, settings.JUDGE_SANDBOX_POOL_SIZE)
+        return _pool
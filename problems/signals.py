@@ -0,0 +1,67 @@
+# problems/signals.py
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import listing
+from .models import Problem, TestCase, Topic, VerdictCache
+from .testdata import content_hash
+
+# Sent after a verdict has been saved for a submission, with `submission` and
+# `first_verdict` (False when an already judged submission was judged again).
+submission_judged = Signal()
+
+
+@receiver(pre_save, sender=TestCase)
+def hash_testdata(sender, instance, **kwargs):
+    """Keeps the store addresses of a test case in step with its text."""
+    instance.input_hash = content_hash(instance.input_data)
+    instance.output_hash = content_hash(instance.output_data)
+
+
+@receiver(post_save, sender=TestCase)
+@receiver(post_delete, sender=TestCase)
+def bump_testdata_version(sender, instance, **kwargs):
+    """Any change to a problem's test data invalidates its memoized verdicts."""
+    Problem.objects.filter(pk=instance.problem_id).update(testdata_version=F('testdata_version') + 1)
+    VerdictCache.objects.filter(problem_id=instance.problem_id).delete()
+
+
+@receiver(pre_save, sender=Problem)
+def bump_version_on_judging_change(sender, instance, **kwargs):
+    """A different checker or limit can give a different verdict for the same source."""
+    if instance.pk is None:
+        return
+    previous = Problem.objects.filter(pk=instance.pk).values('testdata_version', *Problem.JUDGING_FIELDS).first()
+    if previous is None:
+        return
+    # Never write back a stale version, whether or not anything changed
+    instance.testdata_version = previous['testdata_version']
+    if any(getattr(instance, field) != previous[field] for field in Problem.JUDGING_FIELDS):
+        instance.testdata_version += 1
+        VerdictCache.objects.filter(problem_id=instance.pk).delete()
+
+
+@receiver(pre_save, sender=Problem)
+def remember_previous_topic(sender, instance, **kwargs):
+    """A problem moved to another topic leaves the old topic's list too."""
+    instance.previous_topic_id = None
+    if instance.pk is not None:
+        instance.previous_topic_id = Problem.objects.filter(pk=instance.pk).values_list('topic_id', flat=True).first()
+
+
+@receiver(post_save, sender=Problem)
+@receiver(post_delete, sender=Problem)
+def invalidate_problem_list(sender, instance, **kwargs):
+    """Drops the cached problem list pages that show this problem, once the change is committed."""
+    topic_ids = [instance.topic_id, getattr(instance, 'previous_topic_id', None)]
+    transaction.on_commit(lambda: listing.invalidate(*topic_ids))
+
+
+@receiver(post_save, sender=Topic)
+def invalidate_topic_list(sender, instance, **kwargs):
+    """Cached pages show the topic's name."""
+    transaction.on_commit(lambda: listing.invalidate(instance.pk))
+
@@ -0,0 +1,77 @@
+# problems/testdata.py
+#
+# Content-addressed store of test case files. The database stays the source of
+# truth (TestCase.input_data / output_data); each judge host materializes a file
+# per distinct content the first time it is needed, so identical inputs shared by
+# several test cases or problems are stored once. Submissions read their input
+# straight from these files and outputs are checked against them via mmap.
+
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def store_root():
+    root = settings.JUDGE_TESTDATA_DIR
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def path_for(digest):
+    if not digest:
+        # An empty digest would name the store root itself
+        raise ValueError("Test data has no content digest")
+    return os.path.join(store_root(), digest[:2], digest)
+
+
+def store(text, digest=None):
+    """
+    Writes text to the store, unless a file with the same content is already there.
+    :return: Path of the stored file.
+    """
+    digest = digest or content_hash(text)
+    path = path_for(digest)
+    if os.path.exists(path):
+        return path
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Write next to the final path and rename, so readers never see a partial file
+    fd, temp_path = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(text.encode('utf-8'))
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return path
+
+
+def materialize(digest, load_text):
+    """
+    Path of the file for digest, writing it from the database on a miss.
+    :param load_text: Called with no arguments to fetch the content on a miss.
+    """
+    path = path_for(digest)
+    if os.path.exists(path):
+        return path
+    return store(load_text(), digest)
+
+
+def preview(path, max_size):
+    """Start of a stored file as text, for showing in verdicts."""
+    with open(path, 'rb') as data_file:
+        head = data_file.read(max_size * 4).decode('utf-8', errors='ignore')
+    if len(head) > max_size or os.path.getsize(path) > max_size * 4:
+        head = head[:max_size] + "\n... (truncated)"
+    return head
@@ -1,3 +1,676 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from . import build_cache, checkers, judge, listing, python_runner, rejudge, testdata, utils
+from .judge import apply_cached_verdict, source_hash
+from .models import Problem, Submission, TestCase as ProblemTestCase, TestResult, Topic, VerdictCache
+from .signals import submission_judged
+
+
+class CheckerTests(TestCase):
+    """Built-in checkers, with tokens and whitespace falling on chunk boundaries."""
+
+    def write(self, data):
+        handle, path = tempfile.mkstemp()
+        with os.fdopen(handle, 'wb') as data_file:
+            data_file.write(data)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def check(self, checker, output, answer):
+        return checker.check(self.write(output), None, self.write(answer))
+
+    def test_tokens_split_across_chunks(self):
+        # A 6-byte token read 4 bytes at a time is seen in two pieces
+        with mock.patch.object(checkers, 'CHUNK_SIZE', 4):
+            self.assertEqual(list(checkers.iter_tokens(io.BytesIO(b'abcdef gh\n'))), [b'abcdef', b'gh'])
+            self.assertEqual(list(checkers.iter_tokens(io.BytesIO(b'abc defgh'))), [b'abc', b'defgh'])
+            self.assertEqual(list(checkers.iter_tokens(io.BytesIO(b'   \n\n  '))), [])
+
+    def test_token_spanning_many_chunks(self):
+        token = b'7' * 1000
+        with mock.patch.object(checkers, 'CHUNK_SIZE', 4):
+            for data in (token, b' ' + token + b' 1', b'1 ' + token + b'\n', b'12\n' + token + token):
+                self.assertEqual(list(checkers.iter_tokens(io.BytesIO(data))), data.split())
+
+    def test_whitespace_on_chunk_boundary(self):
+        # The separator is the last byte of the first chunk: "abc" and "d" are two tokens
+        with mock.patch.object(checkers, 'CHUNK_SIZE', 4):
+            self.assertEqual(list(checkers.iter_tokens(io.BytesIO(b'abc d'))), [b'abc', b'd'])
+            self.assertTrue(checkers.same_tokens(io.BytesIO(b'abc d'), io.BytesIO(b'abc\n\nd\n')))
+            self.assertFalse(checkers.same_tokens(io.BytesIO(b'abcd'), io.BytesIO(b'abc d')))
+
+    def test_token_checker_at_real_chunk_size(self):
+        numbers = b' '.join(str(n).encode() for n in range(40000))
+        self.assertGreater(len(numbers), 2 * checkers.CHUNK_SIZE)
+        checker = checkers.TokenChecker()
+        self.assertTrue(self.check(checker, numbers, numbers.replace(b' ', b'\n') + b'\n'))
+        self.assertFalse(self.check(checker, numbers, numbers + b' 40000'))
+        self.assertFalse(self.check(checker, numbers.replace(b'20000', b'2000 0'), numbers))
+
+    def test_float_checker_across_chunks(self):
+        with mock.patch.object(checkers, 'CHUNK_SIZE', 4):
+            checker = checkers.FloatChecker(1e-6)
+            self.assertTrue(self.check(checker, b'3.1415926 2.0000001\n', b'3.14159265 2'))
+            self.assertFalse(self.check(checker, b'3.1416 2', b'3.14159265 2'))
+            self.assertFalse(self.check(checker, b'nan', b'0.5'))
+            self.assertTrue(self.check(checker, b'yes 1e3', b'yes 1000'))
+
+    def test_exact_checker_ignores_surrounding_whitespace_only(self):
+        with mock.patch.object(checkers, 'CHUNK_SIZE', 4):
+            checker = checkers.ExactChecker()
+            self.assertTrue(self.check(checker, b'\n\n  1 2\n3  \n\n\n', b'1 2\n3'))
+            self.assertFalse(self.check(checker, b'1  2\n3', b'1 2\n3'))
+            self.assertTrue(self.check(checker, b'', b'   \n'))
+
+
+@override_settings(PROBLEM_LIST_PAGE_SIZE=3)
+class ListingTests(TestCase):
+    """Keyset pages of the problem list."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.math = Topic.objects.create(name='Math')
+        cls.graphs = Topic.objects.create(name='Graphs')
+        cls.ids = [
+            Problem.objects.create(title=f'Problem {index}', description='x' * 500,
+                                   topic=cls.math if index % 2 else cls.graphs).id
+            for index in range(8)
+        ]
+
+    def page_ids(self, page):
+        return [row['id'] for row in page['problems']]
+
+    def test_walk_forward_and_back(self):
+        first = listing.listing_page()
+        self.assertEqual(self.page_ids(first), self.ids[:3])
+        self.assertIsNone(first['previous'])
+        self.assertEqual(first['next'], self.ids[2])
+
+        second = listing.listing_page(after=first['next'])
+        self.assertEqual(self.page_ids(second), self.ids[3:6])
+        self.assertEqual(second['previous'], self.ids[3])
+
+        last = listing.listing_page(after=second['next'])
+        self.assertEqual(self.page_ids(last), self.ids[6:])
+        self.assertIsNone(last['next'])
+
+        back = listing.listing_page(before=last['previous'])
+        self.assertEqual(back, second)
+        self.assertEqual(listing.listing_page(before=second['previous']), first)
+
+    def test_topic_filter(self):
+        math_ids = [problem_id for index, problem_id in enumerate(self.ids) if index % 2]
+        first = listing.listing_page(topic_id=self.math.id)
+        self.assertEqual(self.page_ids(first), math_ids[:3])
+        self.assertEqual({row['topic_name'] for row in first['problems']}, {'Math'})
+        second = listing.listing_page(topic_id=self.math.id, after=first['next'])
+        self.assertEqual(self.page_ids(second), math_ids[3:])
+        self.assertIsNone(second['next'])
+        self.assertEqual(self.page_ids(listing.listing_page(topic_id=self.math.id, before=second['previous'])),
+                         math_ids[:3])
+
+    def test_excerpt_is_cut(self):
+        row = listing.listing_page()['problems'][0]
+        self.assertEqual(len(row['excerpt']), listing.EXCERPT_CHARS)
+
+    def test_malformed_cursor(self):
+        self.assertIsNone(listing.parse_cursor('abc'))
+        self.assertIsNone(listing.parse_cursor(''))
+        self.assertEqual(listing.parse_cursor('12'), 12)
+
+    @override_settings(CACHE_IS_SHARED=True)
+    def test_cached_page_is_dropped_when_a_problem_changes(self):
+        self.assertEqual(listing.listing_page()['problems'][0]['title'], 'Problem 0')
+        problem = Problem.objects.get(pk=self.ids[0])
+        problem.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            problem.save()
+        self.assertEqual(listing.listing_page()['problems'][0]['title'], 'Renamed')
+
+
+class VerdictCacheTests(TestCase):
+    """Memoized verdicts are dropped when anything that decides a verdict changes."""
+
+    code = 'print(sum(map(int, input().split())))'
+
+    def setUp(self):
+        self.user = User.objects.create_user('judge-test', password='!')
+        self.problem = Problem.objects.create(title='Sum', description='a+b',
+                                              topic=Topic.objects.create(name='Math'))
+        self.testcase = ProblemTestCase.objects.create(problem=self.problem, input_data='1 2', output_data='3')
+        self.problem.refresh_from_db()
+        self.remember()
+
+    def remember(self):
+        VerdictCache.objects.create(problem=self.problem, testdata_version=self.problem.testdata_version,
+                                    language='python', source_hash=source_hash(self.code), status='AC')
+
+    def cache_hit(self):
+        submission = Submission(user=self.user, problem=self.problem, language='python', code=self.code)
+        return apply_cached_verdict(submission, Problem.objects.get(pk=self.problem.pk).testdata_version)
+
+    def assert_invalidated(self, version):
+        self.assertFalse(VerdictCache.objects.filter(problem=self.problem).exists())
+        self.assertFalse(self.cache_hit())
+        self.assertEqual(Problem.objects.get(pk=self.problem.pk).testdata_version, version + 1)
+
+    def test_cache_hit(self):
+        self.assertTrue(self.cache_hit())
+
+    def test_testcase_change(self):
+        version = self.problem.testdata_version
+        self.testcase.output_data = '4'
+        self.testcase.save()
+        self.assert_invalidated(version)
+
+    def test_testcase_added_and_deleted(self):
+        version = self.problem.testdata_version
+        ProblemTestCase.objects.create(problem=self.problem, input_data='2 2', output_data='4')
+        self.assert_invalidated(version)
+        self.problem.refresh_from_db()
+        self.remember()
+        self.testcase.delete()
+        self.assert_invalidated(version + 1)
+
+    def test_limit_change(self):
+        for field, value in (('time_limit_ms', 500), ('memory_limit_mb', 64)):
+            self.problem.refresh_from_db()
+            version = self.problem.testdata_version
+            setattr(self.problem, field, value)
+            self.problem.save()
+            self.assert_invalidated(version)
+            self.problem.refresh_from_db()
+            self.remember()
+
+    def test_checker_change(self):
+        version = self.problem.testdata_version
+        self.problem.checker = 'tokens'
+        self.problem.save()
+        self.assert_invalidated(version)
+
+    def test_unrelated_change_keeps_cache(self):
+        version = self.problem.testdata_version
+        self.problem.title = 'Sum of two numbers'
+        self.problem.save()
+        self.assertTrue(self.cache_hit())
+        self.assertEqual(Problem.objects.get(pk=self.problem.pk).testdata_version, version)
+
+
+class TestDataStoreTests(TestCase):
+    """Test case files in the content-addressed store."""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(JUDGE_TESTDATA_DIR=root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.problem = Problem.objects.create(title='Sum', description='a+b', topic=Topic.objects.create(name='Math'))
+
+    def test_paths_hold_the_row_text(self):
+        testcase = ProblemTestCase.objects.create(problem=self.problem, input_data='1 2', output_data='3')
+        with open(testcase.input_path()) as input_file, open(testcase.answer_path()) as answer_file:
+            self.assertEqual((input_file.read(), answer_file.read()), ('1 2', '3'))
+
+    def test_rows_saved_without_hashes(self):
+        # bulk_create skips the pre_save signal that hashes the text
+        ProblemTestCase.objects.bulk_create([ProblemTestCase(problem=self.problem, input_data='4 5', output_data='9')])
+        testcase = ProblemTestCase.objects.only('id', 'input_hash', 'output_hash').get(problem=self.problem)
+        self.assertEqual(testcase.input_hash, '')
+        with open(testcase.input_path()) as input_file, open(testcase.answer_path()) as answer_file:
+            self.assertEqual((input_file.read(), answer_file.read()), ('4 5', '9'))
+        saved = ProblemTestCase.objects.get(pk=testcase.pk)
+        self.assertEqual((saved.input_hash, saved.output_hash),
+                         (testdata.content_hash('4 5'), testdata.content_hash('9')))
+
+    def test_empty_digest_is_rejected(self):
+        with self.assertRaises(ValueError):
+            testdata.path_for('')
+
+
+class JudgeQueueTests(TestCase):
+    """Workers claim Pending submissions one at a time and never leave them Running."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('queue-test', password='!')
+        self.problem = Problem.objects.create(title='Sum', description='a+b', topic=Topic.objects.create(name='Math'))
+
+    def submit(self, status=judge.PENDING, started_at=None):
+        return Submission.objects.create(user=self.user, problem=self.problem, language='python', code='',
+                                         status=status, started_at=started_at)
+
+    def test_oldest_first(self):
+        first, second = self.submit(), self.submit()
+        self.assertEqual(judge.claim_next_submission().id, first.id)
+        self.assertEqual(judge.claim_next_submission().id, second.id)
+        self.assertIsNone(judge.claim_next_submission())
+        self.assertEqual(set(Submission.objects.values_list('status', flat=True)), {judge.RUNNING})
+
+    def test_submission_taken_by_another_worker_is_skipped(self):
+        taken, free = self.submit(), self.submit()
+        first = QuerySet.first
+
+        def raced_first(queryset):
+            # Another worker claims the row between the select and the update
+            submission = first(queryset)
+            if submission is not None and submission.id == taken.id:
+                Submission.objects.filter(pk=taken.pk).update(status=judge.RUNNING)
+            return submission
+
+        with mock.patch.object(QuerySet, 'first', raced_first):
+            self.assertEqual(judge.claim_next_submission().id, free.id)
+
+    def test_row_locks_skip_locked_rows_when_supported(self):
+        self.submit()
+        select_for_update = QuerySet.select_for_update
+        with mock.patch.object(connection.features, 'has_select_for_update_skip_locked', True), \
+                mock.patch.object(QuerySet, 'select_for_update', autospec=True,
+                                  side_effect=select_for_update) as locked:
+            self.assertIsNotNone(judge.claim_next_submission())
+        self.assertEqual(locked.call_args.kwargs, {'skip_locked': True})
+
+    def test_stale_submissions_are_requeued(self):
+        stale = self.submit(judge.RUNNING, timezone.now() - timedelta(minutes=30))
+        fresh = self.submit(judge.RUNNING, timezone.now())
+        self.assertEqual(judge.requeue_stale_submissions(600), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, stale.started_at), (judge.PENDING, None))
+        self.assertEqual(fresh.status, judge.RUNNING)
+        self.assertEqual(judge.claim_next_submission().id, stale.id)
+
+    def test_crashed_judging_is_not_left_running(self):
+        submission = self.submit()
+        with mock.patch.object(judge, 'judge_submission', side_effect=RuntimeError('database is gone')), \
+                self.assertRaises(RuntimeError):
+            judge.process_next_submission()
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, 'Error')
+        self.assertIn('database is gone', submission.error)
+
+
+class FakeTestCase:
+    """Stands in for a TestCase row in run_testcases."""
+
+    def __init__(self, id):
+        self.id = id
+
+    def input_path(self):
+        return f'/tests/{self.id}.in'
+
+    def answer_path(self):
+        return f'/tests/{self.id}.out'
+
+
+class RunTestCasesTests(TestCase):
+    """Test cases run in parallel but are reported in order, and stop at the first failure."""
+
+    def run_cases(self, count, evaluate, prejudged=None):
+        with mock.patch.object(judge, 'evaluate_testcase', evaluate):
+            return list(judge.run_testcases(None, (FakeTestCase(id) for id in range(1, count + 1)),
+                                            None, None, prejudged))
+
+    @override_settings(JUDGE_MAX_PARALLEL_TESTS=4)
+    def test_results_in_test_order(self):
+        def evaluate(build, testcase, input_path, answer_path, problem, checker, cancelled):
+            # Later test cases finish first
+            time.sleep((10 - testcase.id) * 0.005)
+            return {'testcase_id': testcase.id, 'status': 'PASSED', 'input': input_path}, ''
+
+        results = self.run_cases(8, evaluate)
+        self.assertEqual([result['testcase_id'] for result, error in results], list(range(1, 9)))
+        self.assertEqual(results[0][0]['input'], '/tests/1.in')
+
+    @override_settings(JUDGE_MAX_PARALLEL_TESTS=2)
+    def test_stops_at_first_failure(self):
+        started = []
+        cancelled_seen = threading.Event()
+
+        def evaluate(build, testcase, input_path, answer_path, problem, checker, cancelled):
+            started.append(testcase.id)
+            if testcase.id == 2:
+                return {'testcase_id': 2, 'status': 'FAILED'}, 'Wrong Answer on Test Case 2'
+            if testcase.id == 3:
+                # In flight when test case 2 fails: told to give up
+                if cancelled.wait(5):
+                    cancelled_seen.set()
+            return {'testcase_id': testcase.id, 'status': 'PASSED'}, ''
+
+        results = self.run_cases(10, evaluate)
+        self.assertEqual([(result['testcase_id'], error) for result, error in results],
+                         [(1, ''), (2, 'Wrong Answer on Test Case 2')])
+        self.assertLessEqual(set(started), {1, 2, 3})
+        if 3 in started:
+            self.assertTrue(cancelled_seen.wait(5))
+
+    def test_prejudged_cases_are_not_run(self):
+        evaluate = mock.Mock(return_value=({'status': 'PASSED'}, ''))
+        prejudged = {1: {'testcase_id': 1, 'status': 'PASSED', 'verdict': 'AC'}}
+        results = self.run_cases(2, evaluate, prejudged)
+        self.assertEqual(results[0], (prejudged[1], ''))
+        self.assertEqual([call.args[1].id for call in evaluate.call_args_list], [2])
+
+
+class BuildCacheTests(TestCase):
+    """Compiled submissions shared through the on-disk build cache."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        override = override_settings(JUDGE_BUILD_CACHE_DIR=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+        build_cache._tracked_sizes.clear()
+
+    def build_dir(self, size):
+        path = build_cache.new_build_dir()
+        with open(os.path.join(path, 'main_exe.exe'), 'wb') as exe:
+            exe.write(b'x' * size)
+        return path
+
+    def age(self, path, seconds):
+        then = time.time() - seconds
+        os.utime(path, (then, then))
+
+    @skipUnless(shutil.which('gcc'), 'gcc is not installed')
+    def test_second_compile_is_a_hit(self):
+        code = '#include <stdio.h>\nint main(){int a,b;scanf("%d %d",&a,&b);printf("%d",a+b);}'
+        first, error = utils.compile_code(code, 'c')
+        self.assertEqual(error, '')
+        with mock.patch.object(subprocess, 'run', side_effect=AssertionError('compiled again')):
+            second, error = utils.compile_code(code, 'c')
+        self.assertEqual((second.build_dir, second.cached), (first.build_dir, True))
+        # Cached builds outlive the judging that used them
+        second.cleanup()
+        self.assertTrue(os.path.exists(os.path.join(second.build_dir, 'main_exe.exe')))
+
+    def test_store_keeps_the_entry_that_won_the_race(self):
+        key = 'ab' * 32
+        winner = build_cache.store(key, self.build_dir(10))
+        loser = self.build_dir(20)
+        self.assertEqual(build_cache.store(key, loser), winner)
+        self.assertFalse(os.path.exists(loser))
+        self.assertEqual(os.path.getsize(os.path.join(winner, 'main_exe.exe')), 10)
+        self.assertEqual(build_cache.lookup(key), winner)
+        self.assertIsNone(build_cache.lookup('cd' * 32))
+
+    def test_eviction_spares_recently_used_entries(self):
+        paths = {}
+        for name, age in (('old', 3000), ('older', 4000), ('recent', 60), ('stored', 0)):
+            key = name.ljust(64, '0')
+            paths[name] = build_cache.entry_path(self.root, key)
+            os.makedirs(os.path.dirname(paths[name]), exist_ok=True)
+            os.rename(self.build_dir(100), paths[name])
+            self.age(paths[name], age)
+
+        # Oldest first, down to 90% of the limit
+        build_cache.evict(self.root, 350, keep=paths['stored'])
+        self.assertEqual({name for name, path in paths.items() if os.path.isdir(path)}, {'old', 'recent', 'stored'})
+
+        # Still over the limit, but nothing left is past the grace period except `old`
+        build_cache.evict(self.root, 100, keep=paths['stored'])
+        self.assertEqual({name for name, path in paths.items() if os.path.isdir(path)}, {'recent', 'stored'})
+
+
+@skipUnless(shutil.which('gcc'), 'the launcher that enforces limits needs gcc')
+@override_settings(JUDGE_BUILD_CACHE_DIR='', JUDGE_PYTHON_MODE='process')
+class LimitTests(TestCase):
+    """Verdicts decided by the limits the launcher enforces."""
+
+    def run_code(self, code, lang, input_data='', **limits):
+        build, error = utils.compile_code(code, lang)
+        self.assertIsNotNone(build, error)
+        self.addCleanup(build.cleanup)
+        return utils.run_compiled(build, input_data, **limits)
+
+    def test_usage_of_a_normal_run(self):
+        run = self.run_code('print(sum(map(int, input().split())))', 'python', '2 3')
+        self.assertEqual((run.verdict, run.stdout), ('OK', '5'))
+        self.assertGreater(run.memory_kb, 0)
+        self.assertGreater(run.wall_time_ms, 0)
+
+    def test_cpu_time_limit(self):
+        run = self.run_code('int main(){volatile unsigned long n=0;for(;;)n++;}', 'c', time_limit_ms=300)
+        self.assertEqual(run.verdict, 'TLE')
+        self.assertGreaterEqual(run.cpu_time_ms, 300)
+
+    def test_wall_time_limit(self):
+        # Sleeping uses no CPU; the wall-time limit still ends it
+        started = time.monotonic()
+        run = self.run_code('import time\ntime.sleep(30)', 'python', time_limit_ms=200)
+        self.assertEqual(run.verdict, 'TLE')
+        self.assertLess(time.monotonic() - started, 10)
+
+    def test_memory_limit(self):
+        run = self.run_code('data = bytearray(512 * 1024 * 1024)\nprint(len(data))', 'python', memory_limit_mb=64)
+        self.assertEqual(run.verdict, 'MLE')
+
+    @skipUnless(shutil.which('g++'), 'g++ is not installed')
+    def test_memory_limit_cpp(self):
+        code = '#include <vector>\n#include <cstdio>\nint main(){std::vector<char> v(512u<<20, 1);printf("%d",v[7]);}'
+        self.assertEqual(self.run_code(code, 'cpp', memory_limit_mb=64).verdict, 'MLE')
+
+    def test_runtime_error(self):
+        run = self.run_code('raise ValueError("boom")', 'python')
+        self.assertEqual(run.verdict, 'RE')
+        self.assertIn('ValueError: boom', run.error)
+
+    @override_settings(JUDGE_OUTPUT_LIMIT_BYTES=1024 * 1024)
+    def test_output_limit(self):
+        run = self.run_code('while True:\n    print("x" * 1000)', 'python')
+        # The kernel stops the program at the cap instead of the judge reading it all
+        self.assertEqual(run.verdict, 'OLE')
+        self.assertIn('Output Limit Exceeded', run.error)
+
+    def test_long_output_is_compared_from_disk(self):
+        output = '\n'.join(str(n) for n in range(200000))
+        answer = self.write_answer(output)
+        run = self.run_code('for n in range(200000):\n    print(n)', 'python', answer_path=answer)
+        self.assertEqual((run.verdict, run.passed), ('OK', True))
+        self.assertLessEqual(len(run.stdout), utils.MAX_DISPLAY_SIZE + 50)
+        run = self.run_code('for n in range(199999):\n    print(n)', 'python', answer_path=answer)
+        self.assertEqual((run.verdict, run.passed), ('OK', False))
+
+    def write_answer(self, text):
+        handle, path = tempfile.mkstemp()
+        with os.fdopen(handle, 'w') as answer_file:
+            answer_file.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+
+@skipUnless(shutil.which('gcc') and hasattr(socket, 'send_fds'),
+            'needs the launcher and socket.send_fds')
+@override_settings(JUDGE_BUILD_CACHE_DIR='')
+class ZygoteTests(TestCase):
+    """Python runs forked from the zygote get the same verdicts as `python main.py`."""
+
+    programs = [
+        ('print(sum(map(int, input().split())))', {}),
+        ('import sys\nsys.exit(3)', {}),
+        ('import sys\nprint("partial")\nsys.exit(0)', {}),
+        ('def f(n):\n    return f(n + 1)\nf(0)', {}),
+        ('x = [1] * (10 ** 8)', {'memory_limit_mb': 64}),
+        ('while True:\n    pass', {'time_limit_ms': 300}),
+        ('print(undefined)', {}),
+        ('if True\n    print(1)', {}),
+    ]
+
+    def run_code(self, mode, code, **limits):
+        with override_settings(JUDGE_PYTHON_MODE=mode):
+            build, error = utils.compile_code(code, 'python')
+            self.addCleanup(build.cleanup)
+            return utils.run_compiled(build, '2 3', **limits)
+
+    def test_same_verdicts_as_a_plain_process(self):
+        for code, limits in self.programs:
+            with self.subTest(code=code):
+                plain = self.run_code('process', code, **limits)
+                forked = self.run_code('zygote', code, **limits)
+                self.assertEqual((forked.verdict, forked.stdout), (plain.verdict, plain.stdout))
+                self.assertEqual(forked.stderr.splitlines()[-1:], plain.stderr.splitlines()[-1:])
+
+    def test_zygote_failure_falls_back_to_a_plain_process(self):
+        with mock.patch.object(python_runner.Zygote, 'request', side_effect=OSError('connection refused')), \
+                self.assertLogs('problems.python_runner', 'WARNING'):
+            run = self.run_code('zygote', 'print(sum(map(int, input().split())))')
+        self.assertEqual((run.verdict, run.stdout), ('OK', '5'))
+
+
+class SampleRunReuseTests(TestCase):
+    """A submit right after a sample run of the same code only runs the other test cases."""
+
+    code = 'print(sum(map(int, input().split())))'
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(JUDGE_TESTDATA_DIR=root, JUDGE_BUILD_CACHE_DIR='')
+        override.enable()
+        self.addCleanup(override.disable)
+        # Sample runs are kept in the cache, which outlives each test's database
+        cache.clear()
+        self.user = User.objects.create_user('sample-test', password='!')
+        self.problem = Problem.objects.create(title='Sum', description='a+b', topic=Topic.objects.create(name='Math'))
+        self.testcases = [
+            ProblemTestCase.objects.create(problem=self.problem, input_data=f'{n} {n}', output_data=str(2 * n))
+            for n in range(3)
+        ]
+        self.problem.refresh_from_db()
+
+    def sample_results(self):
+        return [
+            {'testcase_id': testcase.id, 'input_data': testcase.input_data, 'expected_output': testcase.output_data,
+             'output': testcase.output_data, 'status': 'PASSED', 'verdict': 'AC',
+             'cpu_time_ms': 5, 'wall_time_ms': 6, 'memory_kb': 7}
+            for testcase in self.testcases[:2]
+        ]
+
+    def submit(self):
+        submission = Submission.objects.create(user=self.user, problem=self.problem, language='python',
+                                               code=self.code, source_hash=source_hash(self.code))
+        judge.apply_sample_run(submission, self.problem)
+        return submission
+
+    def test_only_ids_verdicts_and_usage_are_kept(self):
+        failed = {'testcase_id': self.testcases[2].id, 'status': 'FAILED', 'verdict': 'WA'}
+        judge.remember_sample_run(self.user.id, self.problem, 'python', source_hash(self.code),
+                                  self.sample_results() + [failed])
+        self.assertEqual(self.submit().prejudged_results, [
+            {'testcase_id': testcase.id, 'status': 'PASSED', 'verdict': 'AC',
+             'cpu_time_ms': 5, 'wall_time_ms': 6, 'memory_kb': 7}
+            for testcase in self.testcases[:2]
+        ])
+
+    def test_sample_run_of_other_code_is_not_reused(self):
+        judge.remember_sample_run(self.user.id, self.problem, 'python', source_hash('print(0)'),
+                                  self.sample_results())
+        self.assertEqual(self.submit().prejudged_results, [])
+
+    def test_prejudged_cases_are_not_run_again(self):
+        judge.remember_sample_run(self.user.id, self.problem, 'python', source_hash(self.code),
+                                  self.sample_results())
+        submission = self.submit()
+        evaluate = mock.Mock(side_effect=judge.evaluate_testcase)
+        with mock.patch.object(judge, 'evaluate_testcase', evaluate):
+            judge.judge_submission(submission)
+        self.assertEqual(submission.status, 'AC')
+        self.assertEqual([call.args[1].id for call in evaluate.call_args_list], [self.testcases[2].id])
+        rows = TestResult.objects.filter(submission=submission).order_by('position')
+        self.assertEqual([(row.testcase_id, row.status) for row in rows],
+                         [(testcase.id, 'AC') for testcase in self.testcases])
+        self.assertEqual(rows[0].cpu_time_ms, 5)
+
+
+@override_settings(JUDGE_BUILD_CACHE_DIR='')
+class RejudgeTests(TransactionTestCase):
+    """
+    Identical sources are judged once per rejudge and the verdict is copied to the
+    rest. Groups are judged in pool threads, which only see committed rows.
+    """
+
+    right = 'print(sum(map(int, input().split())))'
+    wrong = 'print(0)'
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(JUDGE_TESTDATA_DIR=root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user('rejudge-test', password='!')
+        self.problem = Problem.objects.create(title='Sum', description='a+b', topic=Topic.objects.create(name='Math'))
+        ProblemTestCase.objects.create(problem=self.problem, input_data='1 2', output_data='3')
+        ProblemTestCase.objects.create(problem=self.problem, input_data='2 2', output_data='4')
+
+    def submit(self, code, status='WA'):
+        # No source_hash, like submissions saved before it was recorded
+        return Submission.objects.create(user=self.user, problem=self.problem, language='python', code=code,
+                                         status=status, judged_at=timezone.now())
+
+    def test_groups(self):
+        first, second, other = self.submit(self.right), self.submit(self.right), self.submit(self.wrong)
+        self.assertEqual(sorted(rejudge.group_submissions(Submission.objects.all())),
+                         [[first.id, second.id], [other.id]])
+        self.assertEqual(Submission.objects.get(pk=first.pk).source_hash, source_hash(self.right))
+
+    def test_each_source_is_judged_once(self):
+        rights = [self.submit(self.right) for _ in range(3)]
+        wrong = self.submit(self.wrong, status='AC')
+        unfinished = self.submit(self.right, status=judge.RUNNING)
+        judged = []
+        judge_submission = rejudge.judge_submission
+
+        def judge_once(submission, force=False):
+            # Only the group being judged is Running; the others keep their verdict
+            group = {rights[0].id, rights[1].id, rights[2].id} if submission.code == self.right else {wrong.id}
+            running = Submission.objects.filter(status=judge.RUNNING).exclude(pk=unfinished.pk)
+            self.assertEqual(set(running.values_list('id', flat=True)), group)
+            judged.append(submission.id)
+            return judge_submission(submission, force)
+
+        received = []
+
+        def receiver(sender, submission, first_verdict, **kwargs):
+            received.append((submission.id, first_verdict))
+
+        submission_judged.connect(receiver)
+        self.addCleanup(submission_judged.disconnect, receiver)
+        with mock.patch.object(rejudge, 'judge_submission', judge_once):
+            stats = rejudge.rejudge(Submission.objects.all())
+
+        self.assertEqual((stats.submissions, stats.groups), (4, 2))
+        self.assertEqual(sorted(judged), sorted([rights[0].id, wrong.id]))
+        statuses = dict(Submission.objects.values_list('id', 'status'))
+        self.assertEqual([statuses[submission.id] for submission in rights], ['AC'] * 3)
+        self.assertEqual((statuses[wrong.id], statuses[unfinished.id]), ('WA', judge.RUNNING))
+        # Copies get the TestResult rows of the judged submission and count as rejudges
+        for submission in rights:
+            self.assertEqual(list(TestResult.objects.filter(submission=submission).values_list('position', 'status')),
+                             [(1, 'AC'), (2, 'AC')])
+        self.assertEqual(sorted(received), sorted((submission.id, False) for submission in rights + [wrong]))
+
+    def test_requeue_leaves_unfinished_submissions_alone(self):
+        judged, running = self.submit(self.right), self.submit(self.right, status=judge.RUNNING)
+        Submission.objects.filter(pk=running.pk).update(started_at=timezone.now())
+        self.assertEqual(rejudge.requeue(Submission.objects.all()), 1)
+        statuses = dict(Submission.objects.values_list('id', 'started_at'))
+        self.assertIsNone(statuses[judged.id])
+        self.assertIsNotNone(statuses[running.id])
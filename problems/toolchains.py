@@ -0,0 +1,135 @@
+# problems/toolchains.py
+#
+# Compiler flags for C and C++ submissions, taken from JUDGE_TOOLCHAIN_PROFILES,
+# and the precompiled headers that go with them. A precompiled header only helps
+# when it was built with the same compiler and flags as the submission, so each
+# profile gets its own PCH directory, named after a hash of both. Submissions are
+# compiled with `-I <pch dir>`; GCC picks up `<header>.gch` from there and falls
+# back to parsing the header when the PCH is missing or unusable.
+
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+
+from .build_cache import toolchain_version
+
+logger = logging.getLogger(__name__)
+
+
+def profile(lang):
+    """Toolchain profile of a language, or an empty dict when it has none."""
+    return settings.JUDGE_TOOLCHAIN_PROFILES.get(lang, {})
+
+
+def profile_flags(lang):
+    """Language standard and optimization flags of a profile."""
+    lang_profile = profile(lang)
+    flags = []
+    if lang_profile.get('std'):
+        flags.append(f"-std={lang_profile['std']}")
+    flags.extend(lang_profile.get('flags', []))
+    return flags
+
+
+def pch_dir(lang, compiler):
+    """Directory the precompiled header of a profile lives in (whether built or not)."""
+    digest = hashlib.sha256()
+    for part in (lang, toolchain_version((compiler, '--version')), *profile_flags(lang), profile(lang)['pch']):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    root = settings.JUDGE_BUILD_CACHE_DIR or tempfile.gettempdir()
+    return os.path.join(root, f'pch-{digest.hexdigest()[:16]}')
+
+
+def ready_pch_dir(lang, compiler):
+    """:return: The PCH directory of the profile if its header has been built, else None."""
+    header = profile(lang).get('pch')
+    if not header:
+        return None
+    directory = pch_dir(lang, compiler)
+    if os.path.exists(os.path.join(directory, f'{header}.gch')):
+        return directory
+    return None
+
+
+def compile_command(lang, compiler, source_file, exe_file):
+    """
+    Full compile command for a C or C++ submission under its profile.
+    :return: List of arguments, run in the directory holding source_file.
+    """
+    cmd = [compiler] + profile_flags(lang)
+    directory = ready_pch_dir(lang, compiler)
+    if directory is not None:
+        cmd += ['-I', directory]
+    cmd += [source_file, '-o', exe_file]
+    cmd += profile(lang).get('libs', [])
+    return cmd
+
+
+def locate_header(lang, compiler, header):
+    """Path of a system header as the compiler resolves it under the profile."""
+    language = 'c' if lang == 'c' else 'c++'
+    result = subprocess.run(
+        [compiler] + profile_flags(lang) + ['-x', language, '-fsyntax-only', '-H', '-'],
+        input=f'#include <{header}>\n'.encode('utf-8'),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        timeout=60
+    )
+    # -H lists every header opened, the top-level include first as ". path"
+    for line in result.stderr.decode('utf-8', errors='ignore').splitlines():
+        if line.startswith('. '):
+            return line[2:].strip()
+    return None
+
+
+def build_pch(lang, compiler):
+    """
+    Builds the precompiled header of a profile unless it already exists.
+    :return: The PCH directory, or None if the profile has no PCH or it could not be built.
+    """
+    header = profile(lang).get('pch')
+    if not header:
+        return None
+    directory = ready_pch_dir(lang, compiler)
+    if directory is not None:
+        return directory
+
+    directory = pch_dir(lang, compiler)
+    header_path = locate_header(lang, compiler, header)
+    if header_path is None:
+        logger.warning("Cannot precompile <%s> for %s: header not found", header, lang)
+        return None
+
+    # Build in a private directory and rename, so compiles never see a partial .gch
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    workdir = tempfile.mkdtemp(prefix='pch-build-', dir=os.path.dirname(directory))
+    try:
+        target = os.path.join(workdir, f'{header}.gch')
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        language = 'c-header' if lang == 'c' else 'c++-header'
+        result = subprocess.run(
+            [compiler] + profile_flags(lang) + ['-x', language, header_path, '-o', target],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=300
+        )
+        if result.returncode != 0:
+            logger.warning("Cannot precompile <%s> for %s:\n%s", header, lang,
+                           result.stderr.decode('utf-8', errors='ignore'))
+            return None
+        try:
+            os.rename(workdir, directory)
+        except OSError:
+            # Another judge process published it first
+            if not os.path.isdir(directory):
+                raise
+        return directory
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
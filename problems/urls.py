@@ -4,5 +4,8 @@ from . import views
 urlpatterns = [
     path('', views.problem_list, name='problem_list'),
     path('<int:problem_id>/', views.problem_detail, name='problem_detail'),
+    path('submissions/<int:submission_id>/status/', views.submission_status, name='submission_status'),
+    path('submissions/<int:submission_id>/events/', views.submission_events, name='submission_events'),
+    path('submissions/<int:submission_id>/results/', views.submission_results, name='submission_results'),
     path('ai-review/', views.ai_code_review, name='ai_code_review'),
 ]
@@ -1,36 +1,63 @@
+import math
 import subprocess
-import tempfile
 import os
-import shutil
-import time
-import errno
 import platform
+import signal
+from functools import lru_cache
 
-#
+from django.conf import settings
+
+from . import build_cache, java_runner, metrics, python_runner, toolchains
+from .checkers import CheckerError, ExactChecker
+from .executor import execute
+from .sandbox import get_sandbox_pool, remove_tree
+
+# Used by compile_and_run and whenever a problem does not say otherwise
+DEFAULT_TIME_LIMIT_MS = 2000
+DEFAULT_MEMORY_LIMIT_MB = 256
+# Programs may sleep or block on I/O; they are killed once wall time passes this
+# multiple of the CPU limit (plus one second of slack)
+WALL_TIME_FACTOR = 2
+# Signals sent when RLIMIT_CPU / RLIMIT_FSIZE run out (not defined on Windows)
+SIGXCPU = getattr(signal, 'SIGXCPU', None)
+SIGXFSZ = getattr(signal, 'SIGXFSZ', None)
+# Only this much of stdout/stderr is ever read back for display
+MAX_DISPLAY_SIZE = 10000  # 10KB limit
+# Messages runtimes print when an allocation fails under the memory limit
+OUT_OF_MEMORY_MARKERS = ('MemoryError', 'OutOfMemoryError', 'std::bad_alloc')
+
+# '{build_dir}' in run_cmd is replaced with the directory holding the compiled build
 LANGUAGE_CONFIG = {
     'c': {
         'source_file': 'main.c',
         'exe_file': 'main_exe.exe',
         'compile_cmd': ['gcc', 'main.c', '-o', 'main_exe.exe'],
-        'run_cmd': ['./main_exe.exe'] if platform.system() != 'Windows' else ['main_exe.exe'],
+        'version_cmd': ['gcc', '--version'],
+        'run_cmd': ['{build_dir}/main_exe.exe'],
     },
     'cpp': {
         'source_file': 'main.cpp',
         'exe_file': 'main_exe.exe',
         'compile_cmd': ['g++', 'main.cpp', '-o', 'main_exe.exe'],
-        'run_cmd': ['./main_exe.exe'] if platform.system() != 'Windows' else ['main_exe.exe'],
+        'version_cmd': ['g++', '--version'],
+        'run_cmd': ['{build_dir}/main_exe.exe'],
     },
     'java': {
         'source_file': 'Main.java',
         'compile_cmd': ['javac', 'Main.java'],
-        'run_cmd': ['java', 'Main'],
+        'version_cmd': ['javac', '-version'],
+        'run_cmd': ['java', '-cp', '{build_dir}', 'Main'],
+        'memory_flag': '-Xmx{memory_mb}m',
     },
     'python': {
         'source_file': 'main.py',
-        'run_cmd': ['python', 'main.py'],
+        # Written once per submission when Python runs through the zygote
+        'compiled_file': 'main.pyc',
+        'run_cmd': ['python', '{build_dir}/main.py'],
     },
 }
 
+@lru_cache(maxsize=None)
 def find_compiler(compiler_name):
     """Try to find the compiler in common locations"""
     if platform.system() == 'Windows':
@@ -58,117 +85,301 @@ def find_compiler(compiler_name):
     
     return compiler_name
 
-def compile_and_run(code: str, lang: str, input_data: str):
+def prepare_toolchains():
     """
-    Compiles and runs code submitted by the user.
+    Builds the precompiled headers of the C/C++ toolchain profiles, so the first
+    submissions do not pay for parsing them.
+    :return: Dict of language to PCH directory (None where none could be built).
+    """
+    built = {}
+    for lang in ('c', 'cpp'):
+        if toolchains.profile(lang).get('pch'):
+            compiler = find_compiler(LANGUAGE_CONFIG[lang]['compile_cmd'][0])
+            built[lang] = toolchains.build_pch(lang, compiler)
+    return built
+
+
+class BuildArtifact:
+    """
+    A submission that has been compiled once and can be run against many inputs.
+    Builds that live in the shared build cache are never deleted here; each run
+    gets its own sandbox directory as its working directory.
+    """
+
+    def __init__(self, lang, build_dir, run_cmd, cached=False):
+        self.lang = lang
+        self.build_dir = build_dir
+        self.run_cmd = run_cmd
+        self.cached = cached
+
+    def cleanup(self):
+        if not self.cached:
+            get_sandbox_pool().release(self.build_dir)
+
+
+def make_artifact(lang, config, build_dir, cached):
+    run_cmd = [part.format(build_dir=build_dir) for part in config['run_cmd']]
+    return BuildArtifact(lang, build_dir, run_cmd, cached=cached)
+
+
+def compile_code(code: str, lang: str):
+    """
+    Compiles code submitted by the user once, so it can be run against every test case.
+    Compiled languages are looked up in the build cache first and stored there afterwards.
     :param code: The source code submitted.
     :param lang: One of 'c', 'cpp', 'java', 'python'
-    :param input_data: Sample input for the program.
-    :return: Tuple of (stdout, stderr)
+    :return: Tuple of (BuildArtifact or None, error)
     """
     if lang not in LANGUAGE_CONFIG:
-        return '', f" Language '{lang}' not supported."
+        return None, f" Language '{lang}' not supported."
 
     config = LANGUAGE_CONFIG[lang].copy()
 
-    # Find the correct compiler
+    # Find the correct compiler and apply the language's toolchain profile
     if 'compile_cmd' in config:
         if lang in ['c', 'cpp']:
-            compiler_name = 'gcc' if lang == 'c' else 'g++'
-            found_compiler = find_compiler(compiler_name)
-            config['compile_cmd'] = [found_compiler] + config['compile_cmd'][1:]
+            found_compiler = find_compiler(config['compile_cmd'][0])
+            config['compile_cmd'] = toolchains.compile_command(
+                lang, found_compiler, config['source_file'], config['exe_file']
+            )
+            config['version_cmd'] = [found_compiler] + config['version_cmd'][1:]
+
+    use_cache = 'compile_cmd' in config and build_cache.cache_root() is not None
+    key = None
+    if use_cache:
+        key = build_cache.build_key(lang, config['version_cmd'], config['compile_cmd'], code)
+        cached_dir = build_cache.lookup(key)
+        if cached_dir is not None:
+            return make_artifact(lang, config, cached_dir, cached=True), ''
+        tmpdir = build_cache.new_build_dir()
+    else:
+        tmpdir = get_sandbox_pool().acquire()
+
+    def discard():
+        if use_cache:
+            remove_tree(tmpdir)
+        else:
+            get_sandbox_pool().release(tmpdir)
 
-    tmpdir = tempfile.mkdtemp()
     try:
         source_path = os.path.join(tmpdir, config['source_file'])
 
         # Write user-submitted code to file
-        with open(source_path, 'w', encoding='utf-8') as code_file:
+        with metrics.span('source_write', lang), open(source_path, 'w', encoding='utf-8') as code_file:
             code_file.write(code)
 
-        # ---------------------
-        # 1. Compilation Phase
-        # ---------------------
         if 'compile_cmd' in config:
             try:
-                compile_result = subprocess.run(
-                    config['compile_cmd'],
-                    cwd=tmpdir,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    timeout=15
-                )
+                with metrics.span('compile', lang):
+                    if lang == 'java' and java_runner.resident_mode():
+                        compile_result = java_runner.compile_java(tmpdir, config['source_file'])
+                    else:
+                        compile_result = subprocess.run(
+                            config['compile_cmd'],
+                            cwd=tmpdir,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            timeout=15
+                        )
                 if compile_result.returncode != 0:
                     stderr_output = compile_result.stderr.decode('utf-8', errors='ignore')
-                    return '', f" Compilation Error:\n{stderr_output}"
+                    discard()
+                    return None, f" Compilation Error:\n{stderr_output}"
             except FileNotFoundError:
-                return '', f" Compiler not found. Please install {lang.upper()} compiler."
+                discard()
+                return None, f" Compiler not found. Please install {lang.upper()} compiler."
             except subprocess.TimeoutExpired:
-                return '', "⏱ Compilation Time Limit Exceeded"
-
-        # ---------------------
-        # 2. Execution Phase
-        # ---------------------
-        try:
-            # For Windows, check if executable exists
-            if platform.system() == 'Windows' and 'exe_file' in config:
-                exe_path = os.path.join(tmpdir, config['exe_file'])
-                if not os.path.exists(exe_path):
-                    return '', f" Executable not found at {exe_path}. Compilation may have failed."
-            
-            # Update run command to use full path for Windows executables
-            if platform.system() == 'Windows' and 'exe_file' in config:
-                exe_path = os.path.join(tmpdir, config['exe_file'])
-                run_cmd = [exe_path]
-            else:
-                run_cmd = config['run_cmd']
-            
-            run_result = subprocess.run(
-                run_cmd,
-                cwd=tmpdir,
-                input=input_data.encode('utf-8'),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=15  # Increased from 5 to 10 seconds
-            )
+                discard()
+                return None, "⏱ Compilation Time Limit Exceeded"
 
-            stdout = run_result.stdout.decode('utf-8', errors='ignore').strip()
-            stderr = run_result.stderr.decode('utf-8', errors='ignore').strip()
-            
-            # Limit output size to prevent memory issues
-            max_output_size = 10000  # 10KB limit
-            if len(stdout) > max_output_size:
-                stdout = stdout[:max_output_size] + "\n... (output truncated)"
-            if len(stderr) > max_output_size:
-                stderr = stderr[:max_output_size] + "\n... (error truncated)"
-            
-            # If there's stderr but no stdout, it might be an error
-            if stderr and not stdout:
-                return '', f" Runtime Error:\n{stderr}"
-            
-            return stdout, stderr
-
-        except subprocess.TimeoutExpired:
-            return '', "⏱️ Time Limit Exceeded"
-        except FileNotFoundError as e:
-            return '', f" File not found error: {str(e)}"
+        if 'compiled_file' in config and python_runner.zygote_mode():
+            with metrics.span('compile', lang):
+                python_runner.compile_python(
+                    config['run_cmd'][0], source_path, os.path.join(tmpdir, config['compiled_file'])
+                )
+
+        # Check the executable exists before handing the build out
+        if 'exe_file' in config:
+            exe_path = os.path.join(tmpdir, config['exe_file'])
+            if not os.path.exists(exe_path):
+                discard()
+                return None, f" Executable not found at {exe_path}. Compilation may have failed."
+
+        if use_cache:
+            return make_artifact(lang, config, build_cache.store(key, tmpdir), cached=True), ''
+        return make_artifact(lang, config, tmpdir, cached=False), ''
 
     except Exception as e:
-        return '', f" Unexpected error: {str(e)}"
+        discard()
+        return None, f" Unexpected error: {str(e)}"
 
-    finally:
-        try:
-            shutil.rmtree(tmpdir)
-        except PermissionError as e:
-            # Handle Windows locked file case gracefully
-            for _ in range(5):
-                time.sleep(0.2)
+
+class RunResult:
+    """Outcome of running a build against one input."""
+
+    def __init__(self, stdout='', stderr='', verdict='OK', error='', cpu_time_ms=0, wall_time_ms=0,
+                 memory_kb=0, passed=None):
+        self.stdout = stdout
+        self.stderr = stderr
+        self.verdict = verdict  # OK, TLE, MLE, OLE or RE
+        self.error = error
+        self.cpu_time_ms = cpu_time_ms
+        self.wall_time_ms = wall_time_ms
+        self.memory_kb = memory_kb
+        # Whether the output matched the expected output (None when not compared)
+        self.passed = passed
+
+
+def read_output(path, max_output_size, marker):
+    """Read the start of an output file for display, never the whole file."""
+    with open(path, 'rb') as output_file:
+        # Up to 4 bytes per character in UTF-8
+        text = output_file.read(max_output_size * 4).decode('utf-8', errors='ignore').strip()
+    # Limit output size to prevent memory issues
+    if len(text) > max_output_size or os.path.getsize(path) > max_output_size * 4:
+        text = text[:max_output_size] + f"\n... ({marker} truncated)"
+    return text
+
+
+def classify_run(usage, stderr, output_size, time_limit_ms, memory_limit_kb, output_limit_bytes):
+    """:return: Tuple of (verdict, error message)"""
+    if usage.signal == SIGXFSZ or output_size >= output_limit_bytes:
+        return 'OLE', " Output Limit Exceeded"
+    if usage.timed_out or usage.cpu_time_ms > time_limit_ms or usage.signal == SIGXCPU:
+        return 'TLE', "⏱️ Time Limit Exceeded"
+    out_of_memory = any(marker in stderr for marker in OUT_OF_MEMORY_MARKERS)
+    if (memory_limit_kb and usage.memory_kb > memory_limit_kb) or (usage.failed and out_of_memory):
+        return 'MLE', " Memory Limit Exceeded"
+    if usage.failed:
+        if stderr:
+            return 'RE', f" Runtime Error:\n{stderr}"
+        if usage.signal:
+            return 'RE', f" Runtime Error: killed by signal {usage.signal}"
+        return 'RE', f" Runtime Error: exited with code {usage.exit_code}"
+    return 'OK', ''
+
+
+def run_compiled(build: BuildArtifact, input_data: str = '',
+                 time_limit_ms=DEFAULT_TIME_LIMIT_MS, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB,
+                 input_path=None, answer_path=None, checker=None):
+    """
+    Runs an already compiled submission against one input, under CPU, wall-time,
+    memory and output-size limits.
+    :param build: The BuildArtifact returned by compile_code.
+    :param input_data: Sample input for the program, used when input_path is not given.
+    :param time_limit_ms: CPU time limit of the problem.
+    :param memory_limit_mb: Memory limit of the problem.
+    :param input_path: File handed to the program as its stdin (see testdata.py).
+    :param answer_path: If given, the output is checked against this file.
+    :param checker: Checker deciding whether the output is accepted (default: ExactChecker).
+    :return: RunResult with the start of the output, verdict and measured usage.
+    """
+    config = LANGUAGE_CONFIG[build.lang]
+    cmd = list(build.run_cmd)
+    memory_bytes = memory_limit_mb * 1024 * 1024
+    memory_limit_kb = memory_limit_mb * 1024
+    resident = build.lang == 'java' and java_runner.resident_mode()
+    if 'memory_flag' in config and not resident:
+        # Runtimes that reserve a lot of address space (the JVM) get a heap limit
+        # instead of an address-space rlimit; their RSS includes the runtime itself.
+        cmd.insert(1, config['memory_flag'].format(memory_mb=memory_limit_mb))
+        memory_bytes = 0
+        memory_limit_kb = 0
+    output_limit_bytes = settings.JUDGE_OUTPUT_LIMIT_BYTES
+    wall_ms = time_limit_ms * WALL_TIME_FACTOR + 1000
+
+    sandbox = get_sandbox_pool().acquire()
+    try:
+        output_path = os.path.join(sandbox, 'output.txt')
+        error_path = os.path.join(sandbox, 'error.txt')
+        if input_path is None:
+            input_path = os.path.join(sandbox, 'input.txt')
+            with open(input_path, 'wb') as input_file:
+                input_file.write(input_data.encode('utf-8'))
+
+        # The program writes straight to files in its sandbox; the kernel enforces the
+        # size cap, so a runaway program never fills the judge's memory
+        with metrics.span('run', build.lang):
+            usage = None
+            if resident:
+                # Measured memory is the heap growth of the run, checked against the limit
+                usage = java_runner.run_main(
+                    build.build_dir, input_path, output_path, error_path,
+                    time_limit_ms, wall_ms, output_limit_bytes,
+                )
+            elif 'compiled_file' in config and python_runner.zygote_mode():
                 try:
-                    shutil.rmtree(tmpdir)
-                    break
-                except PermissionError as retry_err:
-                    if retry_err.errno != errno.EACCES:
-                        raise
-            else:
-                # Could not delete temp folder after retries — log or ignore
-                pass
+                    with open(input_path, 'rb') as stdin, open(output_path, 'wb') as stdout, open(error_path, 'wb') as stderr:
+                        usage = python_runner.execute(
+                            config['run_cmd'][0],
+                            os.path.join(build.build_dir, config['source_file']),
+                            os.path.join(build.build_dir, config['compiled_file']),
+                            stdin, stdout, stderr,
+                            cpu_seconds=math.ceil(time_limit_ms / 1000),
+                            memory_bytes=memory_bytes,
+                            wall_ms=wall_ms,
+                            output_bytes=output_limit_bytes,
+                        )
+                except python_runner.ZygoteError:
+                    # Not the submission's fault: run the test case again as a plain process
+                    usage = None
+            if usage is None:
+                with open(input_path, 'rb') as stdin, open(output_path, 'wb') as stdout, open(error_path, 'wb') as stderr:
+                    usage = execute(
+                        cmd, sandbox, stdin, stdout, stderr,
+                        cpu_seconds=math.ceil(time_limit_ms / 1000),
+                        memory_bytes=memory_bytes,
+                        wall_ms=wall_ms,
+                        output_bytes=output_limit_bytes,
+                    )
+
+        stdout = read_output(output_path, MAX_DISPLAY_SIZE, 'output')
+        stderr = read_output(error_path, MAX_DISPLAY_SIZE, 'error')
+        verdict, error = classify_run(
+            usage, stderr, os.path.getsize(output_path), time_limit_ms, memory_limit_kb, output_limit_bytes
+        )
+
+        passed = None
+        if verdict == 'OK' and answer_path is not None:
+            with metrics.span('compare', build.lang):
+                passed = (checker or ExactChecker()).check(output_path, input_path, answer_path)
+
+        return RunResult(
+            stdout='' if error else stdout,
+            stderr=stderr,
+            verdict=verdict,
+            error=error,
+            cpu_time_ms=usage.cpu_time_ms,
+            wall_time_ms=usage.wall_time_ms,
+            memory_kb=usage.memory_kb,
+            passed=passed,
+        )
+
+    except CheckerError:
+        # Not the submission's fault; the caller reports it as a judge error
+        raise
+    except FileNotFoundError as e:
+        return RunResult(verdict='RE', error=f" File not found error: {str(e)}")
+    except Exception as e:
+        return RunResult(verdict='RE', error=f" Unexpected error: {str(e)}")
+    finally:
+        get_sandbox_pool().release(sandbox)
+
+
+def compile_and_run(code: str, lang: str, input_data: str):
+    """
+    Compiles and runs code submitted by the user.
+    :param code: The source code submitted.
+    :param lang: One of 'c', 'cpp', 'java', 'python'
+    :param input_data: Sample input for the program.
+    :return: Tuple of (stdout, error)
+    """
+    build, error = compile_code(code, lang)
+    if build is None:
+        return '', error
+
+    try:
+        result = run_compiled(build, input_data)
+        return result.stdout, result.error
+    finally:
+        build.cleanup()
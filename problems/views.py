@@ -1,30 +1,67 @@
 # problems/views.py
 
+import asyncio
+import hmac
+import json
+import logging
+import time
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.db.models import Count
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_exempt
 # from users.views import session_valid_required
-from .models import Problem, Topic, TestCase, Submission
-from .utils import compile_and_run
+from users.stats import problem_marks
+
+from .models import Problem, Topic, TestCase, Submission, TestResult
+from .testdata import preview
+from .utils import MAX_DISPLAY_SIZE, compile_code, run_compiled
+from .judge import (
+    PENDING, UNFINISHED_STATUSES, apply_cached_verdict, apply_sample_run, judge_submission, load_checker,
+    copy_test_results, remember_sample_run, source_hash,
+)
+from . import listing, metrics
+from .signals import submission_judged
+from .checkers import CheckerError
 from .ai_review import AICodeReviewer
 
+logger = logging.getLogger(__name__)
+
+# How often the events stream looks for new test results, and when it gives up
+SUBMISSION_EVENTS_INTERVAL_SECONDS = 0.5
+SUBMISSION_EVENTS_TIMEOUT_SECONDS = 600
+
 #  View to show problem list
 @login_required
 # @session_valid_required
 @never_cache
 def problem_list(request):
     topic_filter = request.GET.get('topic')
-    topics = Topic.objects.all()
+    topics = Topic.objects.only('id', 'name')
+    after = listing.parse_cursor(request.GET.get('after'))
+    before = listing.parse_cursor(request.GET.get('before'))
 
+    topic_id = None
     if topic_filter:
-        problems = Problem.objects.filter(topic__name=topic_filter)
+        topic_id = Topic.objects.filter(name=topic_filter).values_list('id', flat=True).first()
+    if topic_filter and topic_id is None:
+        page = {'problems': [], 'previous': None, 'next': None}
     else:
-        problems = Problem.objects.all()
+        page = listing.listing_page(topic_id, after, before)
+
+    # The cached page is the same for everyone; the markers are per user
+    marks = problem_marks(request.user, [problem['id'] for problem in page['problems']])
+    problems = [{**problem, 'mark': marks.get(problem['id'])} for problem in page['problems']]
 
     return render(request, 'problems/problem_list.html', {
         'problems': problems,
+        'previous_cursor': page['previous'],
+        'next_cursor': page['next'],
         'topics': topics,
         'selected_topic': topic_filter
     })
@@ -47,10 +84,9 @@ def problem_detail(request, problem_id):
         # Check if this is an AJAX request
         is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
         
-        # Debug: Print request details
-        print(f"DEBUG: POST request received. Code length: {len(code) if code else 0}, Language: {language}, Run sample: {run_sample}")
-        print(f"DEBUG: Is AJAX: {is_ajax}")
-        print(f"DEBUG: Headers: {dict(request.headers)}")
+        logger.debug("Problem %s: %s", problem.id, 'sample run' if run_sample else 'submit', extra={'fields': {
+            'user': request.user.id, 'language': language, 'code_bytes': len(code) if code else 0, 'ajax': is_ajax,
+        }})
 
         if not code or not language:
             error = 'Please provide both code and language.'
@@ -63,7 +99,8 @@ def problem_detail(request, problem_id):
                     'test_results': [],
                 })
         else:
-            testcases = TestCase.objects.filter(problem=problem)
+            # Test data is read from the store; only previews of it are shown
+            testcases = TestCase.objects.filter(problem=problem).order_by('id').only('id', 'input_hash', 'output_hash')
             
             # Check if there are test cases
             if not testcases.exists():
@@ -83,150 +120,118 @@ def problem_detail(request, problem_id):
                     all_passed = True
                     test_results = []  # Reset test results for sample tests
                 
-                    for i, testcase in enumerate(testcases):
-                        out, err = compile_and_run(code, language, testcase.input_data)
-                        if err:
-                            error_lines = [
-                                f"Compilation/Runtime Error on Test Case {i+1}",
-                                f"Input: {testcase.input_data}",
-                                f"Error Details:",
-                                f"{err}"
-                            ]
-                            error = "\n".join(error_lines)
-                            all_passed = False
-                            break
-                        elif out.strip() != testcase.output_data.strip():
-                            error_lines = [
-                                f"Wrong Answer on Test Case {i+1}",
-                                f"Input: {testcase.input_data}",
-                                f"Expected Output: {testcase.output_data}",
-                                f"Your Output: {out}",
-                                f"Status: FAILED"
-                            ]
-                            error = "\n".join(error_lines)
-                            all_passed = False
-                            break
-                        else:
-                            test_results.append({
-                                'testcase_id': testcase.id,
-                                'input_data': testcase.input_data,
-                                'expected_output': testcase.output_data,
-                                'status': 'PASSED',
-                                'output': out
-                            })
-                    
-                    if all_passed:
-                        # Show the actual output from all test cases
-                        if test_results:
-                            output_lines = ["Sample Test Cases Results:"]
-                            for i, result in enumerate(test_results, 1):
-                                output_lines.append(f"\nTest Case {i}:")
-                                output_lines.append(f"Input: {result['input_data']}")
-                                output_lines.append(f"Expected: {result['expected_output']}")
-                                output_lines.append(f"Output: {result['output']}")
-                                output_lines.append("Status: PASSED")
-                            output = "\n".join(output_lines)
-                        else:
-                            output = "All sample test cases passed!"
-                        status = 'Sample Tests Passed'
-                else:
-                    # Run all test cases for submission
-                    print(f"DEBUG: Starting full submission for {len(testcases)} test cases")
-                    all_passed = True
-                    test_results = []  # Initialize test results for full submission
-                    
+                    # Compile once and reuse the build for every sample test case
+                    build, compile_error = compile_code(code, language)
+                    checker = None
                     try:
+                        if build is not None:
+                            checker = load_checker(problem)
                         for i, testcase in enumerate(testcases):
-                            print(f"DEBUG: Processing test case {i+1}/{len(testcases)}")
-                            try:
-                                out, err = compile_and_run(code, language, testcase.input_data)
-                                print(f"DEBUG: Test case {i+1} result - out: {len(str(out)) if out else 0} chars, err: {len(str(err)) if err else 0} chars")
-                            except Exception as compile_error:
-                                print(f"DEBUG: Exception in compile_and_run for test case {i+1}: {str(compile_error)}")
-                                out, err = '', f"Compilation/Runtime Error: {str(compile_error)}"
-                            
+                            input_path, answer_path = testcase.input_path(), testcase.answer_path()
+                            if build is None:
+                                out, err = '', compile_error
+                            else:
+                                run = run_compiled(
+                                    build, time_limit_ms=problem.time_limit_ms, memory_limit_mb=problem.memory_limit_mb,
+                                    input_path=input_path, answer_path=answer_path, checker=checker,
+                                )
+                                out, err = run.stdout, run.error
+                            input_text = preview(input_path, MAX_DISPLAY_SIZE)
+                            expected_text = preview(answer_path, MAX_DISPLAY_SIZE)
                             if err:
                                 error_lines = [
-                                    f"Compilation/Runtime Error",
-                                    f"Input: {testcase.input_data}",
+                                    f"Compilation/Runtime Error on Test Case {i+1}",
+                                    f"Input: {input_text}",
                                     f"Error Details:",
                                     f"{err}"
                                 ]
                                 error = "\n".join(error_lines)
                                 all_passed = False
-                                # Add failed test case to results
-                                test_results.append({
-                                    'testcase_id': testcase.id,
-                                    'input_data': testcase.input_data,
-                                    'expected_output': testcase.output_data,
-                                    'status': 'ERROR',
-                                    'output': f"Error: {err}"
-                                })
                                 break
-                            elif out.strip() != testcase.output_data.strip():
+                            elif not run.passed:
                                 error_lines = [
-                                    f"Wrong Answer",
-                                    f"Input: {testcase.input_data}",
-                                    f"Expected Output: {testcase.output_data}",
-                                    f"Your Output: {out}"
+                                    f"Wrong Answer on Test Case {i+1}",
+                                    f"Input: {input_text}",
+                                    f"Expected Output: {expected_text}",
+                                    f"Your Output: {out}",
+                                    f"Status: FAILED"
                                 ]
                                 error = "\n".join(error_lines)
                                 all_passed = False
-                                # Add failed test case to results
-                                test_results.append({
-                                    'testcase_id': testcase.id,
-                                    'input_data': testcase.input_data,
-                                    'expected_output': testcase.output_data,
-                                    'status': 'FAILED',
-                                    'output': out
-                                })
                                 break
                             else:
-                                # Add passed test case to results
                                 test_results.append({
                                     'testcase_id': testcase.id,
-                                    'input_data': testcase.input_data,
-                                    'expected_output': testcase.output_data,
+                                    'input_data': input_text,
+                                    'expected_output': expected_text,
                                     'status': 'PASSED',
-                                    'output': out
+                                    'output': out,
+                                    'verdict': 'AC',
+                                    'cpu_time_ms': run.cpu_time_ms,
+                                    'wall_time_ms': run.wall_time_ms,
+                                    'memory_kb': run.memory_kb
                                 })
-                        
-                        # Save the submission
-                        result = 'AC' if all_passed else 'WA'
-                        try:
-                            Submission.objects.create(
-                                user=request.user,
-                                problem=problem,
-                                language=language,
-                                code=code,
-                                status=result
-                            )
-                        except Exception as db_error:
-                            print(f"DEBUG: Database error: {str(db_error)}")
-                            # Continue with the response even if DB save fails
-                        
-                        print(f"DEBUG: Full submission completed. All passed: {all_passed}, Test results count: {len(test_results)}")
-                        if all_passed:
-                            output = "All test cases passed! Solution submitted successfully."
-                            status = 'Accepted'
-                        else:
-                            status = 'Wrong Answer'
-                    except Exception as e:
-                        print(f"DEBUG: Exception during code execution: {str(e)}")
-                        error = f"Server error during code execution: {str(e)}"
-                        status = 'Error'
+                    except CheckerError as checker_error:
+                        error = f"Judge error: {checker_error}"
                         all_passed = False
-                        # Ensure test_results is properly set even on error
-                        if not test_results:
-                            test_results = []
+                    finally:
+                        if build is not None:
+                            build.cleanup()
+                        if checker is not None:
+                            checker.close()
+                        metrics.flush()
+                    
+                    # A submit of the same code within JUDGE_SAMPLE_RUN_TTL does not run these again
+                    remember_sample_run(request.user.id, problem, language, source_hash(code), test_results)
+
+                    if all_passed:
+                        # Show the actual output from all test cases
+                        if test_results:
+                            output_lines = ["Sample Test Cases Results:"]
+                            for i, result in enumerate(test_results, 1):
+                                output_lines.append(f"\nTest Case {i}:")
+                                output_lines.append(f"Input: {result['input_data']}")
+                                output_lines.append(f"Expected: {result['expected_output']}")
+                                output_lines.append(f"Output: {result['output']}")
+                                output_lines.append("Status: PASSED")
+                                output_lines.append(f"Time: {result['cpu_time_ms']} ms, Memory: {result['memory_kb']} KB")
+                            output = "\n".join(output_lines)
+                        else:
+                            output = "All sample test cases passed!"
+                        status = 'Sample Tests Passed'
+                else:
+                    # Queue the submission; a judge worker picks it up so this
+                    # request returns immediately instead of waiting for every test case.
+                    # Identical code already judged against the same test data reuses that verdict.
+                    submission = Submission(
+                        user=request.user,
+                        problem=problem,
+                        language=language,
+                        code=code,
+                        source_hash=source_hash(code),
+                        status=PENDING
+                    )
+                    if apply_cached_verdict(submission, problem.testdata_version):
+                        submission.save()
+                        copy_test_results(submission.verdict_source_id, [submission])
+                        submission_judged.send(sender=Submission, submission=submission, first_verdict=True)
+                    else:
+                        apply_sample_run(submission, problem)
+                        submission.save()
+                    if settings.JUDGE_INLINE and submission.status == PENDING:
+                        judge_submission(submission)
+
+                    if is_ajax:
+                        return JsonResponse(submission_payload(submission))
+
+                    status = submission.get_status_display()
+                    output = submission.output or 'Your solution has been queued for judging.'
+                    error = submission.error
+                    test_results = submission.test_results
         
         # Return JSON response for AJAX requests
         if is_ajax:
             try:
-                # Debug: Print what we're about to return
-                print(f"DEBUG: AJAX request detected. Output: {output}, Error: {error}, Status: {status}")
-                print(f"DEBUG: Test results count: {len(test_results)}")
-                
                 # Ensure all data is JSON serializable
                 response_data = {
                     'output': str(output) if output else '',
@@ -236,10 +241,8 @@ def problem_detail(request, problem_id):
                 }
                 
                 # Safely convert test_results to JSON serializable format
-                print(f"DEBUG: Processing {len(test_results)} test results for JSON response")
                 if test_results:
-                    for i, result in enumerate(test_results):
-                        print(f"DEBUG: Processing test result {i+1}: {type(result)}")
+                    for result in test_results:
                         if isinstance(result, dict):
                             response_data['test_results'].append({
                                 k: str(v) if v is not None else '' 
@@ -247,13 +250,13 @@ def problem_detail(request, problem_id):
                             })
                         else:
                             response_data['test_results'].append(str(result))
-                else:
-                    print("DEBUG: No test results to process")
-                
-                print(f"DEBUG: Final JSON response data: {response_data}")
+
+                logger.debug("Problem %s: responding", problem.id, extra={'fields': {
+                    'status': status, 'tests': len(test_results), 'output_chars': len(str(output or '')),
+                }})
                 return JsonResponse(response_data)
             except Exception as e:
-                print(f"DEBUG: Exception in JSON response: {str(e)}")
+                logger.exception("Problem %s: could not build the JSON response", problem.id)
                 return JsonResponse({
                     'output': '',
                     'error': f'Server error: {str(e)}',
@@ -270,6 +273,121 @@ def problem_detail(request, problem_id):
     })
 
 
+def submission_payload(submission):
+    """JSON body describing a queued or judged submission."""
+    return {
+        'submission_id': submission.id,
+        'state': submission.status,
+        'done': submission.status not in UNFINISHED_STATUSES,
+        'status': submission.get_status_display(),
+        'output': submission.output,
+        'error': submission.error,
+        'test_results': submission.test_results,
+        'status_url': reverse('submission_status', args=[submission.id]),
+        'events_url': reverse('submission_events', args=[submission.id]),
+        'results_url': reverse('submission_results', args=[submission.id]),
+    }
+
+
+def test_result_payload(row):
+    return {
+        'position': row.position,
+        'testcase_id': row.testcase_id,
+        'status': row.status,
+        'cpu_time_ms': row.cpu_time_ms,
+        'wall_time_ms': row.wall_time_ms,
+        'memory_kb': row.memory_kb,
+    }
+
+
+#  Polling endpoint for queued submissions
+@login_required
+@never_cache
+def submission_status(request, submission_id):
+    submission = get_object_or_404(Submission, id=submission_id, user=request.user)
+    return JsonResponse(submission_payload(submission))
+
+
+#  Verdict and usage of every test case a submission ran; fetched once it is judged
+@login_required
+@never_cache
+def submission_results(request, submission_id):
+    submission = get_object_or_404(Submission.objects.only('id'), id=submission_id, user=request.user)
+    rows = TestResult.objects.filter(submission=submission).order_by('position')
+    return JsonResponse({'results': [test_result_payload(row) for row in rows]})
+
+
+def metrics_allowed(request):
+    """Staff users, or a scraper presenting JUDGE_METRICS_TOKEN as a bearer token."""
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = settings.JUDGE_METRICS_TOKEN
+    return bool(token) and hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f"Bearer {token}".encode()
+    )
+
+
+#  Prometheus scrape endpoint: judge phase timings of every process, plus the queue
+@never_cache
+def judge_metrics(request):
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    now = timezone.now()
+    unfinished = dict(
+        Submission.objects.filter(status__in=UNFINISHED_STATUSES)
+        .values_list('status').annotate(count=Count('id'))
+    )
+    oldest = Submission.objects.filter(status=PENDING).order_by('submitted_at').values_list(
+        'submitted_at', flat=True
+    ).first()
+    gauges = [
+        ('submissions_unfinished', 'Submissions waiting for or being judged.',
+         [((('status', status),), unfinished.get(status, 0)) for status in UNFINISHED_STATUSES]),
+        ('queue_oldest_pending_seconds', 'Age of the oldest Pending submission.',
+         [((), (now - oldest).total_seconds() if oldest else 0)]),
+    ]
+    return HttpResponse(metrics.render(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def server_sent_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def submission_event_stream(submission):
+    """
+    Yields a `progress` event per finished test case and a final `verdict` event
+    carrying the same payload as the status endpoint.
+    """
+    sent = 0
+    deadline = time.monotonic() + SUBMISSION_EVENTS_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        async for row in TestResult.objects.filter(submission_id=submission.id, position__gt=sent):
+            sent = row.position
+            yield server_sent_event('progress', test_result_payload(row))
+        await submission.arefresh_from_db()
+        if submission.status not in UNFINISHED_STATUSES:
+            yield server_sent_event('verdict', submission_payload(submission))
+            return
+        # Comment line; keeps proxies from closing an idle stream
+        yield ": waiting\n\n"
+        await asyncio.sleep(SUBMISSION_EVENTS_INTERVAL_SECONDS)
+    yield server_sent_event('timeout', {'status_url': reverse('submission_status', args=[submission.id])})
+
+
+#  Live judging progress as Server-Sent Events; needs the ASGI server to stream
+@login_required
+@never_cache
+async def submission_events(request, submission_id):
+    user = await request.auser()
+    submission = await Submission.objects.filter(id=submission_id, user=user).afirst()
+    if submission is None:
+        raise Http404("No such submission")
+    response = StreamingHttpResponse(submission_event_stream(submission), content_type='text/event-stream')
+    # Tells nginx not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @csrf_exempt
 @login_required
 # @session_valid_required
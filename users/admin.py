@@ -1,3 +1,18 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import UserProblemStats, UserStats
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'problems_solved', 'problems_attempted', 'submissions', 'updated_at')
+    search_fields = ('user__username',)
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(UserProblemStats)
+class UserProblemStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'problem', 'attempts', 'solved', 'first_solved_at')
+    list_filter = ('solved',)
+    search_fields = ('user__username', 'problem__title')
+    readonly_fields = ('updated_at',)
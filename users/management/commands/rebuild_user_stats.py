@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from users.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = ('Recompute the per-user solve statistics and leaderboard scores from the submissions '
+            'table. Leaderboards reload at their next sync with a shared cache, otherwise within '
+            'LEADERBOARD_RELOAD_SECONDS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', default=[],
+                            help='Only this user id (repeatable); default is every user.')
+
+    def handle(self, *args, **options):
+        count = rebuild(options['user'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats of {count} user(s)."))
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Q
+
+
+def backfill_user_stats(apps, schema_editor):
+    Submission = apps.get_model('problems', 'Submission')
+    UserProblemStats = apps.get_model('users', 'UserProblemStats')
+    UserStats = apps.get_model('users', 'UserStats')
+    rows = Submission.objects.exclude(status__in=['Pending', 'Running']).values('user_id', 'problem_id').annotate(
+        attempts=Count('id'),
+        accepted=Count('id', filter=Q(status='AC')),
+        first_solved_at=Min('submitted_at', filter=Q(status='AC')),
+    )
+    problem_stats = []
+    totals = {}
+    for row in rows.iterator():
+        problem_stats.append(UserProblemStats(
+            user_id=row['user_id'], problem_id=row['problem_id'], attempts=row['attempts'],
+            solved=row['accepted'] > 0, first_solved_at=row['first_solved_at'],
+        ))
+        user_totals = totals.setdefault(row['user_id'], UserStats(user_id=row['user_id']))
+        user_totals.submissions += row['attempts']
+        user_totals.problems_attempted += 1
+        user_totals.problems_solved += row['accepted'] > 0
+    UserProblemStats.objects.bulk_create(problem_stats, batch_size=1000)
+    UserStats.objects.bulk_create(totals.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('problems', '0009_submission_timings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('submissions', models.PositiveIntegerField(default=0)),
+                ('problems_attempted', models.PositiveIntegerField(default=0)),
+                ('problems_solved', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserProblemStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('solved', models.BooleanField(default=False)),
+                ('first_solved_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_stats', to='problems.problem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='problem_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'problem'), name='unique_user_problem_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:20
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+PENALTY_MINUTES_PER_REJECTED = 20
+
+
+def backfill_scores(apps, schema_editor):
+    Submission = apps.get_model('problems', 'Submission')
+    UserProblemStats = apps.get_model('users', 'UserProblemStats')
+    UserStats = apps.get_model('users', 'UserStats')
+    penalties = defaultdict(int)
+    topics = defaultdict(lambda: defaultdict(int))
+    for stats in UserProblemStats.objects.filter(solved=True).select_related('problem').iterator():
+        rejected = Submission.objects.filter(
+            user_id=stats.user_id, problem_id=stats.problem_id, submitted_at__lt=stats.first_solved_at
+        ).exclude(status__in=['Pending', 'Running', 'AC', 'CE', 'Error']).count()
+        stats.penalty_minutes = rejected * PENALTY_MINUTES_PER_REJECTED
+        stats.save(update_fields=['penalty_minutes'])
+        penalties[stats.user_id] += stats.penalty_minutes
+        topics[stats.user_id][str(stats.problem.topic_id)] += 1
+    for user_stats in UserStats.objects.filter(user_id__in=list(topics)).iterator():
+        user_stats.penalty_minutes = penalties[user_stats.user_id]
+        user_stats.topic_solved = dict(topics[user_stats.user_id])
+        user_stats.save(update_fields=['penalty_minutes', 'topic_solved'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0010_hot_query_indexes'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userproblemstats',
+            name='penalty_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='penalty_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='topic_solved',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='userstats',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
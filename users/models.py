@@ -1,3 +1,42 @@
+# users/models.py
+
+from django.contrib.auth.models import User
 from django.db import models
 
-# Create your models here.
+from problems.models import Problem
+
+
+class UserProblemStats(models.Model):
+    """A user's standing on one problem, updated as each verdict is written (see users/stats.py)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='problem_stats')
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='user_stats')
+    attempts = models.PositiveIntegerField(default=0)
+    solved = models.BooleanField(default=False)
+    first_solved_at = models.DateTimeField(null=True, blank=True)
+    # Penalty this problem adds to the user's score once solved (see users/stats.py)
+    penalty_minutes = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'problem'], name='unique_user_problem_stats'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} on {self.problem_id}: {'solved' if self.solved else 'attempted'}"
+
+
+class UserStats(models.Model):
+    """Totals over a user's UserProblemStats, so the dashboard reads one row."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    submissions = models.PositiveIntegerField(default=0)
+    problems_attempted = models.PositiveIntegerField(default=0)
+    problems_solved = models.PositiveIntegerField(default=0)
+    penalty_minutes = models.PositiveIntegerField(default=0)
+    # Solved problems per topic id
+    topic_solved = models.JSONField(default=dict, blank=True)
+    # The leaderboard of each process picks up rows changed since its last sync (see users/ranking.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.problems_solved} solved"
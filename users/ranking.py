@@ -0,0 +1,130 @@
+# users/ranking.py
+#
+# The leaderboard: users ordered by problems solved, then by penalty minutes
+# (fewer is better), kept per process as a sorted list so that top-N and
+# "my rank" are a slice and a bisect. Scores live in UserStats, which
+# users/stats.py updates on every verdict. Each process catches up by reading
+# the UserStats rows changed since its last sync, at most every
+# LEADERBOARD_SYNC_SECONDS. `manage.py rebuild_user_stats` and deleted users
+# make every process reload from scratch through a generation key in the cache;
+# with a per-process cache (CACHE_IS_SHARED off) that key only reaches the
+# process that changed it, so each process also reloads every
+# LEADERBOARD_RELOAD_SECONDS.
+
+import threading
+import time
+import uuid
+from bisect import bisect_left, insort
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import UserStats
+
+GENERATION_KEY = 'leaderboard:generation'
+
+# Rows are read again for this long after a sync, so a verdict committed just
+# after its updated_at was set is not missed
+SYNC_OVERLAP = timedelta(seconds=10)
+
+Entry = namedtuple('Entry', 'user_id username problems_solved penalty_minutes topic_solved')
+Standing = namedtuple('Standing', 'rank entry')
+
+
+def sort_key(entry):
+    return (-entry.problems_solved, entry.penalty_minutes, entry.user_id)
+
+
+def load_entries(queryset):
+    for row in queryset.values_list('user_id', 'user__username', 'problems_solved', 'penalty_minutes', 'topic_solved'):
+        yield Entry(*row)
+
+
+def reload_everywhere():
+    """Has every process reload its leaderboard on its next sync, e.g. after a rebuild."""
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def current_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+class Leaderboard:
+    """Users with at least one solved problem, best first; safe to share between threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._entries = {}
+        self._generation = None
+        self._synced_until = None
+        self._next_sync = 0.0
+        self._next_reload = 0.0
+
+    def _apply(self, entry):
+        """Moves one user to the position of their current score."""
+        old = self._entries.pop(entry.user_id, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, sort_key(old))]
+        if entry.problems_solved:
+            insort(self._keys, sort_key(entry))
+            self._entries[entry.user_id] = entry
+
+    def sync(self, force=False):
+        """Catches up with the scores written since the last sync (by any process)."""
+        with self._lock:
+            if not force and time.monotonic() < self._next_sync:
+                return
+            generation = current_generation()
+            started = timezone.now()
+            reload_due = not settings.CACHE_IS_SHARED and time.monotonic() >= self._next_reload
+            if generation != self._generation or self._synced_until is None or reload_due:
+                self._entries = {
+                    entry.user_id: entry for entry in load_entries(UserStats.objects.filter(problems_solved__gt=0))
+                }
+                self._keys = sorted(sort_key(entry) for entry in self._entries.values())
+                self._generation = generation
+                self._next_reload = time.monotonic() + settings.LEADERBOARD_RELOAD_SECONDS
+            else:
+                for entry in load_entries(UserStats.objects.filter(updated_at__gte=self._synced_until - SYNC_OVERLAP)):
+                    self._apply(entry)
+            self._synced_until = started
+            self._next_sync = time.monotonic() + settings.LEADERBOARD_SYNC_SECONDS
+
+    def top(self, count):
+        """
+        :return: The best `count` users as Standings; tied users share a rank.
+        """
+        self.sync()
+        with self._lock:
+            return [Standing(self._rank(key), self._entries[key[2]]) for key in self._keys[:count]]
+
+    def standing(self, user_id):
+        """
+        :return: The user's Standing, or None if they have not solved a problem yet.
+        """
+        self.sync()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            return Standing(self._rank(sort_key(entry)), entry)
+
+    def __len__(self):
+        self.sync()
+        with self._lock:
+            return len(self._keys)
+
+    def _rank(self, key):
+        # Users with the same solved count and penalty share a rank
+        return bisect_left(self._keys, key[:2]) + 1
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,62 @@
+# users/signals.py
+
+import threading
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from problems.judge import UNFINISHED_STATUSES
+from problems.models import Problem, Submission, Topic
+from problems.signals import submission_judged
+
+from .ranking import reload_everywhere
+from .stats import rebuild, record_verdict
+
+# Users to rebuild when the current transaction commits. Deleting a problem or a
+# topic sends post_delete for each of its submissions; their users share one rebuild.
+_stale_users = threading.local()
+
+
+def rebuild_on_commit(user_ids):
+    pending = getattr(_stale_users, 'ids', None)
+    if pending is None:
+        pending = _stale_users.ids = set()
+    pending.update(user_ids)
+    transaction.on_commit(rebuild_pending)
+
+
+def rebuild_pending():
+    user_ids = getattr(_stale_users, 'ids', None)
+    _stale_users.ids = None
+    if user_ids:
+        rebuild(user_ids)
+
+
+@receiver(submission_judged)
+def update_user_stats(sender, submission, first_verdict, **kwargs):
+    record_verdict(submission, first_verdict)
+
+
+@receiver(post_delete, sender=User)
+def drop_from_leaderboards(sender, instance, **kwargs):
+    """A deleted user's stats go with them; every process reloads its leaderboard."""
+    reload_everywhere()
+
+
+@receiver(post_delete, sender=Submission)
+def forget_submission(sender, instance, **kwargs):
+    """A deleted verdict no longer counts: its user's stats are rebuilt."""
+    if instance.status not in UNFINISHED_STATUSES:
+        rebuild_on_commit([instance.user_id])
+
+
+@receiver(post_delete, sender=Problem)
+@receiver(post_delete, sender=Topic)
+def forget_problems(sender, instance, **kwargs):
+    """
+    Solves of a deleted problem no longer count. Its submissions, deleted first,
+    queued their users for a rebuild, which also reloads every leaderboard.
+    """
+    rebuild_on_commit(())
@@ -0,0 +1,178 @@
+# users/stats.py
+#
+# Keeps UserProblemStats and UserStats in step with verdicts. record_verdict is
+# called for every verdict written (through the submission_judged signal) and
+# only touches the rows of that user and problem; rebuild recomputes everything
+# from the submissions table for backfills and repairs.
+#
+# Scores follow ICPC rules without a contest clock: a solved problem adds
+# PENALTY_MINUTES_PER_REJECTED for every rejected submission made before the
+# first accepted one. Compilation and judge errors are not penalized.
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from problems.judge import UNFINISHED_STATUSES
+from problems.models import Problem, Submission
+
+from . import ranking
+from .models import UserProblemStats, UserStats
+
+PENALTY_MINUTES_PER_REJECTED = 20
+
+# Verdicts that cost no penalty
+NOT_PENALIZED_STATUSES = UNFINISHED_STATUSES + ('AC', 'CE', 'Error')
+
+
+def record_verdict(submission, first_verdict):
+    """
+    Applies one verdict to its user's stats.
+    :param first_verdict: False when a judged submission was judged again (a
+                          rejudge), so it does not count as another attempt.
+    """
+    if submission.status in UNFINISHED_STATUSES:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        UserStats.objects.get_or_create(user_id=submission.user_id)
+        problem_stats, created = UserProblemStats.objects.get_or_create(
+            user_id=submission.user_id, problem_id=submission.problem_id
+        )
+        totals = {}
+        if first_verdict:
+            UserProblemStats.objects.filter(pk=problem_stats.pk).update(attempts=F('attempts') + 1, updated_at=now)
+            totals['submissions'] = F('submissions') + 1
+        if created:
+            totals['problems_attempted'] = F('problems_attempted') + 1
+        if totals:
+            UserStats.objects.filter(pk=submission.user_id).update(updated_at=now, **totals)
+
+        # A new verdict changes the standing when it solves an unsolved problem,
+        # or when it was submitted before the first solve but judged after it
+        # (judge workers run in parallel): an accept moves the solve earlier, a
+        # rejection adds penalty. A rejudge can change anything.
+        earlier = problem_stats.solved and submission.submitted_at < problem_stats.first_solved_at
+        solves = submission.status == 'AC' and (not problem_stats.solved or earlier)
+        penalizes = earlier and submission.status not in NOT_PENALIZED_STATUSES
+        if not first_verdict or solves or penalizes:
+            refresh_standing(submission.user_id, submission.problem_id)
+
+
+def standing(user_id, problem_id):
+    """
+    Whether and when the user solved the problem, from the submissions table.
+    :return: (first_solved_at or None, penalty_minutes).
+    """
+    submissions = Submission.objects.filter(user_id=user_id, problem_id=problem_id)
+    first_solved_at = submissions.filter(status='AC').aggregate(first=Min('submitted_at'))['first']
+    if first_solved_at is None:
+        return None, 0
+    rejected = submissions.filter(submitted_at__lt=first_solved_at).exclude(
+        status__in=NOT_PENALIZED_STATUSES
+    ).count()
+    return first_solved_at, rejected * PENALTY_MINUTES_PER_REJECTED
+
+
+def refresh_standing(user_id, problem_id):
+    """Recomputes the user's standing on a problem and moves the user's totals by the difference."""
+    with transaction.atomic():
+        # Locked, so concurrent verdicts of the same user and problem apply one after the other
+        problem_stats = UserProblemStats.objects.select_for_update().get(user_id=user_id, problem_id=problem_id)
+        first_solved_at, penalty = standing(user_id, problem_id)
+        solved = first_solved_at is not None
+        if (problem_stats.solved, problem_stats.first_solved_at, problem_stats.penalty_minutes) == \
+                (solved, first_solved_at, penalty):
+            return
+
+        user_stats = UserStats.objects.select_for_update().get(pk=user_id)
+        if solved != problem_stats.solved:
+            change = 1 if solved else -1
+            topic = str(Problem.objects.values_list('topic_id', flat=True).get(pk=problem_id))
+            user_stats.problems_solved += change
+            user_stats.topic_solved[topic] = user_stats.topic_solved.get(topic, 0) + change
+            if not user_stats.topic_solved[topic]:
+                del user_stats.topic_solved[topic]
+        user_stats.penalty_minutes += penalty - problem_stats.penalty_minutes
+
+        problem_stats.solved = solved
+        problem_stats.first_solved_at = first_solved_at
+        problem_stats.penalty_minutes = penalty
+        problem_stats.save(update_fields=['solved', 'first_solved_at', 'penalty_minutes', 'updated_at'])
+        user_stats.save(update_fields=['problems_solved', 'penalty_minutes', 'topic_solved', 'updated_at'])
+
+
+def rebuild(user_ids=None):
+    """
+    Recomputes the stats of the given users (default: everyone) from their
+    submissions, in one pass over them, and asks every leaderboard to reload.
+    :return: Number of users rebuilt.
+    """
+    submissions = Submission.objects.exclude(status__in=UNFINISHED_STATUSES)
+    if user_ids is not None:
+        submissions = submissions.filter(user_id__in=user_ids)
+    rows = submissions.order_by('user_id', 'problem_id', 'submitted_at', 'id').values_list(
+        'user_id', 'problem_id', 'status', 'submitted_at'
+    )
+    topic_of = dict(Problem.objects.values_list('id', 'topic_id'))
+
+    problem_stats = {}
+    totals = {}
+    for user_id, problem_id, status, submitted_at in rows.iterator(chunk_size=2000):
+        user_totals = totals.get(user_id)
+        if user_totals is None:
+            user_totals = totals[user_id] = UserStats(user_id=user_id, topic_solved=defaultdict(int))
+        stats = problem_stats.get((user_id, problem_id))
+        if stats is None:
+            stats = problem_stats[(user_id, problem_id)] = UserProblemStats(user_id=user_id, problem_id=problem_id)
+            user_totals.problems_attempted += 1
+        stats.attempts += 1
+        user_totals.submissions += 1
+        if stats.solved:
+            continue
+        if status == 'AC':
+            stats.solved = True
+            stats.first_solved_at = submitted_at
+            user_totals.problems_solved += 1
+            user_totals.penalty_minutes += stats.penalty_minutes
+            user_totals.topic_solved[str(topic_of[problem_id])] += 1
+        elif status not in NOT_PENALIZED_STATUSES:
+            stats.penalty_minutes += PENALTY_MINUTES_PER_REJECTED
+
+    for stats in problem_stats.values():
+        if not stats.solved:
+            stats.penalty_minutes = 0
+    for user_totals in totals.values():
+        user_totals.topic_solved = dict(user_totals.topic_solved)
+
+    with transaction.atomic():
+        stale_problem_stats = UserProblemStats.objects.all()
+        stale_totals = UserStats.objects.all()
+        if user_ids is not None:
+            stale_problem_stats = stale_problem_stats.filter(user_id__in=user_ids)
+            stale_totals = stale_totals.filter(user_id__in=user_ids)
+        stale_problem_stats.delete()
+        stale_totals.delete()
+        UserProblemStats.objects.bulk_create(problem_stats.values(), batch_size=1000)
+        UserStats.objects.bulk_create(totals.values(), batch_size=1000)
+        transaction.on_commit(ranking.reload_everywhere)
+    return len(totals)
+
+
+def stats_for(user):
+    """The user's UserStats; an unsaved zero row for users without a verdict yet."""
+    return UserStats.objects.filter(user=user).first() or UserStats(user=user)
+
+
+def problem_marks(user, problem_ids):
+    """
+    Which of the given problems the user has solved or attempted, in one query.
+    :return: Dict of problem id to 'solved' or 'attempted'; problems never tried are left out.
+    """
+    if not user.is_authenticated or not problem_ids:
+        return {}
+    rows = UserProblemStats.objects.filter(user=user, problem_id__in=problem_ids).values_list('problem_id', 'solved')
+    return {problem_id: 'solved' if solved else 'attempted' for problem_id, solved in rows}
+
@@ -1,3 +1,183 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from problems.models import Problem, Submission, Topic
+
+from . import ranking, stats
+from .models import UserProblemStats, UserStats
+
+
+class RecordVerdictTests(TestCase):
+    """Stats updated verdict by verdict must match a rebuild from the submissions table."""
+
+    def setUp(self):
+        self.start = timezone.now() - timedelta(hours=1)
+        self.alice = User.objects.create_user('alice', password='!')
+        self.bob = User.objects.create_user('bob', password='!')
+        math = Topic.objects.create(name='Math')
+        graphs = Topic.objects.create(name='Graphs')
+        self.sum = Problem.objects.create(title='Sum', description='a+b', topic=math)
+        self.product = Problem.objects.create(title='Product', description='a*b', topic=math)
+        self.paths = Problem.objects.create(title='Paths', description='bfs', topic=graphs)
+
+    def submit(self, user, problem, minute):
+        """A Pending submission made `minute` minutes into the test."""
+        submission = Submission.objects.create(user=user, problem=problem, language='python', code='')
+        Submission.objects.filter(pk=submission.pk).update(submitted_at=self.start + timedelta(minutes=minute))
+        submission.refresh_from_db()
+        return submission
+
+    def judge(self, submission, status, first_verdict=True):
+        """Writes a verdict and records it, as the judge does."""
+        submission.status = status
+        submission.save(update_fields=['status'])
+        stats.record_verdict(submission, first_verdict)
+
+    def snapshot(self):
+        return (
+            sorted(UserProblemStats.objects.values_list(
+                'user_id', 'problem_id', 'attempts', 'solved', 'first_solved_at', 'penalty_minutes')),
+            sorted(UserStats.objects.values_list(
+                'user_id', 'submissions', 'problems_attempted', 'problems_solved', 'penalty_minutes', 'topic_solved')),
+        )
+
+    def assert_matches_rebuild(self):
+        recorded = self.snapshot()
+        stats.rebuild()
+        self.assertEqual(recorded, self.snapshot())
+
+    def test_in_order(self):
+        for user, problem, status in [
+            (self.alice, self.sum, 'WA'),
+            (self.alice, self.sum, 'CE'),
+            (self.alice, self.sum, 'AC'),
+            (self.alice, self.sum, 'WA'),
+            (self.alice, self.paths, 'TLE'),
+            (self.bob, self.product, 'AC'),
+        ]:
+            self.judge(self.submit(user, problem, minute=Submission.objects.count()), status)
+
+        alice = UserStats.objects.get(pk=self.alice.pk)
+        self.assertEqual((alice.submissions, alice.problems_attempted, alice.problems_solved), (5, 2, 1))
+        # Only the WA before the first AC is penalized; CE never is
+        self.assertEqual(alice.penalty_minutes, stats.PENALTY_MINUTES_PER_REJECTED)
+        self.assertEqual(alice.topic_solved, {str(self.sum.topic_id): 1})
+        self.assert_matches_rebuild()
+
+    def test_out_of_order_verdicts(self):
+        # Parallel judge workers can write the verdict of a later submission first
+        wrong = self.submit(self.alice, self.sum, 1)
+        late_wrong = self.submit(self.alice, self.sum, 2)
+        accepted = self.submit(self.alice, self.sum, 3)
+        early_accepted = self.submit(self.alice, self.product, 4)
+        wrong_between = self.submit(self.alice, self.product, 5)
+        later_accepted = self.submit(self.alice, self.product, 6)
+        for submission, status in ((accepted, 'AC'), (late_wrong, 'RE'), (later_accepted, 'AC'), (wrong, 'WA'),
+                                   (wrong_between, 'WA'), (early_accepted, 'AC')):
+            self.judge(submission, status)
+
+        # The earlier accept moves the solve and takes back the penalty of the WA after it
+        problem_stats = UserProblemStats.objects.get(user=self.alice, problem=self.product)
+        self.assertEqual((problem_stats.first_solved_at, problem_stats.penalty_minutes),
+                         (early_accepted.submitted_at, 0))
+        alice = UserStats.objects.get(pk=self.alice.pk)
+        self.assertEqual(alice.problems_solved, 2)
+        self.assertEqual(alice.penalty_minutes, 2 * stats.PENALTY_MINUTES_PER_REJECTED)
+        self.assert_matches_rebuild()
+
+    def test_rejudge(self):
+        wrong = self.submit(self.alice, self.sum, 1)
+        accepted = self.submit(self.alice, self.sum, 2)
+        solved_elsewhere = self.submit(self.alice, self.paths, 3)
+        for submission, status in ((wrong, 'WA'), (accepted, 'AC'), (solved_elsewhere, 'AC')):
+            self.judge(submission, status)
+
+        # New test data: the accepted sources fail, the wrong one now passes
+        for submission, status in ((accepted, 'WA'), (wrong, 'AC'), (solved_elsewhere, 'TLE')):
+            self.judge(submission, status, first_verdict=False)
+
+        alice = UserStats.objects.get(pk=self.alice.pk)
+        self.assertEqual((alice.submissions, alice.problems_solved, alice.penalty_minutes), (3, 1, 0))
+        self.assertEqual(alice.topic_solved, {str(self.sum.topic_id): 1})
+        self.assert_matches_rebuild()
+
+    def test_unfinished_verdicts_are_ignored(self):
+        stats.record_verdict(self.submit(self.alice, self.sum, 1), first_verdict=True)
+        self.assertFalse(UserStats.objects.exists())
+        self.assert_matches_rebuild()
+
+    def test_problem_marks(self):
+        self.judge(self.submit(self.alice, self.sum, 1), 'AC')
+        self.judge(self.submit(self.alice, self.paths, 2), 'WA')
+        self.assertEqual(
+            stats.problem_marks(self.alice, [self.sum.id, self.product.id, self.paths.id]),
+            {self.sum.id: 'solved', self.paths.id: 'attempted'},
+        )
+
+    def test_deleted_submissions_and_problems(self):
+        wrong = self.submit(self.alice, self.sum, 1)
+        accepted = self.submit(self.alice, self.sum, 2)
+        for submission, status in ((wrong, 'WA'), (accepted, 'AC'),
+                                   (self.submit(self.alice, self.paths, 3), 'AC'),
+                                   (self.submit(self.bob, self.paths, 4), 'AC')):
+            self.judge(submission, status)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            wrong.delete()
+        alice = UserStats.objects.get(pk=self.alice.pk)
+        self.assertEqual((alice.submissions, alice.problems_solved, alice.penalty_minutes), (2, 2, 0))
+
+        # The topic takes its problems and their submissions with it
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paths.topic.delete()
+        alice = UserStats.objects.get(pk=self.alice.pk)
+        self.assertEqual((alice.submissions, alice.problems_solved), (1, 1))
+        self.assertEqual(alice.topic_solved, {str(self.sum.topic_id): 1})
+        self.assertFalse(UserStats.objects.filter(pk=self.bob.pk).exists())
+        self.assert_matches_rebuild()
+
+
+class LeaderboardTests(TestCase):
+    """Ranks by problems solved, then penalty; ties share a rank and are listed by user id."""
+
+    def setUp(self):
+        # The generation key lives in the cache, which outlives each test's database
+        cache.clear()
+        self.users = {}
+        for name, solved, penalty in (('dave', 1, 0), ('carol', 2, 0), ('alice', 2, 20), ('bob', 2, 20),
+                                      ('erin', 0, 40)):
+            user = self.users[name] = User.objects.create_user(name, password='!')
+            UserStats.objects.create(user=user, problems_solved=solved, penalty_minutes=penalty)
+        self.leaderboard = ranking.Leaderboard()
+
+    def ranks(self):
+        return [(standing.rank, standing.entry.username) for standing in self.leaderboard.top(10)]
+
+    def test_rank_and_ties(self):
+        self.assertEqual(self.ranks(), [(1, 'carol'), (2, 'alice'), (2, 'bob'), (4, 'dave')])
+        self.assertEqual(self.leaderboard.standing(self.users['bob'].id).rank, 2)
+        # Users who solved nothing are not ranked
+        self.assertIsNone(self.leaderboard.standing(self.users['erin'].id))
+        self.assertEqual(len(self.leaderboard), 4)
+        self.assertEqual([standing.entry.username for standing in self.leaderboard.top(2)], ['carol', 'alice'])
+
+    def test_sync_moves_changed_users(self):
+        self.ranks()
+        for name, solved in (('dave', 3), ('erin', 1), ('carol', 0)):
+            user_stats = UserStats.objects.get(user=self.users[name])
+            user_stats.problems_solved = solved
+            user_stats.save()
+        self.leaderboard.sync(force=True)
+        self.assertEqual(self.ranks(), [(1, 'dave'), (2, 'alice'), (2, 'bob'), (4, 'erin')])
 
-# Create your tests here.
+    def test_reload_everywhere(self):
+        self.ranks()
+        # A bulk change that does not touch updated_at, like a rebuild's delete
+        UserStats.objects.filter(user=self.users['carol']).delete()
+        ranking.reload_everywhere()
+        self.leaderboard.sync(force=True)
+        self.assertEqual(self.ranks(), [(1, 'alice'), (1, 'bob'), (3, 'dave')])
@@ -10,9 +10,15 @@ from django.views.decorators.http import require_http_methods
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.decorators import user_passes_test
 from functools import wraps
+from django.db.models import Prefetch
 from problems.models import Submission, Problem, Topic
+from . import ranking
+from .stats import stats_for
 import time
 
+# Users shown on the leaderboard page
+LEADERBOARD_SIZE = 100
+
 def session_valid_required(view_func):
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
@@ -89,30 +95,53 @@ def signup_view(request):
 @session_valid_required
 @never_cache
 def dashboard(request):
-    submissions = Submission.objects.filter(user=request.user)
-    problems_solved = (
-        submissions.filter(status='AC')
-        .values('problem')
-        .distinct()
-        .count()
-    )
+    # Solve counts are kept up to date as verdicts are written (users/stats.py)
+    stats = stats_for(request.user)
 
     # Show last 5 submissions
-    recent_submissions = submissions.order_by('-submitted_at')[:5]
+    recent_submissions = (
+        Submission.objects.filter(user=request.user)
+        .select_related('problem')
+        .only('id', 'status', 'language', 'submitted_at', 'problem__id', 'problem__title')
+        .order_by('-submitted_at')[:5]
+    )
 
-    # Fetch all topics with their problems
-    topics = Topic.objects.all().prefetch_related('problem_set')
-    
-    # Get total problems count
-    total_problems = Problem.objects.count()
+    # Fetch all topics with their problems, without the statement text
+    topics = Topic.objects.all().prefetch_related(
+        Prefetch('problem_set', queryset=Problem.objects.only('id', 'title', 'topic_id'))
+    )
+
+    # Every problem has a topic, so the prefetched lists hold them all
+    total_problems = sum(len(topic.problem_set.all()) for topic in topics)
 
     return render(request, 'users/dashboard.html', {
         'submissions': recent_submissions,
-        'problems_solved': problems_solved,
+        'problems_solved': stats.problems_solved,
+        'standing': ranking.leaderboard.standing(request.user.id),
         'total_problems': total_problems,
         'topics': topics,
     })
 
+@login_required
+@never_cache
+def leaderboard(request):
+    my_standing = ranking.leaderboard.standing(request.user.id)
+    topic_breakdown = []
+    if my_standing is not None:
+        topic_solved = my_standing.entry.topic_solved
+        names = dict(Topic.objects.filter(id__in=topic_solved).values_list('id', 'name'))
+        topic_breakdown = sorted(
+            ((names.get(int(topic_id), 'Removed topic'), solved) for topic_id, solved in topic_solved.items()),
+            key=lambda item: (-item[1], item[0]),
+        )
+
+    return render(request, 'users/leaderboard.html', {
+        'standings': ranking.leaderboard.top(LEADERBOARD_SIZE),
+        'my_standing': my_standing,
+        'ranked_users': len(ranking.leaderboard),
+        'topic_breakdown': topic_breakdown,
+    })
+
 # Enhanced logout view with comprehensive session cleanup
 @require_http_methods(["POST"])
 @never_cache